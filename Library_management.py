@@ -1,15 +1,20 @@
-import mysql.connector
+from library_db import is_rolled_back
+from library_store import BatchResult, NotAvailable, Store, session
+import library_migrations
+import library_search
 from datetime import date
+import argparse
 import os
 import platform
+import shlex
+import sys
+import time
  
 
 '''FUNCTIONS FOR BOOKRECORDS'''
 def insertdata():
       #FOR INSERTING DATA
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor() 
         bno=int(input("Enter Book Code: "))
         bname=input("Enter Book Name: ")
         auth=input("Enter Book Author's Name: ")
@@ -21,42 +26,31 @@ def insertdata():
         mm=int(input('Enter the Month: '))
         yy=int(input('Enter the Year: '))
         d=date(yy,mm,dd)
-        qry="INSERT INTO BOOKRECORDS VALUES({},'{}','{}',{},'{}',{},'{}')".format(bno,bname,auth,price,publ,qty,d)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
+        with session() as s:
+            s.add_book(bno,bname,auth,price,publ,qty,d)
         print("Record inserted.")
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 def deletebook():       #FOR DELETING RECORDS
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         bno=int(input("Enter the Code of the Book to be deleted from the library: "))
-        qry=("delete from bookrecords where bno={}".format(bno))
-        cursor.execute(qry)
-        cnx.commit()
-        cnx.close()
-        print(cursor.rowcount,"Record(s) Deleted Successfully!")
+        with session() as s:
+            n=s.delete_book(bno)
+        print(n,"Record(s) Deleted Successfully!")
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
              
              
         
 
 def SearchBookRec():       #FOR SEARCHING A BOOK IN THE RECORDS
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         bno=int(input("Enter the Book to be Searched from the library: "))
-        qry=("select *  from bookrecords where bno={}".format(bno))
-        cursor.execute(qry)
+        with session() as s:
+            rows=s.find_book(bno)
         rcount=0
-        for (bno,bname,auth,price,publ,qty,date_of_purchase) in cursor:
+        for (bno,bname,auth,price,publ,qty,date_of_purchase,avail) in rows:
             rcount+=1
             print("============================================================")
             print("Book Code :",bno)
@@ -65,22 +59,39 @@ def SearchBookRec():       #FOR SEARCHING A BOOK IN THE RECORDS
             print("Price of theBook :",price)
             print("Publisher of the Book :",publ)
             print("Total Quantity in hand  :",qty)
+            print("Copies available  :",avail)
             print("Purchased on:",date_of_purchase)
             print("============================================================")
         if rcount%2==0:
             input("Press any key to continue")
             clrscreen()
         print(rcount,"Record(s) found")
-        cnx.commit()
-        cursor.close()
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
          
+def FindBookRec():       #FOR FINDING BOOKS BY TITLE, AUTHOR OR PUBLISHER
+    try:
+        words=input("Enter words from the Title, Author or Publisher: ")
+        with session() as s:
+            library_migrations.ensure_current(s.cnx)
+            rows=library_search.search_books(s.cur,words)
+        rcount=0
+        for (bno,bname,auth,price,publ,qty,date_of_purchase,avail) in rows:
+            rcount+=1
+            print("============================================================")
+            print("Book Code :",bno)
+            print("Book Name:",bname)
+            print("Author of the Book :",auth)
+            print("Publisher of the Book :",publ)
+            print("Total Quantity in hand  :",qty)
+            print("Copies available  :",avail)
+            print("============================================================")
+        print(rcount,"Record(s) found")
+    except Exception:
+        print("Sorry,something went wrong")
+
 def UpdateBook():  #FOR UPDATING BOOK RECORDS 
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         bno=int(input("Enter the Book code of the book to be Updated from the library: "))
         print("Enter New Data")
         bname=input("Enter Book Name: ")
@@ -93,15 +104,13 @@ def UpdateBook():  #FOR UPDATING BOOK RECORDS
         mm=int(input('Enter the Month: '))
         yy=int(input('Enter the Year: '))
         Date_of_Purchase=date(yy,mm,dd)
-        qry="update bookrecords set bname='%s',auth='%s',price=%s,publ='%s',qty=%s,date_of_purchase='%s' where bno=%s" % (bname,auth,price,publ,qty,Date_of_Purchase,bno)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
-        print(cursor.rowcount,'Record(s)  updated successfully!')
+        with session() as s:
+            n=s.update_book(bno,bname,auth,price,publ,qty,Date_of_Purchase)
+        print(n,'Record(s)  updated successfully!')
+    except NotAvailable as ex:
+        print(ex)
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 ####################################################################################
 
@@ -111,13 +120,11 @@ def UpdateBook():  #FOR UPDATING BOOK RECORDS
 def SearchIssuedBook():    #FOR SEARCHING A BOOK
     try:
         os.system('cls')
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
-        mno=int(input("Enter the Member code to Search the book: "))
-        qry=("select *  from issue where mno={}".format(mno))
-        cursor.execute(qry)
+        mno=input("Enter the Member code to Search the book: ").strip()
+        with session() as s:
+            rows=s.issues_for_member(mno)
         rcount=0
-        for (bno,mno,d_o_issue,d_o_ret) in cursor:
+        for (bno,mno,d_o_issue,d_o_ret) in rows:
             rcount+=1
             print("============================================================")
             print("1.Book Code :",bno)
@@ -129,51 +136,38 @@ def SearchIssuedBook():    #FOR SEARCHING A BOOK
             input("Press any key to continue")
             clrscreen()
         print(rcount,"Record(s) found")
-        cnx.commit()
-        cursor.close()
         print('you have done it!')
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 
 def issuebook():
     try:   #FOR ISSUING A BOOK
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         bno=int(input("Enter Book Code to issue:  "))
-        mno=int(input("Enter Member Code: "))
+        mno=input("Enter Member Code: ").strip()
         print('Enter Date of Purchase (Date/Month and Year separately: ')
         dd=int(input('Enter the Date: '))
         mm=int(input('Enter the Month: '))
         yy=int(input('Enter the Year: '))
         d=date(yy,mm,dd)
-        qry="INSERT INTO ISSUE(bno,mno,d_o_issue) VALUES(%s,%s,'%s')" %(bno,mno,d)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
+        with session() as s:
+            s.issue_book(bno,mno,d)
         print("Record inserted.")
+    except NotAvailable as ex:
+        print(ex)
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 def returnbook():  #TO UPDATE BOOK RETURN STATUS
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         bno=int(input("Enter the Book code of the book to be Returned to the library: "))
-        mno=int(input("Enter Member Code: "))
+        mno=input("Enter Member Code: ").strip()
         rd=date.today()
-        qry="update issue set d_o_ret='%s' where bno=%s and mno=%s" %(rd,bno,mno)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
-        print(cursor.rowcount,'Record(s)  updated successfully!')
+        with session() as s:
+            n=s.return_book(bno,mno,rd)
+        print(n,'Record(s)  updated successfully!')
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 ###############################################################################################
 '''FUNCTIONS FOR INSERTING,DELETING,SEARCHING AND UPDATING MEMBERS OFHE LIBRARY'''
@@ -183,8 +177,6 @@ def clrscreen():
 
 def insertmember():    #FOR ADDING A NEW MEMBER
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
         mno=input("Enter Member Code: ")
         mname=input("Enter Member Name: ")
         print('Enter Date of Purchase (Date/Month and Year separately: ')
@@ -194,41 +186,30 @@ def insertmember():    #FOR ADDING A NEW MEMBER
         addr=input("Enter Member's Address: ")
         mob=input("Enter Member's Mobile number: ")
         d=date(yy,mm,dd)
-        qry="INSERT INTO MEMBER VALUES('{}','{}','{}','{}','{}')".format(mno,mname,d,addr,mob)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
+        with session() as s:
+            s.add_member(mno,mname,d,addr,mob)
         print("Record inserted.")
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 
 def deletemember():    #FOR DELETING A MEMBER
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
-        mno=int(input("Enter the Code of the Member to be deleted from the library: "))
-        qry="delete from member where mno={}".format(mno)
-        cursor.execute(qry)
-        cnx.commit()
-        cnx.close()
-        print(cursor.rowcount,"Record(s) Deleted Successfully!")
+        mno=input("Enter the Code of the Member to be deleted from the library: ").strip()
+        with session() as s:
+            n=s.delete_member(mno)
+        print(n,"Record(s) Deleted Successfully!")
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 
 def searchmember():    #FOR SEARCHING A MEMBER
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
-        mno=int(input("Enter the Mno of the Member to be Searched from the library: "))
-        qry="select *  from member where mno={}".format(mno)
-        cursor.execute(qry)
+        mno=input("Enter the Mno of the Member to be Searched from the library: ").strip()
+        with session() as s:
+            rows=s.find_member(mno)
         rcount=0
-        for (mno,mname,date_of_membership,addr,mob) in cursor:
+        for (mno,mname,date_of_membership,addr,mob) in rows:
             rcount+=1
             print("============================================================")
             print("Member Code :",mno)
@@ -241,17 +222,12 @@ def searchmember():    #FOR SEARCHING A MEMBER
             input("Press any key to continue")
             clrscreen()
         print(rcount,"Record(s) found")
-        cnx.commit()
-        cursor.close()
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 def updatemember():   #FOR UPDATING INFORMATION ABOUT MEMBERS
     try:
-        cnx=mysql.connector.connect(user="root",host="localhost",passwd="1234",database="Library")
-        cursor=cnx.cursor()
-        mno=int(input("Enter the Member code of the Member to be Updated from the library: "))
+        mno=input("Enter the Member code of the Member to be Updated from the library: ").strip()
         print("Enter New Data")
         mname=input("Enter Member Name: ")
         print('Enter Date of Purchase (Date/Month and Year separately: ')
@@ -261,15 +237,11 @@ def updatemember():   #FOR UPDATING INFORMATION ABOUT MEMBERS
         addr=input("Enter Member's Address: ")
         mob=int(input("Enter Member's Mobile number: "))
         Date_of_membership=date(yy,mm,dd)
-        qry="update member set mname='%s',date_of_membership='%s',addr='%s',mob=%s where mno=%s" % (mname,Date_of_membership,addr,mob,mno)
-        cursor.execute(qry)
-        cnx.commit()
-        cursor.close()
-        cnx.close()
-        print(cursor.rowcount,'Record(s)  updated successfully!')
+        with session() as s:
+            n=s.update_member(mno,mname,Date_of_membership,addr,mob)
+        print(n,'Record(s)  updated successfully!')
     except Exception:
         print("Sorry,something went wrong")
-    cnx.close()
 
 ########################################################################################
 '''DESIGNING MENU'''
@@ -286,9 +258,10 @@ def menubook():
         print('2.SEARCH BOOK RECORD')
         print('3.DELETE BOOK RECORD')
         print('4.UPDATE BOOK RECORD')
-        print('5.RETURN THE IN MENU')
+        print('5.FIND BOOK BY TITLE/AUTHOR/PUBLISHER')
+        print('6.RETURN THE IN MENU')
         print('===========================================================================')
-        ch=int(input('Enter your choice between 1-5------>'))
+        ch=int(input('Enter your choice between 1-6------>'))
         if ch==1:
             insertdata()
         elif ch==2:
@@ -298,6 +271,8 @@ def menubook():
         elif ch==4:
             UpdateBook()
         elif ch==5:
+            FindBookRec()
+        elif ch==6:
             return
         else:
             print('Wrong choice.....Enter  your choice again:')
@@ -357,23 +332,236 @@ def issuemenu():
 ################################################################################################
 """DESIGNING FORMAT OF THE MAIN WINDOW"""
 
-while True:
-    print('\t\t\tLIBRARY MANAGEMENT\n')
-    print('===========================================================================')
-    print('1.BOOK MANAGEMENT')
-    print('2.MEMBERS MANAGEMENT')
-    print('3.ISSUE/RETURN BOOK')
-    print('4.EXIT')
-    print('===========================================================================')
-    ch=int(input('Enter your choice between 1-4------>'))
-    if ch==1:
-        menubook()
-    elif ch==2:
-        membermenu()
-    elif ch==3:
-        issuemenu()
-    elif ch==4:
-        break
-    else:
-        print('Wrong choice.....Enter  your choice again:')
-        x=input('press any key to continue')
+def mainmenu():
+    while True:
+        print('\t\t\tLIBRARY MANAGEMENT\n')
+        print('===========================================================================')
+        print('1.BOOK MANAGEMENT')
+        print('2.MEMBERS MANAGEMENT')
+        print('3.ISSUE/RETURN BOOK')
+        print('4.EXIT')
+        print('===========================================================================')
+        ch=int(input('Enter your choice between 1-4------>'))
+        if ch==1:
+            menubook()
+        elif ch==2:
+            membermenu()
+        elif ch==3:
+            issuemenu()
+        elif ch==4:
+            break
+        else:
+            print('Wrong choice.....Enter  your choice again:')
+            x=input('press any key to continue')
+
+################################################################################################
+"""COMMAND MODE -- the same operations without the menus, for scripts and nightly jobs:
+
+    python Library_management.py issue 101 M7
+    python Library_management.py find-book 101
+    python Library_management.py run corrections.txt --commit-every 1000
+    some-job | python Library_management.py run -
+
+A `run` file holds one command per line (shell-style quoting, # comments).
+All of it runs on one connection and is committed every --commit-every
+commands. A line that fails is rolled back to its savepoint and reported
+with its line number; the lines around it still go through.
+"""
+
+COMMIT_EVERY=500
+RETRIES=3           # tries per line when the server rolls the transaction back
+
+class CommandError(Exception):
+    """A command line that could not be parsed."""
+
+class CommandParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise CommandError(message)
+
+class ScriptParser(CommandParser):
+    """Parses script lines: -h / --help there is an error, not help text
+    printed in the middle of the output."""
+    def print_help(self, file=None):
+        raise CommandError("help is not a command")
+
+def iso_date(text):
+    return date.fromisoformat(text)
+
+BOOK_ARGS=[("bno",int),("bname",str),("auth",str),("price",int),("publ",str),("qty",int),("dop",iso_date)]
+MEMBER_ARGS=[("mno",str),("mname",str),("dom",iso_date),("addr",str),("mob",str)]
+
+# name: (help, [(argument, type[, nargs])], handler(store, *arguments))
+COMMANDS={
+    "add-book":      ("add a book record", BOOK_ARGS, Store.add_book),
+    "update-book":   ("replace a book record", BOOK_ARGS, Store.update_book),
+    "delete-book":   ("delete a book record", [("bno",int)], Store.delete_book),
+    "find-book":     ("show a book by code", [("bno",int)], Store.find_book),
+    "search":        ("find books by title, author or publisher", [("words",str,"+")],
+                      lambda s,words: library_search.search_books(s.cur," ".join(words))),
+    "add-member":    ("add a member", MEMBER_ARGS, Store.add_member),
+    "update-member": ("replace a member record", MEMBER_ARGS, Store.update_member),
+    "delete-member": ("delete a member", [("mno",str)], Store.delete_member),
+    "find-member":   ("show a member by code", [("mno",str)], Store.find_member),
+    "issue":         ("issue a book (date defaults to today)", [("bno",int),("mno",str),("doi",iso_date,"?")],
+                      lambda s,bno,mno,doi: s.issue_book(bno,mno,doi or date.today())),
+    "return":        ("return a book (date defaults to today)", [("bno",int),("mno",str),("rd",iso_date,"?")],
+                      Store.return_book),
+    "issues":        ("list a member's issues", [("mno",str)], Store.issues_for_member),
+    "issue-many":    ("issue several books to one member", [("mno",str),("codes",str,"+")], Store.issue_many),
+    "return-many":   ("return several books from one member", [("mno",str),("codes",str,"+")], Store.return_many),
+}
+
+def command_parser(parser_class=CommandParser):
+    p=parser_class(prog="Library_management.py",
+                    description="Library operations without the menus. "
+                                "Run with no arguments for the interactive menu.")
+    sub=p.add_subparsers(dest="command",required=True,parser_class=parser_class)
+    for name,(help,spec,handler) in COMMANDS.items():
+        c=sub.add_parser(name,help=help)
+        for arg,kind,*nargs in spec:
+            c.add_argument(arg,type=kind,nargs=nargs[0] if nargs else None,
+                           metavar="YYYY-MM-DD" if kind is iso_date else None)
+        c.set_defaults(run=lambda s,a,handler=handler,spec=spec: handler(s,*[getattr(a,arg) for arg,*_ in spec]))
+    r=sub.add_parser("run",help="run commands from a file, one per line ('-' reads stdin)")
+    r.add_argument("file")
+    r.add_argument("--commit-every",type=int,default=COMMIT_EVERY,metavar="N",
+                   help=f"commit after every N commands (default {COMMIT_EVERY})")
+    r.add_argument("--stop-on-error",action="store_true",
+                   help="stop at the first failing line; everything before it is committed")
+    return p
+
+def show(result,out=sys.stdout):
+    if isinstance(result,list):             # rows: tab-separated, for piping
+        for row in result:
+            print("\t".join("" if v is None else str(v) for v in row),file=out)
+    elif isinstance(result,BatchResult):
+        for code,reason in result.failed:
+            print(f"{code}\t{reason}",file=out)
+        print(result.summary("done"),file=out)
+    elif result is not None:
+        print(result,"Record(s) affected",file=out)
+
+def run_script(lines,commit_every=COMMIT_EVERY,stop_on_error=False,out=sys.stdout,err=sys.stderr):
+    """Runs one command per line over a single session. Returns the number of failed lines."""
+    parser=command_parser(ScriptParser)
+    done=failed=commits=0
+    uncommitted=[]                              # (lineno, args) run since the last commit
+    started=time.perf_counter()
+
+    def run(s,args):
+        with s.savepoint("cmd"):
+            return args.run(s,args)
+
+    def redo(s):
+        # A MySQL deadlock or lock wait timeout undoes the whole transaction,
+        # savepoints included: run everything since the last commit again.
+        nonlocal done,failed
+        s.rollback()
+        for lineno,args in list(uncommitted):
+            try:
+                run(s,args)
+            except Exception as ex:
+                if is_rolled_back(ex):
+                    raise
+                uncommitted.remove((lineno,args))
+                done-=1
+                failed+=1
+                print(f"line {lineno}: {type(ex).__name__}: {ex} (on retry)",file=err)
+
+    with session() as s:
+        for lineno,line in enumerate(lines,1):
+            try:
+                words=shlex.split(line,comments=True)
+                if not words:
+                    continue
+                args=parser.parse_args(words)
+                if args.command=="run":
+                    raise CommandError("run cannot be nested")
+                for attempt in range(1,RETRIES+1):
+                    try:
+                        if attempt>1:
+                            redo(s)
+                        result=run(s,args)
+                        break
+                    except Exception as ex:
+                        if not is_rolled_back(ex) or attempt==RETRIES:
+                            raise
+            except (CommandError,NotAvailable,ValueError) as ex:
+                failed+=1
+                print(f"line {lineno}: {ex}",file=err)
+            except Exception as ex:             # a database error: this line was rolled back
+                failed+=1
+                print(f"line {lineno}: {type(ex).__name__}: {ex}",file=err)
+                if is_rolled_back(ex):          # and so was everything since the last commit
+                    s.rollback()
+                    for n,_ in uncommitted:
+                        print(f"line {n}: rolled back with line {lineno}",file=err)
+                    done-=len(uncommitted)
+                    failed+=len(uncommitted)
+                    uncommitted.clear()
+            else:
+                done+=1
+                uncommitted.append((lineno,args))
+                if isinstance(result,list):
+                    show(result,out)
+                elif isinstance(result,BatchResult):
+                    for code,reason in result.failed:
+                        print(f"line {lineno}: {code}: {reason}",file=err)
+                if len(uncommitted)>=commit_every:
+                    s.commit()
+                    commits+=1
+                    uncommitted.clear()
+                continue
+            if stop_on_error:
+                break
+        if uncommitted:
+            commits+=1                          # committed as the session closes
+    elapsed=time.perf_counter()-started
+    print(f"{done} command(s) run, {failed} failed, {commits} commit(s) in {elapsed:.2f}s"
+          f" ({done/elapsed if elapsed else 0:,.0f}/s)",file=err)
+    return failed
+
+def schema_ready():
+    """Brings the schema up to date; False (with the error reported) if it can't."""
+    try:
+        with session() as s:
+            library_migrations.ensure_current(s.cnx)
+    except Exception as ex:                 # e.g. the server is down
+        print(f"error: {ex}",file=sys.stderr)
+        return False
+    return True
+
+def main(argv=None):
+    argv=sys.argv[1:] if argv is None else argv
+    if not argv:
+        if not schema_ready():
+            return 1
+        mainmenu()
+        return 0
+    parser=command_parser()
+    try:
+        args=parser.parse_args(argv)        # --help and usage errors need no database
+    except CommandError as ex:
+        parser.print_usage(sys.stderr)
+        print(f"error: {ex}",file=sys.stderr)
+        return 2
+    if not schema_ready():
+        return 1
+    if args.command=="run":
+        if args.file=="-":
+            failed=run_script(sys.stdin,args.commit_every,args.stop_on_error)
+        else:
+            with open(args.file,encoding="utf-8") as f:
+                failed=run_script(f,args.commit_every,args.stop_on_error)
+        return 1 if failed else 0
+    try:
+        with session() as s:
+            result=args.run(s,args)
+    except Exception as ex:
+        print(f"error: {ex}",file=sys.stderr)
+        return 1
+    show(result)
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from library_db import POOL_SIZE, PoolTimeout, get_connection, is_unavailable, warm_up
+from library_store import BOOK_VIEW, ISSUE_COLUMNS, ISSUE_PAGE_SIZE, MEMBER_COLUMNS, NotAvailable, session
+import library_metrics
+import library_migrations
+import library_search
+
+# ─────────────────────────────────────────────
+#  LOCAL HTTP API
+#  One process serves every desk, kiosk or thin client over HTTP/JSON. An
+#  asyncio loop handles the sockets (keep-alive, so a client reuses its
+#  connection). Each request's DB work runs on a small thread pool that
+#  shares the library_db connection pool. A semaphore caps how many
+#  requests use the database at once; past a bounded queue, requests get
+#  an immediate 503 instead of piling up.
+# ─────────────────────────────────────────────
+HOST         = os.environ.get("LIBRARY_API_HOST", "127.0.0.1")
+PORT         = int(os.environ.get("LIBRARY_API_PORT", "8080"))
+CONCURRENCY  = int(os.environ.get("LIBRARY_API_CONCURRENCY", str(POOL_SIZE)))  # DB requests at once
+QUEUE_LIMIT  = int(os.environ.get("LIBRARY_API_QUEUE", "200"))     # waiting beyond this get 503
+IDLE_TIMEOUT = 30           # seconds a keep-alive connection may sit unused
+MAX_BODY     = 1 << 20
+
+BOOK_FIELDS   = BOOK_VIEW.split(", ")
+MEMBER_FIELDS = MEMBER_COLUMNS.split(", ")
+ISSUE_FIELDS  = ISSUE_COLUMNS.split(", ")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "params", "body", "keep_alive")
+
+    def __init__(self, method, target, body, keep_alive):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = dict(parse_qsl(url.query))
+        self.params = {}
+        self.body = body
+        self.keep_alive = keep_alive
+
+    def json(self):
+        if not self.body:
+            raise HTTPError(400, "a JSON body is required")
+        try:
+            data = json.loads(self.body)
+        except ValueError as ex:
+            raise HTTPError(400, f"invalid JSON: {ex}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "the JSON body must be an object")
+        return data
+
+
+def _record(fields, row):
+    return dict(zip(fields, row))
+
+
+def _one(fields, rows, what):
+    if not rows:
+        raise HTTPError(404, f"{what} not found")
+    return _record(fields, rows[0])
+
+
+def _changed(n, what):
+    # Store updates count matched records, so an unchanged one is not a 404.
+    if not n:
+        raise HTTPError(404, f"{what} not found")
+    return {"updated": n}
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+# ─────────────────────────────────────────────
+#  HANDLERS — run on a worker thread as handler(store, request)
+# ─────────────────────────────────────────────
+def get_book(s, r):
+    return _one(BOOK_FIELDS, s.find_book(int(r.params["bno"])), "book")
+
+
+def search_books(s, r):
+    text = r.query.get("q", "").strip()
+    if not text:
+        raise HTTPError(400, "q is required")
+    limit = min(int(r.query.get("limit", library_search.SEARCH_LIMIT)), library_search.SEARCH_LIMIT)
+    return {"books": [_record(BOOK_FIELDS, row) for row in library_search.search_books(s.cur, text, limit)]}
+
+
+def _book(b):
+    return (b["bname"], b["auth"], int(b["price"]), b["publ"], int(b["qty"]), _date(b["date_of_purchase"]))
+
+
+def add_book(s, r):
+    b = r.json()
+    s.add_book(int(b["bno"]), *_book(b))
+    return 201, {"bno": int(b["bno"])}
+
+
+def update_book(s, r):
+    return _changed(s.update_book(int(r.params["bno"]), *_book(r.json())), "book")
+
+
+def delete_book(s, r):
+    return _changed(s.delete_book(int(r.params["bno"])), "book")
+
+
+def get_member(s, r):
+    return _one(MEMBER_FIELDS, s.find_member(r.params["mno"]), "member")
+
+
+def _member(m):
+    return (m["mname"], _date(m["date_of_membership"]), m["addr"], str(m["mob"]))
+
+
+def add_member(s, r):
+    m = r.json()
+    s.add_member(str(m["mno"]), *_member(m))
+    return 201, {"mno": str(m["mno"])}
+
+
+def update_member(s, r):
+    return _changed(s.update_member(r.params["mno"], *_member(r.json())), "member")
+
+
+def delete_member(s, r):
+    return _changed(s.delete_member(r.params["mno"]), "member")
+
+
+def _page_key(text):
+    """'2024-05-01_1234' -> (date, id): the key of a row to page from."""
+    if not text:
+        return None
+    day, _, issue_id = text.rpartition("_")
+    return date.fromisoformat(day), int(issue_id)
+
+
+def _issue_page(s, r, mno=None):
+    limit = max(1, min(int(r.query.get("limit", ISSUE_PAGE_SIZE)), 500))
+    page = s.issue_page(mno, after=_page_key(r.query.get("after")),
+                        before=_page_key(r.query.get("before")), limit=limit)
+    token = lambda key: f"{key[0]}_{key[1]}"
+    return {"issues": [_record(ISSUE_FIELDS, row) for row in page.rows],
+            "newer": token(page.first) if page.has_prev else None,     # pass as ?before=
+            "older": token(page.last) if page.has_next else None}      # pass as ?after=
+
+
+def issue_history(s, r):
+    return _issue_page(s, r, r.query.get("member") or None)
+
+
+def member_issues(s, r):
+    return _issue_page(s, r, r.params["mno"])
+
+
+def issue_book(s, r):
+    b = r.json()
+    s.issue_book(int(b["bno"]), str(b["mno"]), _date(b.get("date")) or date.today())
+    return 201, {"issued": 1}
+
+
+def return_book(s, r):
+    b = r.json()
+    n = s.return_book(int(b["bno"]), str(b["mno"]), _date(b.get("date")))
+    if not n:
+        raise HTTPError(404, "book is not on loan to this member")
+    return {"returned": n}
+
+
+def _batch(op):
+    def handler(s, r):
+        b = r.json()
+        codes = b["codes"]
+        if not isinstance(codes, list):
+            raise HTTPError(400, "codes must be a list")
+        result = op(s, str(b["mno"]), codes, _date(b.get("date")))
+        return {"ok": result.ok, "failed": [{"code": c, "reason": why} for c, why in result.failed]}
+    return handler
+
+
+def dashboard(s, r):
+    return s.dashboard_counts()
+
+
+# method, path, handler; {name} matches one path segment
+ROUTES = [
+    ("GET",    "/books",                  search_books),
+    ("POST",   "/books",                  add_book),
+    ("GET",    "/books/{bno}",            get_book),
+    ("PUT",    "/books/{bno}",            update_book),
+    ("DELETE", "/books/{bno}",            delete_book),
+    ("POST",   "/members",                add_member),
+    ("GET",    "/members/{mno}",          get_member),
+    ("PUT",    "/members/{mno}",          update_member),
+    ("DELETE", "/members/{mno}",          delete_member),
+    ("GET",    "/members/{mno}/issues",   member_issues),
+    ("POST",   "/issues",                 issue_book),
+    ("GET",    "/issues",                 issue_history),
+    ("POST",   "/issues/batch",           _batch(lambda s, *a: s.issue_many(*a))),
+    ("POST",   "/returns",                return_book),
+    ("POST",   "/returns/batch",          _batch(lambda s, *a: s.return_many(*a))),
+    ("GET",    "/dashboard",              dashboard),
+]
+_COMPILED = [(method, re.compile(re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path)), path, handler)
+             for method, path, handler in ROUTES]
+
+
+def _in_session(handler, request):
+    with session() as s:
+        return handler(s, request)
+
+
+# ─────────────────────────────────────────────
+#  REQUEST METRICS
+# ─────────────────────────────────────────────
+class ApiStats:
+    """Latency histogram and status counts per route, shown by library_metrics
+    (Diagnostics dump) under "api"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.rejected = 0
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            st = self._routes.get(route)
+            if st is None:
+                st = self._routes[route] = [library_metrics.Histogram(), 0, 0]
+            st[0].add(seconds * 1000)
+            if 400 <= status < 500:
+                st[1] += 1
+            elif status >= 500:
+                st[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            routes = [dict(route=route, client_errors=c4, server_errors=c5, **h.snapshot())
+                      for route, (h, c4, c5) in self._routes.items()]
+            rejected = self.rejected
+        routes.sort(key=lambda r: r["count"], reverse=True)
+        for r in routes:
+            del r["buckets"]
+        return {"routes": routes, "rejected": rejected}
+
+
+# ─────────────────────────────────────────────
+#  SERVER
+# ─────────────────────────────────────────────
+class ApiServer:
+    def __init__(self, host=HOST, port=PORT, concurrency=CONCURRENCY, queue_limit=QUEUE_LIMIT):
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.stats = ApiStats()
+        self._workers = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="api")
+        self._slots = None          # created on the server's event loop
+        self._waiting = 0
+        self._inflight = 0
+        library_metrics.REGISTRY.add_source("api", self.snapshot)
+
+    def snapshot(self):
+        return dict(self.stats.snapshot(), inflight=self._inflight, waiting=self._waiting,
+                    concurrency=self.concurrency)
+
+    async def serve(self, ready=None):
+        self._slots = asyncio.Semaphore(self.concurrency)
+        server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready:
+            ready(self)
+        async with server:
+            await server.serve_forever()
+
+    async def _run_db(self, handler, request):
+        if self._slots.locked() and self._waiting >= self.queue_limit:
+            self.stats.rejected += 1
+            raise HTTPError(503, "server busy, try again")
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._inflight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._workers, _in_session, handler, request)
+        finally:
+            self._inflight -= 1
+            self._slots.release()
+
+    async def _dispatch(self, request):
+        """Returns (status, payload, route name for metrics)."""
+        allowed = False
+        for method, pattern, path, handler in _COMPILED:
+            m = pattern.fullmatch(request.path)
+            if m is None:
+                continue
+            allowed = True
+            if method != request.method:
+                continue
+            request.params = m.groupdict()
+            name = f"{method} {path}"
+            try:
+                result = await self._run_db(handler, request)
+            except HTTPError as ex:
+                return ex.status, {"error": str(ex)}, name
+            except NotAvailable as ex:
+                return 409, {"error": str(ex)}, name
+            except KeyError as ex:
+                return 400, {"error": f"missing field {ex}"}, name
+            except (ValueError, TypeError) as ex:
+                return 400, {"error": str(ex)}, name
+            except PoolTimeout as ex:
+                return 503, {"error": str(ex)}, name
+            except Exception as ex:
+                library_metrics.REGISTRY.record_error(ex)
+                if is_unavailable(ex):
+                    return 503, {"error": f"database unavailable: {ex}"}, name
+                if type(ex).__name__ == "IntegrityError":      # duplicate code etc., on any backend
+                    return 409, {"error": str(ex)}, name
+                return 500, {"error": f"{type(ex).__name__}: {ex}"}, name
+            status, payload = result if isinstance(result, tuple) else (200, result)
+            return status, payload, name
+        if request.path == "/metrics" and request.method == "GET":
+            return 200, library_metrics.snapshot(), "GET /metrics"         # in memory: no DB
+        if allowed:
+            return 405, {"error": "method not allowed"}, "(405)"
+        return 404, {"error": "no such endpoint"}, "(404)"
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "bad request line")
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        conn = headers.get("connection", "").lower()
+        keep_alive = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+        return Request(method.upper(), target, body, keep_alive)
+
+    @staticmethod
+    def _write(writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as ex:
+                    self._write(writer, ex.status, {"error": str(ex)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                started = time.perf_counter()
+                status, payload, name = await self._dispatch(request)
+                self._write(writer, status, payload, request.keep_alive)
+                await writer.drain()
+                self.stats.record(name, time.perf_counter() - started, status)
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self._workers.shutdown(wait=False, cancel_futures=True)
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_api.py [--host H] [--port P] [--concurrency N]
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Serve the library over a local HTTP/JSON API.")
+    p.add_argument("--host", default=HOST, help=f"interface to listen on (default {HOST})")
+    p.add_argument("--port", type=int, default=PORT, help=f"port (default {PORT})")
+    p.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                   help=f"requests using the database at once (default {CONCURRENCY})")
+    args = p.parse_args(argv)
+
+    with get_connection() as cnx:
+        library_migrations.ensure_current(cnx)
+    warm_up()
+    api = ApiServer(args.host, args.port, args.concurrency)
+    try:
+        asyncio.run(api.serve(lambda s: print(f"Library API on http://{s.host}:{s.port}/ "
+                                              f"({s.concurrency} concurrent DB requests)")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import date, timedelta
+
+import library_db
+import library_migrations
+import library_search
+import library_stats
+import library_store
+
+# ─────────────────────────────────────────────
+#  BENCHMARK SUITE
+#  Builds a synthetic library of a chosen size, with Zipf-skewed
+#  borrowing (a few titles and members account for most issues), then
+#  times every operation the tabs perform, one transaction per call just
+#  like a button click. Results can be saved as a baseline and compared
+#  against later runs to catch regressions.
+# ─────────────────────────────────────────────
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+REPEAT     = 200
+SEED       = 1729
+ZIPF_S     = 1.1        # borrowing skew; higher = more concentrated on popular items
+LOAD_CHUNK = 5000
+HISTORY_DAYS = 5 * 365
+LOAN_DAYS  = 30
+STILL_OUT  = 0.5        # share of issues from the last LOAN_DAYS not yet returned
+BATCH_ITEMS = 15        # books per batch checkout / return (a typical stack)
+THRESHOLD  = 0.25       # p50/p90 slowdown that counts as a regression...
+MIN_DELTA_MS = 0.1      # ...provided it is also at least this many ms (timer noise)
+ROUNDS     = 3          # timed rounds per operation; the best is kept, the spread is the noise
+
+WORDS = ("river night garden shadow winter silent empire stone glass city ocean "
+         "secret light storm journey forest crown fire letters island memory "
+         "house summer broken golden hidden road star history mountain wolf song "
+         "paper iron queen children music silver dream war mirror north machine "
+         "rain sky kingdom ghost hunger bridge clock desert lantern voyage").split()
+FIRST = "Anna Ravi Maria John Li Fatima Peter Aiko Omar Elena Sam Priya Tom Noor Ivan".split()
+LAST  = "Sharma Smith Garcia Chen Okafor Novak Kumar Brown Silva Tanaka Ali Meyer".split()
+PUBLISHERS = ("Penguin", "Harper", "Macmillan", "Hachette", "Scholastic", "Orient",
+              "Rupa", "Bloomsbury", "Vintage", "Pan")
+
+INSERT_ISSUE_HISTORY = (f"INSERT INTO issue ({library_store.ISSUE_COLUMNS}) "
+                        "VALUES (%s,%s,%s,%s)")
+
+
+def scale(issues):
+    """(books, members) for a dataset with `issues` rows of issue history."""
+    return max(1000, issues // 10), max(500, issues // 50)
+
+
+def zipf_sampler(rng, n, s=ZIPF_S):
+    """Returns draw() -> index in [0, n) with P(k) ∝ 1/(k+1)**s."""
+    cum = list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+    total = cum[-1]
+    return lambda: bisect(cum, rng.random() * total)
+
+
+def member_code(n):
+    return f"M{n:07d}"
+
+
+def book_row(rng, bno):
+    title = " ".join(rng.sample(WORDS, rng.randint(2, 4))).title()
+    return (bno, title, f"{rng.choice(FIRST)} {rng.choice(LAST)}", rng.randint(99, 1999),
+            rng.choice(PUBLISHERS), rng.randint(1, 5),
+            date.today() - timedelta(days=rng.randint(0, HISTORY_DAYS)))
+
+
+def member_row(rng, n):
+    return (member_code(n), f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+            date.today() - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+            f"{rng.randint(1, 999)} {rng.choice(WORDS).title()} Street",
+            str(rng.randint(6_000_000_000, 9_999_999_999)))
+
+
+def issue_rows(rng, issues, books, members):
+    pick_book, pick_member = zipf_sampler(rng, books), zipf_sampler(rng, members)
+    today = date.today()
+    for _ in range(issues):
+        age = rng.randint(0, HISTORY_DAYS)
+        issued = today - timedelta(days=age)
+        if age < LOAN_DAYS and rng.random() < STILL_OUT:
+            returned = None
+        else:
+            returned = issued + timedelta(days=min(age, rng.randint(1, LOAN_DAYS)))
+        yield pick_book() + 1, member_code(pick_member() + 1), issued, returned
+
+
+def _load(cnx, sql, rows, label, progress):
+    cur = cnx.cursor()
+    done = 0
+    while True:
+        chunk = list(itertools.islice(rows, LOAD_CHUNK))
+        if not chunk:
+            break
+        cur.executemany(sql, chunk)
+        cnx.commit()
+        done += len(chunk)
+        if progress:
+            progress(label, done)
+
+
+def generate(cnx, issues, seed=SEED, progress=None):
+    """Fills an empty, migrated database with a synthetic library."""
+    books, members = scale(issues)
+    rng = random.Random(seed)
+    _load(cnx, library_store.INSERT_BOOK,
+          (row + (row[5],) for row in (book_row(rng, n) for n in range(1, books + 1))),
+          "books", progress)
+    _load(cnx, library_store.INSERT_MEMBER,
+          (member_row(rng, n) for n in range(1, members + 1)), "members", progress)
+    _load(cnx, INSERT_ISSUE_HISTORY, issue_rows(rng, issues, books, members),
+          "issues", progress)
+    library_stats.reconcile(cnx)        # available copies net of the open issues
+
+
+# ─────────────────────────────────────────────
+#  WORKLOAD
+#  One method per tab operation. Adds create fresh codes that the matching
+#  deletes remove again, and issues are returned by the return benchmark,
+#  so repeated runs leave the dataset the same size.
+# ─────────────────────────────────────────────
+class Workload:
+    def __init__(self, books, members, seed=SEED):
+        self.rng = random.Random(seed + 1)
+        self.books, self.members = books, members
+        self.pick_book = zipf_sampler(self.rng, books)
+        self.pick_member = zipf_sampler(self.rng, members)
+        self.new_bno = itertools.count(books + 1)
+        self.new_member = itertools.count(members + 1)
+        self.added_books, self.added_members, self.open_issues = [], [], []
+        self.open_batches = []
+
+    def _book(self):
+        return self.pick_book() + 1
+
+    def _member(self):
+        return member_code(self.pick_member() + 1)
+
+    def book_add(self, s):
+        bno = next(self.new_bno)
+        s.add_book(*book_row(self.rng, bno))
+        self.added_books.append(bno)
+
+    def book_find(self, s):
+        s.find_book(self._book())
+
+    def book_search(self, s):
+        whole, partial = self.rng.sample(WORDS, 2)
+        library_search.search_books(s.cur, f"{whole} {partial[:3]}")
+
+    def book_update(self, s):
+        try:
+            s.update_book(*book_row(self.rng, self.rng.randint(1, self.books)))
+        except library_store.NotAvailable:
+            return          # fewer copies than are out on loan
+
+    def book_delete(self, s):
+        s.delete_book(self.added_books.pop())
+
+    def member_add(self, s):
+        row = member_row(self.rng, next(self.new_member))
+        s.add_member(*row)
+        self.added_members.append(row[0])
+
+    def member_find(self, s):
+        s.find_member(self._member())
+
+    def member_update(self, s):
+        s.update_member(*member_row(self.rng, self.rng.randint(1, self.members)))
+
+    def member_delete(self, s):
+        s.delete_member(self.added_members.pop())
+
+    def issue(self, s):
+        bno, mno = self._book(), self._member()
+        try:
+            s.issue_book(bno, mno, date.today())
+        except library_store.NotAvailable:
+            return
+        self.open_issues.append((bno, mno))
+
+    def return_(self, s):
+        if self.open_issues:
+            s.return_book(*self.open_issues.pop())
+
+    def batch_issue(self, s):
+        mno = self._member()
+        result = s.issue_many(mno, [self._book() for _ in range(BATCH_ITEMS)], date.today())
+        self.open_batches.append((mno, result.ok))
+
+    def batch_return(self, s):
+        if self.open_batches:
+            s.return_many(*self.open_batches.pop())
+
+    def member_history(self, s):
+        s.issue_page(self._member())
+
+    def history_page(self, s):
+        # a page from anywhere in the history: should cost the same as the first
+        day = date.today() - timedelta(days=self.rng.randint(0, HISTORY_DAYS))
+        s.issue_page(after=(day, 2 ** 62))
+
+    def dashboard(self, s):
+        s.dashboard_counts()
+        s.recent_issues(20)
+
+
+OPERATIONS = ("book_add", "book_find", "book_search", "book_update", "book_delete",
+              "member_add", "member_find", "member_update", "member_delete",
+              "issue", "return_", "batch_issue", "batch_return", "member_history", "history_page",
+              "dashboard")
+
+
+def summarize(times):
+    times = sorted(times)
+    n = len(times)
+    pct = lambda p: times[min(n - 1, int(p * n))] * 1000
+    return {"n": n, "mean_ms": sum(times) / n * 1000, "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90), "p99_ms": pct(0.99), "max_ms": times[-1] * 1000,
+            "ops_per_sec": n / sum(times) if sum(times) else 0.0}
+
+
+def measure(work, name, repeat):
+    op = getattr(work, name)
+    for _ in range(max(1, repeat // 10)):      # warm caches and the pool first
+        with library_store.session() as s:
+            op(s)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with library_store.session() as s:
+            op(s)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def best_of(rounds):
+    """Each statistic's best value over the rounds, plus how far p50 and p90
+    moved between rounds: a change smaller than that is noise."""
+    best = {k: min(r[k] for r in rounds) for k in rounds[0]}
+    best["n"] = sum(r["n"] for r in rounds)
+    best["ops_per_sec"] = max(r["ops_per_sec"] for r in rounds)
+    for k in ("p50", "p90"):
+        values = [r[f"{k}_ms"] for r in rounds]
+        best[f"{k}_noise_ms"] = max(values) - min(values)
+    return best
+
+
+def run(work, repeat=REPEAT, only=None, rounds=ROUNDS):
+    """Times every operation `rounds` times, interleaved, so a slow patch on
+    the machine hits all of them rather than one."""
+    names = [name for name in OPERATIONS if not only or name.rstrip("_") in only]
+    timed = {name: [] for name in names}
+    for _ in range(max(1, rounds)):
+        for name in names:
+            timed[name].append(measure(work, name, repeat))
+    return {name.rstrip("_"): best_of(r) for name, r in timed.items()}
+
+
+# ─────────────────────────────────────────────
+#  REPORTING / BASELINES
+# ─────────────────────────────────────────────
+def print_results(results):
+    print(f"{'operation':<16}{'n':>6}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'ops/s':>10}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['n']:>6}{r['mean_ms']:>9.2f}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['ops_per_sec']:>10,.0f}")
+    print("(times in ms)")
+
+
+def save_baseline(path, meta, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def compare(baseline, results, threshold=THRESHOLD):
+    """Prints p50/p90 changes against a baseline; returns the regressed operations.
+
+    A slowdown counts only if it passes `threshold`, MIN_DELTA_MS and the
+    round-to-round noise of both runs."""
+    regressed = []
+    print(f"{'operation':<16}{'p50 base':>10}{'now':>9}{'change':>9}{'p90 base':>10}{'now':>9}{'change':>9}")
+    for name, r in results.items():
+        b = baseline["results"].get(name)
+        if not b:
+            continue
+        ch50 = r["p50_ms"] / b["p50_ms"] - 1 if b["p50_ms"] else 0.0
+        ch90 = r["p90_ms"] / b["p90_ms"] - 1 if b["p90_ms"] else 0.0
+        slower = [(ch, r[f"{k}_ms"] - b[f"{k}_ms"],
+                   max(r.get(f"{k}_noise_ms", 0.0), b.get(f"{k}_noise_ms", 0.0)))
+                  for ch, k in ((ch50, "p50"), (ch90, "p90"))]
+        slower = [(d, noise) for ch, d, noise in slower if ch > threshold and d >= MIN_DELTA_MS]
+        flag = ""
+        if any(d > noise for d, noise in slower):
+            flag = "  REGRESSION"
+            regressed.append(name)
+        elif slower:
+            flag = "  (within noise)"
+        print(f"{name:<16}{b['p50_ms']:>10.2f}{r['p50_ms']:>9.2f}{ch50:>+9.0%}"
+              f"{b['p90_ms']:>10.2f}{r['p90_ms']:>9.2f}{ch90:>+9.0%}{flag}")
+    return regressed
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_bench.py --size 100k --save baseline.json
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark library operations on synthetic data.")
+    p.add_argument("--size", choices=SIZES, default="10k", help="issue-history rows (default 10k)")
+    p.add_argument("--issues", type=int, help="exact number of issue rows (overrides --size)")
+    p.add_argument("--backend", choices=sorted(library_db.BACKENDS), default="sqlite",
+                   help="sqlite (default) or mysql; mysql uses DB_CONFIG, so point it at a scratch database")
+    p.add_argument("--db", help="SQLite file (default bench-<size>.db, generated once and reused)")
+    p.add_argument("--repeat", type=int, default=REPEAT, help=f"calls per operation (default {REPEAT})")
+    p.add_argument("--rounds", type=int, default=ROUNDS,
+                   help=f"timed rounds per operation; the best is kept (default {ROUNDS})")
+    p.add_argument("--only", help="comma-separated operations to run")
+    p.add_argument("--seed", type=int, default=SEED)
+    p.add_argument("--save", metavar="FILE", help="write results as a baseline JSON file")
+    p.add_argument("--compare", metavar="FILE", help="compare with a saved baseline; exit 1 on regression")
+    p.add_argument("--threshold", type=float, default=THRESHOLD,
+                   help=f"p50/p90 slowdown treated as a regression (default {THRESHOLD * 100:.0f}%%)")
+    p.add_argument("--prepared", choices=("on", "off", "both"), default="on",
+                   help="reuse prepared hot statements (default on); 'both' runs without, then with")
+    args = p.parse_args(argv)
+
+    issues = args.issues or SIZES[args.size]
+    path = args.db or f"bench-{args.issues or args.size}.db"
+    def connect(prepared):
+        if args.backend == "sqlite":
+            library_db.configure("sqlite", prepared=prepared, path=path)
+        else:
+            library_db.configure("mysql", prepared=prepared)
+
+    connect(args.prepared != "off")
+
+    with library_db.get_connection() as cnx:
+        library_migrations.migrate(cnx)
+        with library_store.session() as s:
+            empty = s.dashboard_counts()["books"] == 0
+        if empty:
+            started = time.perf_counter()
+            generate(cnx, issues, args.seed,
+                     progress=lambda label, n: print(f"  {label}: {n:,}{' ' * 10}", end="\r", flush=True))
+            print(f"Generated {issues:,} issues in {time.perf_counter() - started:.0f}s" + " " * 20)
+
+    books, members = scale(issues)
+    only = set(args.only.split(",")) if args.only else None
+    if args.prepared == "both":
+        connect(False)
+        plain = run(Workload(books, members, args.seed), args.repeat, only, args.rounds)
+        connect(True)
+    results = run(Workload(books, members, args.seed), args.repeat, only, args.rounds)
+    print_results(results)
+    if args.prepared == "both":
+        print("\nPrepared statements (now) against unprepared (base):")
+        compare({"results": plain}, results, args.threshold)
+
+    meta = {"backend": library_db.dialect(), "issues": issues, "repeat": args.repeat,
+            "rounds": args.rounds, "prepared": library_db.get_pool().prepared,
+            "python": platform.python_version(), "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+    if args.save:
+        save_baseline(args.save, meta, results)
+        print(f"Baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("issues") != issues:
+            print(f"note: baseline was taken on {baseline['meta'].get('issues'):,} issues")
+        regressed = compare(baseline, results, args.threshold)
+        if regressed:
+            print(f"{len(regressed)} operation(s) regressed: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
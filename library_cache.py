@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import library_metrics
+
+# ─────────────────────────────────────────────
+#  LOOKUP CACHE
+#  Book-code and member-code lookups are read through a small in-process
+#  LRU with a TTL. The app's own writes (library_store) invalidate the
+#  key they touch. Writes from other desks or tools are picked up when
+#  the entry expires.
+# ─────────────────────────────────────────────
+CACHE_SIZE = int(os.environ.get("LIBRARY_CACHE_SIZE", "2000"))     # entries per cache; 0 disables
+CACHE_TTL  = float(os.environ.get("LIBRARY_CACHE_TTL", "300"))     # seconds
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()      # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._epoch = 0                 # bumped by every invalidation
+        self._stats = dict(hits=0, misses=0, expired=0, evictions=0, invalidations=0)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value, epoch=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return                  # invalidated while loading: value may be stale
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key, load):
+        """Returns the cached value for key, calling load() and caching it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            epoch = self._epoch
+            value = load()
+            self.put(key, value, epoch)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._epoch += 1
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats, size=len(self._data), maxsize=self.maxsize, ttl=self.ttl)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = s["hits"] / lookups if lookups else 0.0
+        return s
+
+
+BOOKS   = LRUCache("books")
+MEMBERS = LRUCache("members")
+
+
+def clear():
+    BOOKS.clear()
+    MEMBERS.clear()
+
+
+def stats():
+    return {c.name: c.stats() for c in (BOOKS, MEMBERS)}
+
+
+library_metrics.REGISTRY.add_source("cache", stats)
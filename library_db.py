@@ -0,0 +1,491 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+import library_metrics
+
+# ─────────────────────────────────────────────
+#  DB CONFIG
+# ─────────────────────────────────────────────
+BACKEND     = os.environ.get("LIBRARY_BACKEND", "mysql")          # "mysql" or "sqlite"
+DB_CONFIG   = dict(user="root", host="localhost", passwd="1234", database="Library")
+SQLITE_PATH = os.environ.get("LIBRARY_SQLITE_PATH", "library.db")
+
+POOL_SIZE        = int(os.environ.get("LIBRARY_POOL_SIZE", "5"))
+POOL_TIMEOUT     = float(os.environ.get("LIBRARY_POOL_TIMEOUT", "10"))
+POOL_CHECK_AFTER = float(os.environ.get("LIBRARY_POOL_CHECK_AFTER", "30"))
+PREPARED         = os.environ.get("LIBRARY_PREPARED", "1") != "0"
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DatabaseUnavailable(Exception):
+    """No connection to the database could be opened (server down, link lost)."""
+
+
+# MySQL client errors for a server that can't be reached or dropped mid-call:
+# can't connect (2003), gone away (2006), lost connection (2013, 2055).
+LOST_CONNECTION = {2003, 2006, 2013, 2055}
+
+def is_unavailable(ex):
+    """True when `ex` means the server can't be reached, not that the request was bad."""
+    return isinstance(ex, DatabaseUnavailable) or getattr(ex, "errno", None) in LOST_CONNECTION
+
+# MySQL errors after which the server has already rolled back the whole
+# transaction: lock wait timeout (1205), deadlock (1213), and the "savepoint
+# does not exist" (1305) a ROLLBACK TO SAVEPOINT then runs into.
+TRANSACTION_LOST = {1205, 1213, 1305}
+
+def is_rolled_back(ex):
+    """True when `ex` (or an error it was raised while handling) means the
+    transaction is gone and must be retried from its start."""
+    while ex is not None:
+        if getattr(ex, "errno", None) in TRANSACTION_LOST:
+            return True
+        ex = ex.__context__
+    return False
+
+
+# ─────────────────────────────────────────────
+#  POOLED CONNECTION HANDLE
+# ─────────────────────────────────────────────
+class PooledConnection:
+    """Proxy around a raw connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return library_metrics.wrap(self.__getattr__("cursor")(*args, **kwargs))
+
+    def prepared(self, sql):
+        """A cursor with `sql` already prepared on this connection. Run only `sql`
+        on it and fetch every row before the next statement."""
+        if not self._pool.prepared or self._raw is None:
+            return self.cursor()            # (the latter raises: already returned)
+        return self._pool._statement(self._raw, sql)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw)
+
+    def discard(self):
+        """Drop the underlying connection instead of reusing it."""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._discard(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                self.discard()
+                return False
+        self.close()
+        return False
+
+
+# ─────────────────────────────────────────────
+#  CONNECTION POOL
+# ─────────────────────────────────────────────
+class ConnectionPool:
+    def __init__(self, connect, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 check_after=POOL_CHECK_AFTER, ping=None, prepared=PREPARED):
+        self._connect = connect
+        self.prepared = prepared   # hand out prepared cursors from prepared()
+        self._ping = ping or (lambda raw: raw.ping(reconnect=False))
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = []            # [(raw, returned_at)]
+        self._statements = {}      # id(raw) -> StatementCache
+        self._total = 0
+        self._cond = threading.Condition()
+        self._stats = dict(checkouts=0, hits=0, misses=0, waits=0,
+                           wait_time=0.0, max_wait=0.0, created=0,
+                           reconnects=0, discarded=0, errors=0)
+
+    # ── checkout / release ──────────────────
+    def get_connection(self):
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while not self._idle and self._total >= self.size:
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._stats["errors"] += 1
+                    raise PoolTimeout(f"no free connection after {self.timeout:.1f}s "
+                                      f"(pool size {self.size})")
+                self._cond.wait(remaining)
+            if self._idle:
+                raw, returned_at = self._idle.pop()
+                self._stats["hits"] += 1
+            else:
+                raw, returned_at = None, None
+                self._total += 1
+                self._stats["misses"] += 1
+
+        if raw is None:
+            raw = self._open()
+        elif time.monotonic() - returned_at > self.check_after:
+            raw = self._check(raw)
+
+        wait = time.perf_counter() - start
+        with self._cond:
+            s = self._stats
+            s["checkouts"] += 1
+            if waited:
+                s["waits"] += 1
+            s["wait_time"] += wait
+            s["max_wait"] = max(s["max_wait"], wait)
+        return PooledConnection(self, raw)
+
+    def _open(self):
+        try:
+            raw = self._connect()
+        except Exception as ex:
+            with self._cond:
+                self._total -= 1
+                self._stats["errors"] += 1
+                self._cond.notify()
+            raise DatabaseUnavailable(str(ex)) from ex
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _check(self, raw):
+        """Ping a connection that sat idle; replace it if the server dropped it."""
+        try:
+            self._ping(raw)
+            return raw
+        except Exception:
+            self._close_quietly(raw)
+            with self._cond:
+                self._stats["reconnects"] += 1
+            try:
+                return self._connect()
+            except Exception as ex:
+                with self._cond:
+                    self._total -= 1
+                    self._stats["errors"] += 1
+                    self._cond.notify()
+                raise DatabaseUnavailable(str(ex)) from ex
+
+    def _release(self, raw):
+        try:
+            if getattr(raw, "in_transaction", False):
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def _statement(self, raw, sql):
+        # Only the thread holding `raw` touches its cache.
+        cache = self._statements.get(id(raw))
+        if cache is None:
+            cache = self._statements[id(raw)] = StatementCache(raw)
+        return cache.get(sql)
+
+    def _discard(self, raw):
+        self._close_quietly(raw)
+        with self._cond:
+            self._total -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _close_quietly(self, raw):
+        cache = self._statements.pop(id(raw), None)
+        if cache is not None:
+            cache.close()
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ── lifecycle ───────────────────────────
+    def warm_up(self, count=None):
+        """Open up to `count` connections ahead of time. Returns how many are idle."""
+        count = self.size if count is None else min(count, self.size)
+        held = []
+        try:
+            while len(held) < count:
+                with self._cond:
+                    if not self._idle and self._total >= self.size:
+                        break
+                held.append(self.get_connection())
+        except Exception:
+            pass
+        finally:
+            for c in held:
+                c.close()
+        with self._cond:
+            return len(self._idle)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s["size"] = self.size
+            s["open"] = self._total
+            s["idle"] = len(self._idle)
+            s["in_use"] = self._total - len(self._idle)
+        s["avg_wait_ms"] = s["wait_time"] * 1000 / s["checkouts"] if s["checkouts"] else 0.0
+        return s
+
+
+# ─────────────────────────────────────────────
+#  PREPARED STATEMENTS
+#  The hot statements (lookups by code, issue, return, the dashboard) are
+#  prepared once per connection and their cursors kept with it across
+#  checkouts, so the database parses each one once rather than on every
+#  call. MySQL gets server-side prepared statements (binary protocol);
+#  SQLite keeps one cursor per statement. LIBRARY_PREPARED=0 turns this
+#  off, for comparison; sqlite3's own compiled-statement cache is left at
+#  its default either way, so the comparison measures only this layer.
+# ─────────────────────────────────────────────
+_prepared_lock = threading.Lock()
+_prepared_counts = {}           # sql -> [prepares, executions]
+
+def _count(sql, prepares):
+    with _prepared_lock:
+        counts = _prepared_counts.setdefault(sql, [0, 0])
+        counts[0] += prepares
+        counts[1] += 1
+
+
+class StatementCache:
+    """Prepared cursors for one raw connection, keyed by statement text."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._cursors = {}
+
+    def get(self, sql):
+        cur = self._cursors.get(sql)
+        _count(sql, cur is None)
+        if cur is None:
+            cur = self._cursors[sql] = library_metrics.wrap(self._raw.cursor(prepared=True))
+        return cur
+
+    def close(self):
+        for cur in self._cursors.values():
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self._cursors.clear()
+
+
+def prepared_stats():
+    """Per prepared statement: how often it was prepared and executed."""
+    with _prepared_lock:
+        counts = list(_prepared_counts.items())
+    counts.sort(key=lambda kv: kv[1][1], reverse=True)
+    return {"enabled": _pool.prepared if _pool is not None else PREPARED,
+            "statements": [{"sql": library_metrics.normalize(sql), "prepares": p, "executions": e}
+                           for sql, (p, e) in counts]}
+
+
+# ─────────────────────────────────────────────
+#  STORAGE BACKENDS
+#  Everything above the pool speaks one SQL dialect with %s placeholders;
+#  a backend supplies connections that accept it. Modules that need
+#  engine-specific DDL branch on dialect().
+# ─────────────────────────────────────────────
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, **config):
+        self.config = dict(DB_CONFIG, **config)
+
+    def connect(self):
+        # Imported on first connect: the driver is slow to load and the GUI
+        # should be on screen before we pay for it.
+        import mysql.connector
+        return mysql.connector.connect(**self.config)
+
+    def ping(self, raw):
+        raw.ping(reconnect=False)
+
+
+class SQLiteBackend:
+    """Embedded single-file database: WAL journal, no server, no network hop."""
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+
+    def connect(self):
+        raw = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                              detect_types=sqlite3.PARSE_DECLTYPES)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA temp_store=MEMORY")
+        return SQLiteConnection(raw)
+
+    def ping(self, raw):
+        raw.execute("SELECT 1")
+
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+# DATE / DATETIME columns come back as date objects, as they do from MySQL.
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+@lru_cache(maxsize=512)
+def _qmark(sql):
+    return sql.replace("%s", "?")
+
+
+class SQLiteConnection:
+    """Gives a sqlite3 connection the mysql.connector surface the app uses."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, buffered=None, dictionary=False, prepared=False):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def execute(self, sql, params=()):
+        return self._raw.execute(_qmark(sql), params)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._raw.close()
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+
+class SQLiteCursor:
+    def __init__(self, cur, dictionary=False):
+        self._cur = cur
+        if dictionary:
+            cur.row_factory = lambda c, row: {d[0]: v for d, v in zip(c.description, row)}
+
+    def execute(self, sql, params=()):
+        self._cur.execute(_qmark(sql), tuple(params))
+
+    def executemany(self, sql, seq):
+        self._cur.executemany(_qmark(sql), seq)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cur.fetchmany(size)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def close(self):
+        self._cur.close()
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+
+
+# ─────────────────────────────────────────────
+#  SHARED POOL
+# ─────────────────────────────────────────────
+_backend = None
+_pool = None
+_pool_lock = threading.Lock()
+
+def configure(backend=None, prepared=PREPARED, **options):
+    """Selects the storage backend ('mysql' or 'sqlite') and resets the pool.
+
+    `prepared` turns prepared hot statements on or off for the new pool.
+    Options go to the backend: MySQL connect() arguments, or path= for SQLite.
+    """
+    global _backend, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _backend = BACKENDS[backend or BACKEND](**options)
+        _pool = ConnectionPool(_backend.connect, ping=_backend.ping, prepared=prepared)
+    return _backend
+
+def get_backend():
+    if _backend is None:
+        get_pool()
+    return _backend
+
+def dialect():
+    return get_backend().name
+
+def get_pool():
+    global _backend, _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _backend = BACKENDS[BACKEND]()
+                _pool = ConnectionPool(_backend.connect, ping=_backend.ping)
+    return _pool
+
+def get_connection():
+    start = time.perf_counter()
+    try:
+        cnx = get_pool().get_connection()
+    except Exception as ex:
+        library_metrics.REGISTRY.record_acquire(time.perf_counter() - start, ex)
+        raise
+    library_metrics.REGISTRY.record_acquire(time.perf_counter() - start)
+    return cnx
+
+def warm_up(count=None):
+    return get_pool().warm_up(count)
+
+def pool_stats():
+    return get_pool().stats()
+
+library_metrics.REGISTRY.add_source("pool", pool_stats)
+library_metrics.REGISTRY.add_source("prepared", prepared_stats)
@@ -0,0 +1,134 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date
+
+from library_db import get_connection
+
+# ─────────────────────────────────────────────
+#  STREAMING EXPORT
+#  Rows come off an unbuffered cursor a batch at a time and go straight
+#  to the file through a chain of generators, so memory use stays flat
+#  no matter how many years of issue history are exported.
+# ─────────────────────────────────────────────
+FETCH_SIZE     = 2000
+PROGRESS_EVERY = 50000
+
+COLUMNS = {
+    "books":   ("bno", "bname", "auth", "price", "publ", "qty", "date_of_purchase"),
+    "members": ("mno", "mname", "date_of_membership", "addr", "mob"),
+    "issues":  ("bno", "mno", "d_o_issue", "d_o_ret"),
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+def build_query(target, start=None, end=None, mno=None):
+    """Returns (sql, params). Date range and member filters apply to issues only."""
+    cols = ", ".join(COLUMNS[target])
+    if target == "books":
+        return f"SELECT {cols} FROM bookrecords ORDER BY bno", ()
+    if target == "members":
+        return f"SELECT {cols} FROM member ORDER BY mno", ()
+    where, params = [], []
+    if mno:
+        where.append("mno = %s"); params.append(mno)
+    if start:
+        where.append("d_o_issue >= %s"); params.append(str(start))
+    if end:
+        where.append("d_o_issue <= %s"); params.append(str(end))
+    sql = f"SELECT {cols} FROM issue"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY d_o_issue, id", tuple(params)
+
+
+def stream_rows(cnx, sql, params=(), fetch_size=FETCH_SIZE):
+    cur = cnx.cursor(buffered=False)
+    cur.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(fetch_size)
+        if not rows:
+            break
+        yield from rows
+    cur.close()
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def csv_lines(rows, columns):
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    def line(values):
+        buf.seek(0); buf.truncate()
+        out.writerow(values)
+        return buf.getvalue()
+    yield line(columns)
+    for r in rows:
+        yield line([_plain(v) for v in r])
+
+
+def jsonl_lines(rows, columns):
+    for r in rows:
+        yield json.dumps(dict(zip(columns, map(_plain, r))), ensure_ascii=False) + "\n"
+
+
+def export(target, path, fmt=None, start=None, end=None, mno=None, progress=None):
+    """Writes `target` ('books', 'members', 'issues') to `path`; returns the row count.
+
+    `progress(rows_so_far)` is called every PROGRESS_EVERY rows.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    lines = csv_lines if fmt == "csv" else jsonl_lines
+    sql, params = build_query(target, start, end, mno)
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for r in rows:
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+            yield r
+
+    from library_migrations import ensure_current     # imports this module via library_fines
+    with get_connection() as cnx, open(path, "w", newline="", encoding="utf-8") as out:
+        ensure_current(cnx)         # issues are ordered by id, added in migration 2
+        batch = []
+        for line in lines(counted(stream_rows(cnx, sql, params)), COLUMNS[target]):
+            batch.append(line)
+            if len(batch) >= FETCH_SIZE:
+                out.writelines(batch)
+                batch.clear()
+        out.writelines(batch)
+    return count
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_export.py issues history.csv --from 2023-01-01
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Export books, members or issue history.")
+    p.add_argument("target", choices=sorted(COLUMNS))
+    p.add_argument("out_file")
+    p.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    p.add_argument("--from", dest="start", type=date.fromisoformat, help="issues on/after YYYY-MM-DD")
+    p.add_argument("--to", dest="end", type=date.fromisoformat, help="issues on/before YYYY-MM-DD")
+    p.add_argument("--member", help="only this member's issues")
+    args = p.parse_args(argv)
+
+    started = time.perf_counter()
+    n = export(args.target, args.out_file, args.format, args.start, args.end, args.member,
+               progress=lambda n: print(f"  {n:,} rows…", end="\r", flush=True))
+    elapsed = time.perf_counter() - started
+    print(f"{n:,} rows written to {args.out_file} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+from functools import lru_cache
+
+from library_db import dialect, get_connection
+import library_export
+
+# ─────────────────────────────────────────────
+#  OVERDUE & FINES
+#  Only issues still out past their due date are read, a chunk at a time,
+#  with the issue date already turned into a day number by the database.
+#  Due dates, days overdue and tiered fines are then computed for a whole
+#  chunk at once as array arithmetic (NumPy when installed).
+# ─────────────────────────────────────────────
+CHUNK_SIZE = 100_000
+RULES_PATH = os.environ.get("LIBRARY_FINE_RULES")     # JSON file overriding DEFAULT_RULES
+
+DEFAULT_RULES = {
+    "loan_days":  14,
+    "grace_days": 2,                                # overdue days forgiven before fines start
+    "tiers":      [[0, 1.0], [7, 2.0], [30, 5.0]],  # [from chargeable day, charge per day]
+    "cap":        500.0,                            # most one issue can be fined; 0 = no cap
+}
+
+# Issue date as a proleptic ordinal, the same numbering as date.toordinal().
+ISSUED_DAY = {
+    "mysql":  "TO_DAYS(d_o_issue) - 365",
+    "sqlite": "CAST(julianday(d_o_issue) - 1721424.5 AS INTEGER)",
+}
+OVERDUE_SQL = ("SELECT id, bno, mno, {day} FROM issue "
+               "WHERE d_o_ret IS NULL AND d_o_issue < %s")
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # Imported on first assessment, not with the module: the GUI imports
+    # this at startup and NumPy is slow to load.
+    try:
+        import numpy
+    except ImportError:     # optional: the plain-Python path gives identical results
+        return None
+    return numpy
+
+
+def overdue_sql():
+    return OVERDUE_SQL.format(day=ISSUED_DAY[dialect()])
+
+
+COLUMNS = ("issue_id", "bno", "mno", "due", "days_overdue", "fine")
+
+
+class Rules:
+    def __init__(self, loan_days, grace_days, tiers, cap):
+        tiers = sorted((int(start), float(rate)) for start, rate in tiers)
+        if not tiers or tiers[0][0] != 0:
+            raise ValueError("fine tiers must start at day 0")
+        self.loan_days = int(loan_days)
+        self.grace_days = int(grace_days)
+        self.tiers = tiers
+        self.cap = float(cap)
+
+    @classmethod
+    def load(cls, path=None):
+        """DEFAULT_RULES, overridden by the JSON file at `path` (or LIBRARY_FINE_RULES)."""
+        rules = dict(DEFAULT_RULES)
+        path = path or RULES_PATH
+        if path:
+            with open(path, encoding="utf-8") as f:
+                rules.update(json.load(f))
+        return cls(rules["loan_days"], rules["grace_days"], rules["tiers"], rules["cap"])
+
+    def _bands(self):
+        """(start, width, rate) per tier; the last band is open-ended."""
+        ends = [start for start, _ in self.tiers[1:]] + [None]
+        return [(start, None if end is None else end - start, rate)
+                for (start, rate), end in zip(self.tiers, ends)]
+
+
+def assess(issued_days, today, rules):
+    """Returns (due_days, days_overdue, fines) for a chunk of issue-day ordinals."""
+    np = _numpy()
+    if np is not None:
+        issued = np.asarray(issued_days, dtype=np.int64)
+        due = issued + rules.loan_days
+        overdue = np.maximum(today.toordinal() - due, 0)
+        chargeable = np.maximum(overdue - rules.grace_days, 0)
+        fines = np.zeros(len(issued))
+        for start, width, rate in rules._bands():
+            days = np.clip(chargeable - start, 0, width)
+            fines += days * rate
+        if rules.cap:
+            np.minimum(fines, rules.cap, out=fines)
+        return due, overdue, fines
+
+    t = today.toordinal()
+    bands = rules._bands()
+    due = [d + rules.loan_days for d in issued_days]
+    overdue = [max(t - d, 0) for d in due]
+    fines = []
+    for days in overdue:
+        chargeable = max(days - rules.grace_days, 0)
+        fine = sum(max(min(chargeable - start, width if width is not None else chargeable), 0) * rate
+                   for start, width, rate in bands)
+        fines.append(min(fine, rules.cap) if rules.cap else fine)
+    return due, overdue, fines
+
+
+class FinesReport:
+    def __init__(self, today, rules):
+        self.today = today
+        self.rules = rules
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._parts = []
+        self.ids = self.bnos = self.mnos = self.due = self.overdue = self.fines = []
+
+    def add(self, ids, bnos, mnos, due, overdue, fines):
+        self._parts.append((ids, bnos, mnos, due, overdue, fines))
+
+    def finish(self):
+        if self._parts:
+            np = _numpy()
+            cols = list(zip(*self._parts))
+            join = np.concatenate if np is not None else (lambda parts: [v for p in parts for v in p])
+            (self.ids, self.bnos, self.mnos,
+             self.due, self.overdue, self.fines) = [join(c) for c in cols]
+        self._parts = []
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    @property
+    def total(self):
+        return float(sum(self.fines))
+
+    def rows(self, mno=None):
+        """(issue_id, bno, mno, due, days_overdue, fine), largest fine first."""
+        n, np = self.count, _numpy()
+        if np is not None and n:
+            order = np.lexsort((-self.overdue, -self.fines))
+        else:
+            order = sorted(range(n), key=lambda i: (-self.fines[i], -self.overdue[i]))
+        for i in order:
+            if mno is not None and self.mnos[i] != mno:
+                continue
+            yield (int(self.ids[i]), int(self.bnos[i]), str(self.mnos[i]),
+                   date.fromordinal(int(self.due[i])), int(self.overdue[i]),
+                   round(float(self.fines[i]), 2))
+
+    def by_member(self, limit=None):
+        """[(mno, issues overdue, total fine)], largest total first."""
+        np = _numpy()
+        if np is not None and self.count:
+            members, inverse = np.unique(self.mnos, return_inverse=True)
+            totals = np.bincount(inverse, weights=self.fines)
+            counts = np.bincount(inverse)
+            order = np.argsort(-totals)[:limit]
+            return [(str(members[i]), int(counts[i]), round(float(totals[i]), 2)) for i in order]
+        totals = {}
+        for m, fine in zip(self.mnos, self.fines):
+            n, t = totals.get(m, (0, 0.0))
+            totals[m] = (n + 1, t + fine)
+        ranked = sorted(totals.items(), key=lambda kv: -kv[1][1])[:limit]
+        return [(m, n, round(t, 2)) for m, (n, t) in ranked]
+
+    def summary(self):
+        return (f"{self.count:,} overdue issue(s), fines {self.total:,.2f} as of {self.today} "
+                f"({self.elapsed * 1000:,.0f} ms{', numpy' if _numpy() is not None else ''})")
+
+
+def _columns(rows):
+    ids, bnos, mnos, days = zip(*rows)
+    mnos = ["" if m is None else m for m in mnos]      # np.unique can't sort None among str
+    np = _numpy()
+    if np is not None:
+        return (np.array(ids, dtype=np.int64), np.array(bnos, dtype=np.int64),
+                np.array(mnos, dtype=object), days)
+    return list(ids), list(bnos), mnos, days
+
+
+def run_assessment(today=None, rules=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Reads every overdue issue in chunks and returns a FinesReport.
+
+    `progress(rows_so_far)` is called after each chunk.
+    """
+    today = today or date.today()
+    rules = rules or Rules.load()
+    report = FinesReport(today, rules)
+    cutoff = date.fromordinal(today.toordinal() - rules.loan_days)     # issued before this = late
+    seen = 0
+    from library_migrations import ensure_current     # it imports this module
+    with get_connection() as cnx:
+        ensure_current(cnx)         # OVERDUE_SQL reads issue.id, added in migration 2
+        cur = cnx.cursor(buffered=False)
+        cur.execute(overdue_sql(), (cutoff,))
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            ids, bnos, mnos, issued = _columns(rows)
+            due, overdue, fines = assess(issued, today, rules)
+            report.add(ids, bnos, mnos, due, overdue, fines)
+            seen += len(rows)
+            if progress:
+                progress(seen)
+        cur.close()
+    return report.finish()
+
+
+def write_csv(report, path):
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        out.writelines(library_export.csv_lines(report.rows(), COLUMNS))
+    return path
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE (nightly):  python library_fines.py --csv fines-$(date +%F).csv
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Assess overdue issues and fines.")
+    p.add_argument("--date", type=date.fromisoformat, help="assess as of YYYY-MM-DD (default today)")
+    p.add_argument("--rules", help="JSON file of fine rules (default: built-in / LIBRARY_FINE_RULES)")
+    p.add_argument("--csv", metavar="FILE", help="write every overdue issue and its fine")
+    p.add_argument("--top", type=int, default=10, help="members to list by total fine (default 10)")
+    args = p.parse_args(argv)
+
+    report = run_assessment(args.date, Rules.load(args.rules),
+                            progress=lambda n: print(f"  {n:,} rows…", end="\r", flush=True))
+    print(report.summary() + " " * 10)
+    for mno, n, total in report.by_member(args.top):
+        print(f"  {mno:<20}{n:>6} overdue{total:>12,.2f}")
+    if args.csv:
+        write_csv(report, args.csv)
+        print(f"Written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+from datetime import date
+
+from library_db import get_connection
+import library_cache
+import library_migrations
+import library_store
+
+# ─────────────────────────────────────────────
+#  BULK CSV IMPORT
+#  Streams a CSV of any size, validates each row, and inserts in chunked
+#  transactions with executemany. The number of rows consumed is saved
+#  in import_checkpoints inside the same transaction as the rows
+#  themselves, so a failed run resumes exactly where it stopped.
+# ─────────────────────────────────────────────
+CHUNK_SIZE = 5000
+
+
+def _text(value, field, max_len):
+    value = value.strip()
+    if not value:
+        raise ValueError(f"{field} is empty")
+    if len(value) > max_len:
+        raise ValueError(f"{field} longer than {max_len} characters")
+    return value
+
+def _int(value, field):
+    try:
+        n = int(value.strip())
+    except ValueError:
+        raise ValueError(f"{field} is not a whole number: {value!r}")
+    if n < 0:
+        raise ValueError(f"{field} is negative")
+    return n
+
+def _date(value, field):
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"{field} is not a YYYY-MM-DD date: {value!r}")
+
+
+def book_row(f):
+    qty = _int(f[5], "qty")
+    return (_int(f[0], "bno"), _text(f[1], "bname", 100), _text(f[2], "auth", 100),
+            _int(f[3], "price"), _text(f[4], "publ", 100), qty,
+            _date(f[6], "date_of_purchase"), qty)         # every copy starts on the shelf
+
+def member_row(f):
+    return (_text(f[0], "mno", 20), _text(f[1], "mname", 100),
+            _date(f[2], "date_of_membership"), _text(f[3], "addr", 200),
+            _text(f[4], "mob", 15))
+
+
+# target -> (CSV columns, row validator, INSERT taking the validator's output)
+TARGETS = {
+    "books":   (("bno", "bname", "auth", "price", "publ", "qty", "date_of_purchase"),
+                book_row, library_store.INSERT_BOOK),
+    "members": (("mno", "mname", "date_of_membership", "addr", "mob"),
+                member_row, library_store.INSERT_MEMBER),
+}
+
+
+class ImportReport:
+    def __init__(self, target, path, resumed_from):
+        self.target = target
+        self.path = path
+        self.resumed_from = resumed_from
+        self.rows_read = 0          # rows consumed this run (excludes skipped ones)
+        self.inserted = 0
+        self.rejected = 0
+        self.rejects_path = None
+        self.started = time.perf_counter()
+        self.finished = False
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        s = (f"{self.inserted} inserted, {self.rejected} rejected, "
+             f"{self.rows_read} rows in {self.elapsed:.1f}s ({self.rows_per_sec:,.0f} rows/s)")
+        if self.resumed_from:
+            s += f", resumed after row {self.resumed_from}"
+        return s
+
+
+def checkpoint_key(target, path):
+    return hashlib.sha1(f"{target}:{os.path.abspath(path)}".encode()).hexdigest()
+
+
+def _load_checkpoint(cur, key):
+    cur.execute("SELECT rows_done FROM import_checkpoints WHERE source = %s", (key,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _save_checkpoint(cur, key, path, rows_done):
+    cur.execute("DELETE FROM import_checkpoints WHERE source = %s", (key,))
+    cur.execute("INSERT INTO import_checkpoints(source, file_name, rows_done, updated_on) "
+                "VALUES (%s, %s, %s, %s)",
+                (key, os.path.basename(path)[:255], rows_done, time.strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _data_rows(reader, columns):
+    """Yields (row_number, fields), skipping a header row if there is one."""
+    for n, fields in enumerate(reader, start=1):
+        if n == 1 and fields and fields[0].strip().lower() == columns[0]:
+            continue
+        yield n, fields
+
+
+def import_csv(target, path, chunk_size=CHUNK_SIZE, restart=False, progress=None):
+    """Imports `path` into the table for `target` ('books' or 'members').
+
+    Rejected rows are written, with the reason, to <path>.rejects.csv.
+    `progress(report)` is called after every committed chunk.
+    """
+    columns, validate, sql = TARGETS[target]
+    key = checkpoint_key(target, path)
+
+    with get_connection() as cnx:
+        library_migrations.ensure_current(cnx)
+        cur = cnx.cursor()
+        done = 0 if restart else _load_checkpoint(cur, key)
+        cnx.commit()
+        report = ImportReport(target, path, done)
+        report.rejects_path = path + ".rejects.csv"
+
+        resume = done and _trim_rejects(report.rejects_path, done)
+        with open(path, newline="", encoding="utf-8-sig") as src, \
+             open(report.rejects_path, "a" if resume else "w",
+                  newline="", encoding="utf-8") as rej:
+            rejects = csv.writer(rej)
+            if not resume:
+                rejects.writerow(["row", "reason"] + list(columns))
+
+            batch, last = [], done
+            for n, fields in _data_rows(csv.reader(src), columns):
+                if n <= done:
+                    continue
+                last = n
+                report.rows_read += 1
+                try:
+                    if len(fields) != len(columns):
+                        raise ValueError(f"expected {len(columns)} fields, got {len(fields)}")
+                    batch.append((n, validate(fields), fields))
+                except ValueError as ex:
+                    report.rejected += 1
+                    rejects.writerow([n, str(ex)] + fields)
+                if len(batch) >= chunk_size:
+                    _flush(cnx, cur, sql, batch, rejects, report, key, path, last)
+                    rej.flush()         # rejects of committed rows survive a crash
+                    batch = []
+                    if progress:
+                        progress(report)
+            _flush(cnx, cur, sql, batch, rejects, report, key, path, last)
+
+        # Imported codes may have been looked up (and cached as missing) before.
+        (library_cache.BOOKS if target == "books" else library_cache.MEMBERS).clear()
+        report.finished = True
+        if progress:
+            progress(report)
+        return report
+
+
+def _trim_rejects(path, rows_done):
+    """Drops rejects past the checkpoint, whose rows are about to be read
+    again. False if there is no rejects file to append to."""
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            lines = list(csv.reader(f))
+    except FileNotFoundError:
+        return False
+    keep = lines[:1] + [r for r in lines[1:] if r and int(r[0]) <= rows_done]
+    if len(keep) < len(lines):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(keep)
+    return True
+
+
+def _flush(cnx, cur, sql, batch, rejects, report, key, path, rows_done):
+    """Inserts one chunk and advances the checkpoint in a single transaction."""
+    try:
+        if batch:
+            cur.executemany(sql, [values for _, values, _ in batch])
+        report.inserted += len(batch)
+    except Exception:
+        # Something in the chunk conflicts (usually a duplicate key): redo it
+        # row by row so only the offending rows are rejected.
+        cnx.rollback()
+        for n, values, fields in batch:
+            try:
+                cur.execute(sql, values)
+                report.inserted += 1
+            except Exception as ex:
+                report.rejected += 1
+                rejects.writerow([n, str(ex)] + fields)
+    _save_checkpoint(cur, key, path, rows_done)
+    cnx.commit()
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_import.py books acquisitions.csv
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Bulk import books or members from CSV.")
+    p.add_argument("target", choices=sorted(TARGETS))
+    p.add_argument("csv_file")
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                   help=f"rows per transaction (default {CHUNK_SIZE})")
+    p.add_argument("--restart", action="store_true",
+                   help="ignore any saved checkpoint and start from the first row")
+    args = p.parse_args(argv)
+
+    def show(report):
+        end = "\n" if report.finished else "\r"
+        print(f"  {report.summary()}", end=end, flush=True)
+
+    report = import_csv(args.target, args.csv_file, args.chunk_size, args.restart, show)
+    if report.rejected:
+        print(f"Rejected rows written to {report.rejects_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
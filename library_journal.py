@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from library_db import get_connection, is_rolled_back, is_unavailable
+import library_migrations
+from library_store import BOOK_BY_CODE, MEMBER_BY_CODE, NotAvailable, Store
+
+# ─────────────────────────────────────────────
+#  OFFLINE JOURNAL
+#  While the server can't be reached, desk writes are appended to a local
+#  JSON Lines file, each line fsync'd before the desk is told it was saved.
+#  Once the server is back they are replayed in order, REPLAY_BATCH per
+#  transaction. The last sequence number replayed is stored in
+#  journal_checkpoints in the same transaction, so a replay cut short
+#  resumes without applying anything twice. An entry the database no
+#  longer accepts (book deleted meanwhile, copy gone) is a conflict: it is
+#  undone on its own, logged to <journal>.conflicts, and replay goes on.
+# ─────────────────────────────────────────────
+JOURNAL_PATH = os.environ.get("LIBRARY_JOURNAL_PATH", "offline.journal")
+REPLAY_BATCH = 200
+REPLAY_RETRIES = 3      # attempts per batch when the server rolls it back (deadlock)
+
+QUEUED = "queued"       # returned in place of a result when a write was journalled
+
+# Store operations a desk can journal -> conflict when it changes no row.
+OPS = {
+    "add_book":      None,
+    "update_book":   None,
+    "delete_book":   "book already deleted",
+    "add_member":    None,
+    "update_member": None,
+    "delete_member": "member already deleted",
+    "issue_book":    None,
+    "return_book":   "no open issue for this book and member",
+    "issue_many":    None,
+    "return_many":   None,
+}
+
+# op -> (lookup, argument index, what) that must still find a row first.
+# (An UPDATE that changes nothing reports 0 rows on MySQL, so the row
+# count can't tell a deleted book from an unchanged one.)
+MUST_EXIST = {
+    "update_book":   (BOOK_BY_CODE, 0, "book"),
+    "update_member": (MEMBER_BY_CODE, 0, "member"),
+    "issue_book":    (MEMBER_BY_CODE, 1, "member"),
+}
+
+
+class Conflict(Exception):
+    """A journalled write the database no longer accepts."""
+
+
+class OutcomeUnknown(Exception):
+    """The connection dropped after a write was sent, so it may or may not
+    have been saved. Such a write is not journalled: replaying it could
+    apply it twice."""
+
+
+class Journal:
+    """Append-only JSON Lines file: a header line naming the journal, then
+    one line per write with a sequence number."""
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_PATH
+        self._lock = threading.Lock()
+        self._id = None
+        self._seq = None        # last seq written; None until the file is read
+        self._done = 0          # last seq known to be in the database
+
+    def _read(self):
+        """(journal id, entries). A last line cut short by a crash is dropped."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None, []
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(self.path, "r+b") as f:       # so the next append starts a fresh line
+                f.truncate(end)
+        lines = data[:end].splitlines()
+        if not lines:
+            return None, []
+        return json.loads(lines[0])["journal"], [json.loads(line) for line in lines[1:]]
+
+    def _load(self):
+        journal_id, entries = self._read()
+        if journal_id != self._id:
+            self._id, self._done = journal_id, 0
+        if entries:         # a compacted journal starts after what was replayed
+            self._done = max(self._done, entries[0]["seq"] - 1)
+        self._seq = entries[-1]["seq"] if entries else 0
+        return entries
+
+    def append(self, op, *args):
+        """Writes one operation durably; returns its sequence number."""
+        if op not in OPS:
+            raise ValueError(f"{op} can't be journalled")
+        with self._lock:
+            if self._seq is None:
+                self._load()
+            lines = []
+            if self._id is None:
+                self._id = uuid.uuid4().hex
+                lines.append({"journal": self._id, "created": time.strftime("%Y-%m-%d %H:%M:%S")})
+            self._seq += 1
+            lines.append({"seq": self._seq, "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                          "op": op, "args": list(args)})
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(line, default=str) + "\n" for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            return self._seq
+
+    def entries(self):
+        """(journal id, entries) as on disk now."""
+        with self._lock:
+            entries = self._load()
+            return self._id, entries
+
+    def pending(self):
+        """Entries written and not yet replayed (seqs run on without gaps)."""
+        with self._lock:
+            if self._seq is None:
+                self._load()
+            return self._seq - self._done
+
+    def replayed(self, upto):
+        """Notes that entries up to `upto` are in the database (the file is
+        compacted later, by clear)."""
+        with self._lock:
+            self._done = max(self._done, upto)
+
+    def clear(self, upto):
+        """Drops the entries up to `upto` once they are replayed: removes the
+        journal, or rewrites it with only the later ones if more was written
+        meanwhile or the replay stopped part-way."""
+        with self._lock:
+            entries = self._load()
+            if self._id is None:
+                return
+            rest = [e for e in entries if e["seq"] > upto]
+            if not rest:
+                os.remove(self.path)
+                self._id, self._seq, self._done = None, 0, 0
+                return
+            self._done = max(self._done, upto)
+            if len(rest) < len(entries):
+                with open(self.path, "rb") as f:
+                    header = f.readline()
+                tmp = self.path + ".tmp"
+                with open(tmp, "wb") as f:           # same journal id: its checkpoint still applies
+                    f.write(header)
+                    f.write("".join(json.dumps(e, default=str) + "\n" for e in rest).encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+
+    def log_conflicts(self, conflicts):
+        if conflicts:
+            with open(self.path + ".conflicts", "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(c, default=str) + "\n" for c in conflicts)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+JOURNAL = Journal()
+
+
+# ─────────────────────────────────────────────
+#  REPLAY
+# ─────────────────────────────────────────────
+class ReplayReport:
+    def __init__(self):
+        self.applied = 0
+        self.conflicts = []
+        self.started = time.perf_counter()
+
+    def summary(self):
+        s = (f"{self.applied} offline change(s) sent in "
+             f"{time.perf_counter() - self.started:.1f}s")
+        if self.conflicts:
+            s += f", {len(self.conflicts)} conflict(s)"
+        return s
+
+
+def _exists(s, sql, code):
+    s.cur.execute(sql, (code,))
+    return bool(s.cur.fetchall())
+
+
+def _apply(s, op, args):
+    """Runs one journalled write; returns reasons some of it was refused
+    (batch ops). Raises Conflict when all of it must be undone."""
+    if op in MUST_EXIST:
+        sql, i, what = MUST_EXIST[op]
+        if not _exists(s, sql, args[i]):
+            raise Conflict(f"{what} {args[i]} no longer exists")
+    try:
+        result = getattr(s, op)(*args)
+    except NotAvailable as ex:
+        gone = not _exists(s, BOOK_BY_CODE, args[0])
+        raise Conflict(f"book {args[0]} no longer exists" if gone else str(ex))
+    except Exception as ex:
+        if type(ex).__name__ == "IntegrityError":          # on any backend
+            raise Conflict(f"code {args[0]} already exists")
+        raise
+    if op in ("issue_many", "return_many"):
+        return [f"{code}: {reason}" for code, reason in result.failed]
+    if not result and OPS[op]:
+        raise Conflict(OPS[op])
+    return []
+
+
+def _load_checkpoint(cur, journal_id):
+    cur.execute("SELECT seq_done FROM journal_checkpoints WHERE journal = %s", (journal_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _save_checkpoint(cur, journal_id, seq):
+    cur.execute("DELETE FROM journal_checkpoints WHERE journal = %s", (journal_id,))
+    cur.execute("INSERT INTO journal_checkpoints(journal, seq_done, updated_on) VALUES (%s, %s, %s)",
+                (journal_id, seq, time.strftime("%Y-%m-%d %H:%M:%S")))
+
+
+_replay_lock = threading.Lock()
+
+def replay(journal=None, batch=REPLAY_BATCH, progress=None):
+    """Sends the journal to the database. Stops, keeping what was committed,
+    if the server goes away again. `progress(report)` follows each batch."""
+    with _replay_lock:          # one at a time, or both would send the same entries
+        return _replay(journal or JOURNAL, batch, progress)
+
+
+def _replay_chunk(s, journal_id, chunk):
+    """Applies one batch and its checkpoint in the open transaction; returns
+    the conflicts. Each entry has its own savepoint, so a conflict undoes
+    only that entry."""
+    conflicts = []
+    s.begin()
+    for e in chunk:
+        try:
+            with s.savepoint("journal"):
+                reasons = _apply(s, e["op"], e["args"])
+        except Conflict as ex:
+            reasons = [str(ex)]
+        except Exception as ex:
+            if is_unavailable(ex) or is_rolled_back(ex):
+                raise
+            reasons = [f"{type(ex).__name__}: {ex}"]    # bad data: never going to apply
+        conflicts += [dict(e, reason=r) for r in reasons]
+    _save_checkpoint(s.cur, journal_id, chunk[-1]["seq"])
+    return conflicts
+
+
+def _replay(journal, batch, progress):
+    report = ReplayReport()
+    journal_id, entries = journal.entries()
+    if not entries:
+        return report
+    sent = 0
+    try:
+        with get_connection() as cnx:
+            library_migrations.ensure_current(cnx)
+            s = Store(cnx)
+            sent = _load_checkpoint(s.cur, journal_id)
+            cnx.commit()
+            journal.replayed(sent)
+            pending = [e for e in entries if e["seq"] > sent]
+            for i in range(0, len(pending), batch):
+                chunk = pending[i:i + batch]
+                for attempt in range(1, REPLAY_RETRIES + 1):
+                    try:
+                        conflicts = _replay_chunk(s, journal_id, chunk)
+                        journal.log_conflicts(conflicts)    # before the commit: a retry may log twice, never lose one
+                        s.commit()
+                        break
+                    except Exception as ex:
+                        # A deadlock has already undone the whole batch, savepoints
+                        # included: start it again rather than blame one entry.
+                        if not is_rolled_back(ex) or attempt == REPLAY_RETRIES:
+                            raise
+                        s.rollback()
+                sent = chunk[-1]["seq"]
+                journal.replayed(sent)
+                report.applied += len(chunk)
+                report.conflicts += conflicts
+                if progress:
+                    progress(report)
+    finally:
+        if sent:
+            journal.clear(sent)     # even when cut short: keep only what is still to send
+    return report
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_journal.py [status|replay|conflicts]
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Offline write journal.")
+    p.add_argument("command", nargs="?", default="status", choices=("status", "replay", "conflicts"))
+    p.add_argument("--path", default=JOURNAL_PATH, help=f"journal file (default {JOURNAL_PATH})")
+    p.add_argument("--batch", type=int, default=REPLAY_BATCH,
+                   help=f"writes per transaction (default {REPLAY_BATCH})")
+    args = p.parse_args(argv)
+    journal = Journal(args.path)
+
+    if args.command == "status":
+        _, entries = journal.entries()
+        print(f"{len(entries)} write(s) waiting in {args.path}")
+        for e in entries[:20]:
+            print(f"  #{e['seq']:<6} {e['at']}  {e['op']}{tuple(e['args'])}")
+    elif args.command == "replay":
+        report = replay(journal, args.batch)
+        print(report.summary())
+        for c in report.conflicts:
+            print(f"  #{c['seq']:<6} {c['op']}{tuple(c['args'])}: {c['reason']}")
+    else:
+        try:
+            with open(args.path + ".conflicts", encoding="utf-8") as f:
+                for line in f:
+                    c = json.loads(line)
+                    print(f"  #{c['seq']:<6} {c['at']}  {c['op']}{tuple(c['args'])}: {c['reason']}")
+        except FileNotFoundError:
+            print("No conflicts recorded.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
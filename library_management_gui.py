@@ -1,15 +1,94 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+_T0 = time.perf_counter()   # startup clock starts before the heavy imports
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-import mysql.connector
 
 # ─────────────────────────────────────────────
-#  DB CONNECTION
+#  DB CONNECTION  (pooled — see library_db.py)
 # ─────────────────────────────────────────────
-DB_CONFIG = dict(user="root", host="localhost", passwd="1234", database="Library")
-
-def get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+from library_db import POOL_SIZE, DatabaseUnavailable, get_connection, is_unavailable, warm_up
+from library_store import run as in_session
+import library_export
+import library_fines
+import library_import
+import library_journal
+import library_metrics
+import library_migrations
+import library_search
+import library_snapshot
+import library_stats
+import library_store
+
+PAGE_SIZE = int(os.environ.get("LIBRARY_PAGE_SIZE", "200"))
+
+class CursorSource:
+    """Streams a query's rows page by page from one open cursor.
+
+    The pooled connection is held only while rows remain; it is returned once
+    the cursor is drained, or dropped if the source is abandoned part-way.
+    A query with its own LIMIT passes it as `limit` and is read in full on the
+    first fetch, so its connection always goes back to the pool.
+    fetch() runs on a DB worker; close() may be called from the Tk thread.
+    """
+
+    def __init__(self, sql, params=(), page_size=PAGE_SIZE, setup=None, limit=None):
+        self.sql = sql
+        self.params = params
+        self.page_size = page_size
+        self.setup = setup          # optional setup(cnx) run before the query
+        self.limit = limit
+        self.exhausted = False
+        self._cnx = self._cur = None
+        self._ahead = []            # one row read past the page: proves more remain
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        with self._lock:
+            if self._closed or self.exhausted:
+                self._release()
+                return []
+            if self._cnx is None:
+                self._cnx = get_connection()
+                if self.setup is not None:
+                    self.setup(self._cnx)
+                self._cur = self._cnx.cursor()
+                self._cur.execute(self.sql, self.params)
+            if self.limit is not None:
+                rows = self._cur.fetchall()
+                self.exhausted = True
+            else:
+                rows = self._ahead + self._cur.fetchmany(self.page_size + 1 - len(self._ahead))
+                self._ahead = rows[self.page_size:]
+                del rows[self.page_size:]
+                self.exhausted = not self._ahead
+            if self.exhausted or self._closed:
+                self._release()
+            return rows
+
+    def close(self):
+        self._closed = True
+        if self._lock.acquire(blocking=False):     # a running fetch() cleans up itself
+            try:
+                self._release()
+            finally:
+                self._lock.release()
+
+    def _release(self):
+        if self._cnx is None:
+            return
+        cnx, self._cnx, self._cur = self._cnx, None, None
+        self._ahead = []
+        if self.exhausted:
+            cnx.close()
+        else:
+            cnx.discard()       # unread rows on the wire: don't hand it to someone else
 
 
 # ─────────────────────────────────────────────
@@ -82,27 +161,116 @@ def build_form(parent, fields, bg=PANEL):
 
 
 # ─────────────────────────────────────────────
-#  TOAST NOTIFICATION
+#  NOTIFICATIONS
+#  One toast window, made on first use and hidden between messages.
+#  Messages queue and show one at a time. A burst with the same key (a
+#  run of scanned returns) becomes one message with a count, not a popup
+#  each. Nothing here forces a layout pass.
 # ─────────────────────────────────────────────
-def toast(root, message, color=SUCCESS):
-    win = tk.Toplevel(root)
-    win.overrideredirect(True)
-    win.attributes("-topmost", True)
-    win.configure(bg=color)
-    tk.Label(win, text=f"  {message}  ", font=FONT_BTN,
-             bg=color, fg="#0f1117", pady=10, padx=16).pack()
-    # Position bottom-right
-    root.update_idletasks()
-    x = root.winfo_x() + root.winfo_width() - 340
-    y = root.winfo_y() + root.winfo_height() - 80
-    win.geometry(f"+{x}+{y}")
-    win.after(2400, win.destroy)
+TOAST_MS      = 2400
+TOAST_BUSY_MS = 900         # per message while others are waiting
+MAX_QUEUED    = 20          # beyond this the oldest waiting messages are dropped
+
+
+class _Note:
+    __slots__ = ("key", "text", "plural", "color", "count")
+
+    def __init__(self, key, text, plural, color, count):
+        self.key, self.text, self.plural, self.color, self.count = key, text, plural, color, count
+
+    def label(self):
+        if self.count == 1:
+            return self.text
+        return self.plural.format(n=self.count) if self.plural else f"{self.text}  (×{self.count})"
+
+
+class NotificationManager:
+    def __init__(self, root):
+        self.root = root
+        self._win = self._label = None
+        self._current = None
+        self._shown_at = 0.0
+        self._queue = deque()
+        self._job = None
+
+    def notify(self, text, color=SUCCESS, key=None, plural=None, count=1):
+        """Shows `text`. Messages with the same key (default: the text) that
+        arrive while one is on screen or waiting are merged: their counts
+        add up and `plural` (with {n}) is shown instead."""
+        key = key or text
+        for note in ([self._current] if self._current else []) + list(self._queue):
+            if note.key == key:
+                note.count += count
+                note.text, note.color = text, color
+                if note is self._current:
+                    self._render()
+                    self._shown_at = time.monotonic()      # keep it up while the burst lasts
+                    self._schedule()
+                return
+        note = _Note(key, text, plural, color, count)
+        if self._current is None:
+            self._show(note)
+            return
+        self._queue.append(note)
+        if len(self._queue) > MAX_QUEUED:
+            self._queue.popleft()
+        self._schedule()            # others waiting: the current one gets less time
+
+    def _surface(self):
+        if self._win is None:
+            self._win = tk.Toplevel(self.root)
+            self._win.withdraw()
+            self._win.overrideredirect(True)
+            self._win.attributes("-topmost", True)
+            self._label = tk.Label(self._win, font=FONT_BTN, fg="#0f1117", pady=10, padx=16)
+            self._label.pack()
+        return self._win
+
+    def _render(self):
+        note = self._current
+        self._win.configure(bg=note.color)
+        self._label.config(text=f"  {note.label()}  ", bg=note.color)
+
+    def _show(self, note):
+        win = self._surface()
+        self._current = note
+        self._shown_at = time.monotonic()
+        self._render()
+        # Bottom-right of the main window, from its last known geometry.
+        root = self.root
+        x = root.winfo_x() + root.winfo_width() - 340
+        y = root.winfo_y() + root.winfo_height() - 80
+        win.geometry(f"+{x}+{y}")
+        win.deiconify()
+        self._schedule()
+
+    def _schedule(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+        shown_ms = (time.monotonic() - self._shown_at) * 1000
+        due = (TOAST_BUSY_MS if self._queue else TOAST_MS) - shown_ms
+        self._job = self.root.after(max(0, int(due)), self._next)
+
+    def _next(self):
+        self._job = None
+        if self._queue:
+            self._show(self._queue.popleft())
+        else:
+            self._current = None
+            self._win.withdraw()
 
 
 # ─────────────────────────────────────────────
 #  RESULTS TABLE
 # ─────────────────────────────────────────────
-def build_table(parent, columns, bg=PANEL):
+_table_style_registered = False
+
+def register_table_style():
+    """Configures the Custom.Treeview style once per process."""
+    global _table_style_registered
+    if _table_style_registered:
+        return
+    _table_style_registered = True
     style = ttk.Style()
     style.theme_use("clam")
     style.configure("Custom.Treeview",
@@ -116,20 +284,295 @@ def build_table(parent, columns, bg=PANEL):
               background=[("selected", ACCENT)],
               foreground=[("selected", "#0f1117")])
 
-    frame = styled_frame(parent, bg=bg)
-    frame.pack(fill="both", expand=True, padx=20, pady=10)
 
-    tree = ttk.Treeview(frame, columns=columns, show="headings",
-                        style="Custom.Treeview", height=10)
-    for col in columns:
-        tree.heading(col, text=col)
-        tree.column(col, anchor="center", width=max(100, len(col)*12))
+class VirtualTable:
+    """Results table that only materialises the rows currently in view.
+
+    The Treeview holds one item per visible line; scrolling rewrites those
+    items from an in-memory row buffer, and more pages are pulled from the
+    row source in the background as the view nears the end of the buffer.
+    """
+    ROW_HEIGHT = 28
+
+    def __init__(self, parent, columns, bg=PANEL):
+        register_table_style()
+        self.root = parent.winfo_toplevel()
+        frame = styled_frame(parent, bg=bg)
+        frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+        self.tree = ttk.Treeview(frame, columns=columns, show="headings",
+                                 style="Custom.Treeview", height=10)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, anchor="center", width=max(100, len(col)*12))
+
+        self.sb = ttk.Scrollbar(frame, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.sb.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1) or "break")
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1) or "break")
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1) or "break")
+
+        self._rows = []
+        self._source = None
+        self._fetching = False
+        self._offset = 0
+        self._visible = 10
+        self._shown = []         # values currently rendered in each visible slot
+        self._key = f"table-{id(self)}"
+
+    # ── feeding rows ────────────────────────
+    def set_rows(self, rows):
+        """Shows a fully known list of rows."""
+        self.close_source()
+        self._rows = list(rows)
+        self._offset = 0
+        self._render()
+
+    def set_source(self, source, on_first_page=None):
+        """Shows rows streamed from `source` (see CursorSource)."""
+        self.close_source()
+        self._rows = []
+        self._offset = 0
+        self._source = source
+        self._render()
+        self._fetch_more(on_first_page)
+
+    def update_rows(self, rows):
+        """Replaces the rows but keeps the scroll position. Only the visible
+        lines whose values changed are rewritten."""
+        self.close_source()
+        self._rows = list(rows)
+        self._render()
+
+    def clear(self):
+        self.set_rows([])
+
+    def close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        self._fetching = False
+
+    def _fetch_more(self, then=None):
+        source = self._source
+        if source is None or source.exhausted or self._fetching:
+            return
+        self._fetching = True
+
+        def done(rows):
+            if source is not self._source:
+                return
+            self._fetching = False
+            self._rows.extend(rows)
+            self._render()
+            if then is not None:
+                then(self._rows)
+
+        def failed(ex):
+            if source is not self._source:
+                return          # e.g. the abandoned cursor was closed mid-fetch
+            self._fetching = False
+            messagebox.showerror("Error", str(ex))
+
+        self.root.db.submit(source.fetch, done, key=self._key, on_error=failed)
+
+    # ── viewport ────────────────────────────
+    def scroll(self, lines):
+        self._offset += lines
+        self._render()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * self._total())
+        elif args[0] == "scroll":
+            step = self._visible if args[2] == "pages" else 1
+            self._offset += int(args[1]) * step
+        self._render()
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.ROW_HEIGHT) // self.ROW_HEIGHT)
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+
+    def _total(self):
+        total = len(self._rows)
+        if self._source is not None and not self._source.exhausted:
+            total += self._source.page_size      # room to scroll into the next page
+        return max(total, 1)
+
+    def _render(self):
+        self._offset = max(0, min(self._offset, len(self._rows) - self._visible))
+        window = self._rows[self._offset:self._offset + self._visible]
+
+        items = self.tree.get_children()
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+            del self._shown[len(window):]
+        for i, values in enumerate(window):
+            values = tuple(values)
+            if i < len(items):
+                if self._shown[i] != values:
+                    self.tree.item(items[i], values=values)
+                    self._shown[i] = values
+            else:
+                self.tree.insert("", "end", values=values)
+                self._shown.append(values)
+
+        total = self._total()
+        self.sb.set(self._offset / total, min(1.0, (self._offset + self._visible) / total))
+
+        if len(self._rows) - (self._offset + self._visible) < self._visible:
+            self._fetch_more()
+
+
+def build_table(parent, columns, bg=PANEL):
+    return VirtualTable(parent, columns, bg=bg)
+
+
+def show_results(root, table, source):
+    def first_page(rows):
+        if not rows:
+            root.notify("No records found.", color=MUTED)
+    table.set_source(source, on_first_page=first_page)
+
+
+def show_rows(root, table, rows):
+    table.set_rows(rows)
+    if not rows:
+        root.notify("No records found.", color=MUTED)
+
+
+SEARCH_DEBOUNCE_MS = int(os.environ.get("LIBRARY_SEARCH_DEBOUNCE_MS", "80"))
+
+class LiveSearch:
+    """Calls search(text) once typing in `entry` pauses for SEARCH_DEBOUNCE_MS.
+
+    Only the pause sends a query, not every keystroke. The search should
+    submit with a fixed DbExecutor key, so a query that a newer keystroke
+    has superseded is cancelled, or its result dropped.
+    """
+
+    def __init__(self, entry, search, delay_ms=SEARCH_DEBOUNCE_MS):
+        self.entry = entry
+        self.search = search
+        self.delay_ms = delay_ms
+        self._pending = None
+        self._last = None
+        entry.bind("<KeyRelease>", self._typed, add="+")
 
-    sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
-    tree.configure(yscrollcommand=sb.set)
-    tree.pack(side="left", fill="both", expand=True)
-    sb.pack(side="right", fill="y")
-    return tree
+    def _typed(self, event):
+        if event.keysym in ("Return", "KP_Enter", "Tab"):
+            return
+        if self._pending is not None:
+            self.entry.after_cancel(self._pending)
+        self._pending = self.entry.after(self.delay_ms, self._fire)
+
+    def _fire(self):
+        self._pending = None
+        text = self.entry.get().strip()
+        if text != self._last:          # arrows, shift etc. don't re-query
+            self._last = text
+            self.search(text)
+
+
+# ─────────────────────────────────────────────
+#  BACKGROUND DB EXECUTOR
+# ─────────────────────────────────────────────
+class DbExecutor:
+    """Runs DB work on worker threads and hands results back on the Tk thread.
+
+    Submitting with a `key` supersedes any earlier request with the same key:
+    it is cancelled if it has not started, and its result is dropped if it has.
+    """
+    POLL_MS   = 16      # ~60 fps
+    BUDGET_S  = 0.008   # max time spent dispatching callbacks per tick
+
+    def __init__(self, root, workers=POOL_SIZE):
+        self.root = root
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._results = queue.SimpleQueue()
+        self._latest = {}        # key -> (generation, future)
+        self._busy = 0
+        self._busy_listeners = []
+        self._closed = False
+        self._poll()
+
+    def submit(self, work, on_done=None, key=None, on_error=None):
+        gen = None
+        if key is not None:
+            prev_gen, prev = self._latest.get(key, (0, None))
+            if prev is not None:
+                prev.cancel()
+            gen = prev_gen + 1
+        fut = self._workers.submit(work)
+        if key is not None:
+            self._latest[key] = (gen, fut)
+        self._set_busy(+1)
+        fut.add_done_callback(
+            lambda f: self._results.put((self._finish, (f, key, gen, on_done, on_error))))
+        return fut
+
+    def cancel(self, key):
+        """Supersedes the pending request under `key` without starting another."""
+        gen, prev = self._latest.get(key, (0, None))
+        if prev is not None:
+            prev.cancel()
+            self._latest[key] = (gen + 1, None)
+
+    def post(self, fn, *args):
+        """Schedules fn(*args) on the Tk thread; safe to call from workers."""
+        self._results.put((fn, args))
+
+    def on_busy_change(self, listener):
+        self._busy_listeners.append(listener)
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def _set_busy(self, delta):
+        self._busy += delta
+        for listener in self._busy_listeners:
+            listener(self._busy)
+
+    def _finish(self, fut, key, gen, on_done, on_error):
+        self._set_busy(-1)
+        if key is not None:
+            latest_gen, _ = self._latest.get(key, (None, None))
+            if latest_gen != gen:
+                return                      # superseded by a newer request
+            del self._latest[key]
+        if fut.cancelled():
+            return
+        ex = fut.exception()
+        if ex is not None:
+            library_metrics.REGISTRY.record_error(ex)
+            (on_error or (lambda e: messagebox.showerror("Error", str(e))))(ex)
+        elif on_done is not None:
+            on_done(fut.result())
+
+    def _poll(self):
+        if self._closed:
+            return
+        deadline = time.perf_counter() + self.BUDGET_S
+        while time.perf_counter() < deadline:
+            try:
+                fn, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as ex:
+                messagebox.showerror("Error", str(ex))
+        self.root.after(self.POLL_MS, self._poll)
+
+    def shutdown(self):
+        self._closed = True
+        self._workers.shutdown(wait=False, cancel_futures=True)
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -166,13 +609,24 @@ class BookTab(tk.Frame):
         styled_label(srow, "Book Code:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
         self.search_entry = styled_entry(srow, width=20)
         self.search_entry.pack(side="left", padx=6)
+        self.search_entry.bind("<Return>", lambda e: self.search_book())
+        LiveSearch(self.search_entry, self._codes_like)
         styled_button(srow, "🔍  Search", self.search_book, width=12).pack(side="left", padx=4)
         styled_button(srow, "✏️  Update", self.update_book, color="#6366f1", fg=TEXT, width=12).pack(side="left", padx=4)
 
+        frow = styled_frame(self, bg=PANEL)
+        frow.pack(fill="x", padx=30, pady=4)
+        styled_label(frow, "Title / Author / Publisher:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
+        self.find_entry = styled_entry(frow, width=34)
+        self.find_entry.pack(side="left", padx=6)
+        self.find_entry.bind("<Return>", lambda e: self.find_books())
+        LiveSearch(self.find_entry, self._words_like)
+        styled_button(frow, "🔎  Find", self.find_books, width=12).pack(side="left", padx=4)
+
         # ── RESULTS TABLE ─────────────────────
         section_title(self, "Results", bg=PANEL)
-        cols = ("Code", "Name", "Author", "Price", "Publisher", "Qty", "Date")
-        self.tree = build_table(self, cols)
+        cols = ("Code", "Name", "Author", "Price", "Publisher", "Qty", "Date", "Available")
+        self.table = build_table(self, cols)
 
     # ─── CRUD ───────────────────────────────
     def _form_values(self):
@@ -192,21 +646,14 @@ class BookTab(tk.Frame):
             e.delete(0, "end")
 
     def add_book(self):
-        bno, bname, auth, price, publ, qty, dop = self._form_values()
-        if not all([bno, bname, auth, price, publ, qty, dop]):
+        vals = self._form_values()
+        if not all(vals):
             messagebox.showwarning("Missing Fields", "Please fill in all fields.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute(
-                "INSERT INTO BOOKRECORDS VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                (bno, bname, auth, price, publ, qty, dop)
-            )
-            cnx.commit(); cur.close(); cnx.close()
-            toast(self.root, "✔ Book added successfully!")
+        def done(_):
+            self.root.notify("✔ Book added successfully!", key="book-add", plural="✔ {n} books added")
             self._clear_form()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write("add_book", vals, done, queued=self._clear_form)
 
     def delete_book(self):
         bno = self.add_entries["bno"].get().strip()
@@ -215,32 +662,45 @@ class BookTab(tk.Frame):
             return
         if not messagebox.askyesno("Confirm", f"Delete book {bno}?"):
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("DELETE FROM bookrecords WHERE bno=%s", (bno,))
-            cnx.commit()
-            toast(self.root, f"✔ {cur.rowcount} book(s) deleted.", color=ACCENT2)
-            cur.close(); cnx.close()
+        def done(count):
+            self.root.notify(f"✔ {count} book(s) deleted.", color=ACCENT2, key="book-delete",
+                             plural="✔ {n} book(s) deleted.", count=count)
             self._clear_form()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write("delete_book", (bno,), done, queued=self._clear_form)
 
     def search_book(self):
         bno = self.search_entry.get().strip()
         if not bno:
             messagebox.showwarning("Missing", "Enter a Book Code to search.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("SELECT * FROM bookrecords WHERE bno=%s", (bno,))
-            rows = cur.fetchall(); cur.close(); cnx.close()
-            self.tree.delete(*self.tree.get_children())
-            for r in rows:
-                self.tree.insert("", "end", values=r)
-            if not rows:
-                toast(self.root, "No records found.", color=MUTED)
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.db.submit(self.root.lookup(lambda s: s.find_book(bno)),
+                            lambda rows: show_rows(self.root, self.table, rows), key="book-lookup")
+
+    def _codes_like(self, prefix):
+        if prefix:
+            self.table.close_source()       # a word search still paging in would overwrite us
+            self.root.db.submit(self.root.lookup(lambda s: s.books_by_code_prefix(prefix)),
+                                self.table.set_rows, key="book-lookup")
+
+    def find_books(self):
+        text = self.find_entry.get().strip()
+        if not library_search.words(text):
+            messagebox.showwarning("Missing", "Enter words from the title, author or publisher.")
+            return
+        self.root.db.cancel("book-lookup")
+        show_results(self.root, self.table,
+                     CursorSource(*library_search.search_query(text),
+                                  setup=library_migrations.ensure_current,
+                                  limit=library_search.SEARCH_LIMIT))
+
+    def _words_like(self, text):
+        # Every word is already matched as a prefix; replacing the source
+        # abandons the previous query's cursor.
+        if library_search.words(text):
+            self.root.db.cancel("book-lookup")     # a late code lookup would overwrite us
+            self.table.set_source(CursorSource(*library_search.search_query(text),
+                                               setup=library_migrations.ensure_current,
+                                               limit=library_search.SEARCH_LIMIT))
 
     def update_book(self):
         bno = self.search_entry.get().strip()
@@ -248,17 +708,10 @@ class BookTab(tk.Frame):
         if not all([bno, bname, auth, price, publ, qty, dop]):
             messagebox.showwarning("Missing", "Enter Book Code in search box and fill all fields.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute(
-                "UPDATE bookrecords SET bname=%s,auth=%s,price=%s,publ=%s,qty=%s,date_of_purchase=%s WHERE bno=%s",
-                (bname, auth, price, publ, qty, dop, bno)
-            )
-            cnx.commit()
-            toast(self.root, f"✔ {cur.rowcount} book(s) updated!")
-            cur.close(); cnx.close()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write(
+            "update_book", (bno, bname, auth, price, publ, qty, dop),
+            lambda count: self.root.notify(f"✔ {count} book(s) updated!", key="book-update",
+                                           plural="✔ {n} book(s) updated!", count=count))
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -285,18 +738,20 @@ class MemberTab(tk.Frame):
         styled_button(row, "➕  Add Member", self.add_member).pack(side="left", padx=6)
         styled_button(row, "🗑  Delete Member", self.delete_member, color=ACCENT2, fg=TEXT).pack(side="left", padx=6)
 
-        section_title(self, "Search / Update Member", bg=PANEL)
+        section_title(self, "Search / Update Member (type a code or name)", bg=PANEL)
         srow = styled_frame(self, bg=PANEL)
         srow.pack(fill="x", padx=30, pady=4)
         styled_label(srow, "Member Code:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
         self.search_entry = styled_entry(srow, width=20)
         self.search_entry.pack(side="left", padx=6)
+        self.search_entry.bind("<Return>", lambda e: self.search_member())
+        LiveSearch(self.search_entry, self._members_like)
         styled_button(srow, "🔍  Search", self.search_member, width=12).pack(side="left", padx=4)
         styled_button(srow, "✏️  Update", self.update_member, color="#6366f1", fg=TEXT, width=12).pack(side="left", padx=4)
 
         section_title(self, "Results", bg=PANEL)
         cols = ("Code", "Name", "Membership Date", "Address", "Mobile")
-        self.tree = build_table(self, cols)
+        self.table = build_table(self, cols)
 
     def _form_values(self):
         e = self.add_entries
@@ -309,19 +764,15 @@ class MemberTab(tk.Frame):
             e.delete(0, "end")
 
     def add_member(self):
-        mno, mname, dom, addr, mob = self._form_values()
-        if not all([mno, mname, dom, addr, mob]):
+        vals = self._form_values()
+        if not all(vals):
             messagebox.showwarning("Missing Fields", "Please fill in all fields.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("INSERT INTO MEMBER VALUES (%s,%s,%s,%s,%s)",
-                        (mno, mname, dom, addr, mob))
-            cnx.commit(); cur.close(); cnx.close()
-            toast(self.root, "✔ Member added successfully!")
+        def done(_):
+            self.root.notify("✔ Member added successfully!", key="member-add",
+                             plural="✔ {n} members added")
             self._clear_form()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write("add_member", vals, done, queued=self._clear_form)
 
     def delete_member(self):
         mno = self.add_entries["mno"].get().strip()
@@ -330,32 +781,24 @@ class MemberTab(tk.Frame):
             return
         if not messagebox.askyesno("Confirm", f"Delete member {mno}?"):
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("DELETE FROM member WHERE mno=%s", (mno,))
-            cnx.commit()
-            toast(self.root, f"✔ {cur.rowcount} member(s) deleted.", color=ACCENT2)
-            cur.close(); cnx.close()
+        def done(count):
+            self.root.notify(f"✔ {count} member(s) deleted.", color=ACCENT2, key="member-delete",
+                             plural="✔ {n} member(s) deleted.", count=count)
             self._clear_form()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write("delete_member", (mno,), done, queued=self._clear_form)
 
     def search_member(self):
         mno = self.search_entry.get().strip()
         if not mno:
             messagebox.showwarning("Missing", "Enter a Member Code to search.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("SELECT * FROM member WHERE mno=%s", (mno,))
-            rows = cur.fetchall(); cur.close(); cnx.close()
-            self.tree.delete(*self.tree.get_children())
-            for r in rows:
-                self.tree.insert("", "end", values=r)
-            if not rows:
-                toast(self.root, "No records found.", color=MUTED)
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.db.submit(self.root.lookup(lambda s: s.find_member(mno)),
+                            lambda rows: show_rows(self.root, self.table, rows), key="member-lookup")
+
+    def _members_like(self, prefix):
+        if prefix:
+            self.root.db.submit(self.root.lookup(lambda s: s.members_by_prefix(prefix)),
+                                self.table.set_rows, key="member-lookup")
 
     def update_member(self):
         mno = self.search_entry.get().strip()
@@ -363,17 +806,10 @@ class MemberTab(tk.Frame):
         if not all([mno, mname, dom, addr, mob]):
             messagebox.showwarning("Missing", "Enter Member Code in search box and fill all fields.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute(
-                "UPDATE member SET mname=%s,date_of_membership=%s,addr=%s,mob=%s WHERE mno=%s",
-                (mname, dom, addr, mob, mno)
-            )
-            cnx.commit()
-            toast(self.root, f"✔ {cur.rowcount} member(s) updated!")
-            cur.close(); cnx.close()
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        self.root.submit_write(
+            "update_member", (mno, mname, dom, addr, mob),
+            lambda count: self.root.notify(f"✔ {count} member(s) updated!", key="member-update",
+                                           plural="✔ {n} member(s) updated!", count=count))
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -409,18 +845,48 @@ class IssueTab(tk.Frame):
         row2.pack(pady=6)
         styled_button(row2, "📥  Return Book", self.return_book, color=SUCCESS, fg="#0f1117").pack(side="left", padx=6)
 
-        # ── SEARCH ────────────────────────────
-        section_title(self, "Search Issues by Member", bg=PANEL)
+        # ── BATCH DESK ────────────────────────
+        section_title(self, "Batch Issue / Return (scan codes, Enter after each)", bg=PANEL)
+        self.batch_entries = build_form(self, [("Member Code", "mno"), ("Scan Book Code", "scan")])
+        self.batch_entries["scan"].bind("<Return>", self._queue_scan)
+        self.batch_list = tk.Listbox(self, height=5, font=FONT_BODY, bg=CARD, fg=TEXT,
+                                     selectbackground=ACCENT, relief="flat", highlightthickness=0)
+        self.batch_list.pack(fill="x", padx=30, pady=4)
+        self.batch_codes = []
+        brow = styled_frame(self, bg=PANEL)
+        brow.pack(pady=6)
+        styled_button(brow, "📤  Issue All", lambda: self.run_batch("issue"), width=14).pack(side="left", padx=6)
+        styled_button(brow, "📥  Return All", lambda: self.run_batch("return"),
+                      color=SUCCESS, width=14).pack(side="left", padx=6)
+        styled_button(brow, "🧹  Clear", self.clear_batch, color=MUTED, width=10).pack(side="left", padx=6)
+
+        # ── HISTORY ───────────────────────────
+        section_title(self, "Issue History (leave Member Code blank for all)", bg=PANEL)
         srow = styled_frame(self, bg=PANEL)
         srow.pack(fill="x", padx=30, pady=4)
         styled_label(srow, "Member Code:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
         self.search_entry = styled_entry(srow, width=20)
         self.search_entry.pack(side="left", padx=6)
+        self.search_entry.bind("<Return>", lambda e: self.search_issue())
+        LiveSearch(self.search_entry, self._issues_like)
         styled_button(srow, "🔍  Search", self.search_issue, width=12).pack(side="left", padx=4)
+        self.prev_btn = styled_button(srow, "◀  Newer", lambda: self._page(before=self.page.first),
+                                      color=MUTED, width=10)
+        self.prev_btn.pack(side="left", padx=4)
+        self.next_btn = styled_button(srow, "Older  ▶", lambda: self._page(after=self.page.last),
+                                      color=MUTED, width=10)
+        self.next_btn.pack(side="left", padx=4)
+        self.page_label = styled_label(srow, "", fg=MUTED)
+        self.page_label.pack(side="left", padx=6)
+        self.page = None
+        self.page_no = 0
+        self.history_mno = None
+        self.history_prefix = False
+        self._paging()
 
         section_title(self, "Results", bg=PANEL)
         cols = ("Book Code", "Member Code", "Issue Date", "Return Date")
-        self.tree = build_table(self, cols)
+        self.table = build_table(self, cols)
 
     def issue_book(self):
         bno = self.issue_entries["bno"].get().strip()
@@ -429,16 +895,18 @@ class IssueTab(tk.Frame):
         if not all([bno, mno, doi]):
             messagebox.showwarning("Missing", "Fill in all fields.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("INSERT INTO ISSUE(bno,mno,d_o_issue) VALUES(%s,%s,%s)",
-                        (bno, mno, doi))
-            cnx.commit(); cur.close(); cnx.close()
-            toast(self.root, "✔ Book issued successfully!")
+        def clear():
             for e in self.issue_entries.values():
                 e.delete(0, "end")
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        def done(_):
+            self.root.notify("✔ Book issued successfully!", key="issue", plural="✔ {n} books issued")
+            clear()
+        def failed(ex):
+            if isinstance(ex, library_store.NotAvailable):
+                self.root.notify(f"✖ {ex}", color=ACCENT2)
+            else:
+                messagebox.showerror("Error", str(ex))
+        self.root.submit_write("issue_book", (bno, mno, doi), done, queued=clear, on_error=failed)
 
     def return_book(self):
         bno = self.return_entries["bno_r"].get().strip()
@@ -446,50 +914,358 @@ class IssueTab(tk.Frame):
         if not all([bno, mno]):
             messagebox.showwarning("Missing", "Enter Book Code and Member Code.")
             return
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
-            rd = str(date.today())
-            cur.execute(
-                "UPDATE issue SET d_o_ret=%s WHERE bno=%s AND mno=%s AND d_o_ret IS NULL",
-                (rd, bno, mno)
-            )
-            cnx.commit()
-            if cur.rowcount == 0:
-                toast(self.root, "No matching active issue found.", color=ACCENT2)
-            else:
-                toast(self.root, f"✔ Book returned on {rd}!", color=SUCCESS)
-            cur.close(); cnx.close()
+        rd = str(date.today())
+        def clear():
             for e in self.return_entries.values():
                 e.delete(0, "end")
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+        def done(count):
+            if count == 0:
+                self.root.notify("No matching active issue found.", color=ACCENT2)
+            else:
+                self.root.notify(f"✔ Book returned on {rd}!", key="return",
+                                 plural=f"✔ {{n}} books returned on {rd}")
+            clear()
+        self.root.submit_write("return_book", (bno, mno, rd), done, queued=clear)
+
+    def _queue_scan(self, _event=None):
+        code = self.batch_entries["scan"].get().strip()
+        self.batch_entries["scan"].delete(0, "end")
+        if code:
+            self.batch_codes.append(code)
+            self.batch_list.insert("end", f"{code:<14} · queued")
+            self.batch_list.see("end")
+        return "break"
+
+    def clear_batch(self):
+        self.batch_codes = []
+        self.batch_list.delete(0, "end")
+        self.batch_entries["scan"].focus_set()
+
+    def run_batch(self, action):
+        mno = self.batch_entries["mno"].get().strip()
+        self._queue_scan()                          # a code typed but not yet entered
+        codes = list(self.batch_codes)
+        if not mno or not codes:
+            messagebox.showwarning("Missing", "Enter a Member Code and scan at least one book.")
+            return
+        verb = "issued" if action == "issue" else "returned"
+        op = "issue_many" if action == "issue" else "return_many"
+        started = time.perf_counter()
+
+        def done(result):
+            elapsed = (time.perf_counter() - started) * 1000
+            self.batch_list.delete(0, "end")
+            for code, reason in result.items:
+                self.batch_list.insert("end", f"{code!s:<14} " + (f"✔ {verb}" if reason is None else f"✖ {reason}"))
+                self.batch_list.itemconfig("end", fg=SUCCESS if reason is None else ACCENT2)
+            self.batch_codes = [str(code) for code, reason in result.items if reason is not None]
+            self.root.notify(f"{result.summary(verb)} in {elapsed:.0f} ms",
+                             color=SUCCESS if not result.failed else ACCENT)
+            self.batch_entries["scan"].focus_set()
+
+        def queued():
+            self.batch_list.delete(0, "end")
+            for code in codes:
+                self.batch_list.insert("end", f"{code!s:<14} ⏸ saved offline")
+            self.batch_codes = []
+            self.batch_entries["scan"].focus_set()
+
+        self.root.submit_write(op, (mno, codes, str(date.today())), done, queued=queued, key="batch")
 
     def search_issue(self):
-        mno = self.search_entry.get().strip()
-        if not mno:
-            messagebox.showwarning("Missing", "Enter a Member Code.")
+        self.history_mno = self.search_entry.get().strip() or None
+        self.history_prefix = False
+        self.page_no = 0
+        self._page()
+
+    def _issues_like(self, prefix):
+        # Same member-code prefix match as the Members tab, paged by key.
+        self.history_mno = prefix or None
+        self.history_prefix = True
+        self.page_no = 0
+        self._page()
+
+    def _page(self, after=None, before=None):
+        """Loads the newest page, or the one older than `after` / newer than `before`."""
+        mno, prefix = self.history_mno, self.history_prefix
+        step = 1 if after else -1 if before else 0
+
+        def done(page):
+            self.page = page
+            self.page_no = max(1, self.page_no + step) if step else 1
+            if not page.has_prev:
+                self.page_no = 1        # Newer ran into the top: we are back on page 1
+            show_rows(self.root, self.table, page.rows)
+            self._paging()
+
+        self.root.db.submit(
+            lambda: in_session(lambda s: s.issue_page(mno, after=after, before=before, prefix=prefix)),
+            done, key="issue-history")
+
+    def _paging(self):
+        page = self.page
+        self.prev_btn.config(state="normal" if page and page.has_prev else "disabled")
+        self.next_btn.config(state="normal" if page and page.has_next else "disabled")
+        self.page_label.config(text=f"page {self.page_no}" if page else "")
+
+
+# ═══════════════════════════════════════════════════════════════════
+#   FINES TAB
+# ═══════════════════════════════════════════════════════════════════
+class FinesTab(tk.Frame):
+    """Overdue issues and fines from library_fines, assessed on a worker."""
+
+    def __init__(self, parent, root):
+        super().__init__(parent, bg=PANEL)
+        self.root = root
+        self.report = None
+        self._build()
+
+    def _build(self):
+        section_title(self, "Overdue & Fines", bg=PANEL)
+        rules = library_fines.Rules.load()
+        styled_label(self, f"Loan {rules.loan_days} days · grace {rules.grace_days} days · "
+                           "per day " + ", ".join(f"{r:g} from day {s + 1}" for s, r in rules.tiers)
+                           + (f" · cap {rules.cap:g}" if rules.cap else ""),
+                     fg=MUTED).pack(anchor="w", padx=30)
+
+        frow = styled_frame(self, bg=PANEL)
+        frow.pack(fill="x", padx=30, pady=8)
+        styled_label(frow, "As Of (YYYY-MM-DD):", font=FONT_LABEL, fg=MUTED, bg=PANEL).pack(side="left")
+        self.as_of = styled_entry(frow, width=12)
+        self.as_of.insert(0, date.today().isoformat())
+        self.as_of.pack(side="left", padx=6)
+        styled_label(frow, "Member Code:", font=FONT_LABEL, fg=MUTED, bg=PANEL).pack(side="left", padx=(12, 0))
+        self.member = styled_entry(frow, width=14)
+        self.member.pack(side="left", padx=6)
+        self.member.bind("<Return>", lambda e: self.show())
+
+        brow = styled_frame(self, bg=PANEL)
+        brow.pack(pady=4)
+        self.assess_btn = styled_button(brow, "💰  Assess Now", self.assess, width=16)
+        self.assess_btn.pack(side="left", padx=6)
+        styled_button(brow, "🔍  Filter", self.show, width=12).pack(side="left", padx=6)
+        styled_button(brow, "💾  Export CSV…", self.export, width=16).pack(side="left", padx=6)
+
+        self.status = styled_label(self, "", fg=ACCENT)
+        self.status.pack(anchor="w", padx=30)
+        cols = ("Issue", "Book Code", "Member Code", "Due Date", "Days Overdue", "Fine")
+        self.table = build_table(self, cols)
+
+    def assess(self):
+        try:
+            as_of = date.fromisoformat(self.as_of.get().strip())
+        except ValueError:
+            messagebox.showwarning("Invalid Date", "Dates must be YYYY-MM-DD.")
+            return
+        self.assess_btn.config(state="disabled")
+        self.status.config(text="Assessing…", fg=ACCENT)
+
+        def progress(n):             # called on the worker thread
+            self.root.db.post(self.status.config, {"text": f"Assessing… {n:,} overdue issues"})
+
+        def done(report):
+            self.assess_btn.config(state="normal")
+            self.report = report
+            self.status.config(text="✔ " + report.summary(), fg=SUCCESS)
+            self.show()
+
+        def failed(ex):
+            self.assess_btn.config(state="normal")
+            self.status.config(text="✖ Assessment failed.", fg=ACCENT2)
+            messagebox.showerror("Fines Error", str(ex))
+
+        self.root.db.submit(lambda: library_fines.run_assessment(as_of, progress=progress),
+                            done, key="fines", on_error=failed)
+
+    def show(self):
+        report = self.report
+        if report is None:
+            return
+        mno = self.member.get().strip() or None
+        self.root.db.submit(lambda: [(*r[:5], f"{r[5]:,.2f}") for r in report.rows(mno)],
+                            lambda rows: show_rows(self.root, self.table, rows), key="fines-show")
+
+    def export(self):
+        if self.report is None:
+            messagebox.showwarning("No Assessment", "Run Assess Now first.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", initialfile=f"fines-{self.report.today}.csv",
+            filetypes=[("CSV", "*.csv")])
+        if not path:
+            return
+        report = self.report
+
+        def failed(ex):
+            messagebox.showerror("Export Error", str(ex))
+
+        self.root.db.submit(lambda: library_fines.write_csv(report, path),
+                            lambda _: self.root.notify(f"✔ Exported {report.count:,} overdue issues"),
+                            on_error=failed)
+
+
+# ═══════════════════════════════════════════════════════════════════
+#   IMPORT / EXPORT TAB
+# ═══════════════════════════════════════════════════════════════════
+class DataTab(tk.Frame):
+    def __init__(self, parent, root):
+        super().__init__(parent, bg=PANEL)
+        self.root = root
+        self._build()
+
+    def _build(self):
+        # ── BULK IMPORT ───────────────────────
+        section_title(self, "Bulk Import from CSV", bg=PANEL)
+        styled_label(self, "Books: bno, bname, auth, price, publ, qty, date_of_purchase   ·   "
+                           "Members: mno, mname, date_of_membership, addr, mob",
+                     fg=MUTED).pack(anchor="w", padx=30)
+
+        self.import_target = tk.StringVar(value="books")
+        trow = styled_frame(self, bg=PANEL)
+        trow.pack(fill="x", padx=30, pady=4)
+        styled_label(trow, "Import Into:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
+        for value, text in [("books", "Books"), ("members", "Members")]:
+            tk.Radiobutton(trow, text=text, value=value, variable=self.import_target,
+                           font=FONT_BODY, fg=TEXT, bg=PANEL, selectcolor=CARD,
+                           activebackground=PANEL, activeforeground=ACCENT).pack(side="left", padx=6)
+
+        frow = styled_frame(self, bg=PANEL)
+        frow.pack(fill="x", padx=30, pady=4)
+        styled_label(frow, "CSV File:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
+        self.import_path = styled_entry(frow, width=40)
+        self.import_path.pack(side="left", padx=6)
+        styled_button(frow, "📂  Browse", self._browse_import, width=12).pack(side="left", padx=4)
+
+        brow = styled_frame(self, bg=PANEL)
+        brow.pack(pady=8)
+        self.import_btn = styled_button(brow, "📥  Import", self.run_import)
+        self.import_btn.pack(side="left", padx=6)
+        self.restart_import = tk.BooleanVar(value=False)
+        tk.Checkbutton(brow, text="Start over (ignore checkpoint)", variable=self.restart_import,
+                       font=FONT_BODY, fg=MUTED, bg=PANEL, selectcolor=CARD,
+                       activebackground=PANEL).pack(side="left", padx=6)
+
+        self.import_status = styled_label(self, "", fg=ACCENT)
+        self.import_status.pack(anchor="w", padx=30, pady=4)
+
+        # ── EXPORT ────────────────────────────
+        section_title(self, "Export to CSV / JSON Lines", bg=PANEL)
+        self.export_target = tk.StringVar(value="issues")
+        erow = styled_frame(self, bg=PANEL)
+        erow.pack(fill="x", padx=30, pady=4)
+        styled_label(erow, "Export:", font=FONT_LABEL, fg=MUTED, bg=PANEL, width=22, anchor="w").pack(side="left")
+        for value, text in [("books", "Books"), ("members", "Members"), ("issues", "Issue History")]:
+            tk.Radiobutton(erow, text=text, value=value, variable=self.export_target,
+                           font=FONT_BODY, fg=TEXT, bg=PANEL, selectcolor=CARD,
+                           activebackground=PANEL, activeforeground=ACCENT).pack(side="left", padx=6)
+
+        styled_label(self, "Issue history filters (optional):", fg=MUTED).pack(anchor="w", padx=30)
+        self.export_filters = build_form(self, [
+            ("Issued From (YYYY-MM-DD)", "start"),
+            ("Issued To (YYYY-MM-DD)",   "end"),
+            ("Member Code",              "mno"),
+        ])
+
+        xrow = styled_frame(self, bg=PANEL)
+        xrow.pack(pady=8)
+        self.export_btn = styled_button(xrow, "📤  Export…", self.run_export)
+        self.export_btn.pack(side="left", padx=6)
+        self.export_status = styled_label(self, "", fg=ACCENT)
+        self.export_status.pack(anchor="w", padx=30, pady=4)
+
+    def _browse_import(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if path:
+            self.import_path.delete(0, "end")
+            self.import_path.insert(0, path)
+
+    def run_import(self):
+        path = self.import_path.get().strip()
+        if not path:
+            messagebox.showwarning("Missing", "Choose a CSV file to import.")
             return
+        target = self.import_target.get()
+        restart = self.restart_import.get()
+        self.import_btn.config(state="disabled")
+        self.import_status.config(text="Importing…", fg=ACCENT)
+
+        def progress(report):        # called on the worker thread
+            self.root.db.post(self.import_status.config, {"text": report.summary()})
+
+        def done(report):
+            self.import_btn.config(state="normal")
+            self.import_status.config(text="✔ " + report.summary(), fg=SUCCESS)
+            self.root.notify(f"✔ Imported {report.inserted} {report.target}")
+            if report.rejected:
+                messagebox.showinfo("Rejected Rows",
+                                    f"{report.rejected} row(s) rejected — see\n{report.rejects_path}")
+
+        def failed(ex):
+            self.import_btn.config(state="normal")
+            self.import_status.config(text="✖ Import stopped — run again to resume.", fg=ACCENT2)
+            messagebox.showerror("Import Error", str(ex))
+
+        self.root.db.submit(
+            lambda: library_import.import_csv(target, path, restart=restart, progress=progress),
+            done, on_error=failed)
+
+    def run_export(self):
+        target = self.export_target.get()
+        f = {k: e.get().strip() or None for k, e in self.export_filters.items()}
         try:
-            cnx = get_connection(); cur = cnx.cursor()
-            cur.execute("SELECT * FROM issue WHERE mno=%s", (mno,))
-            rows = cur.fetchall(); cur.close(); cnx.close()
-            self.tree.delete(*self.tree.get_children())
-            for r in rows:
-                self.tree.insert("", "end", values=r)
-            if not rows:
-                toast(self.root, "No records found.", color=MUTED)
-        except Exception as ex:
-            messagebox.showerror("Error", str(ex))
+            start = f["start"] and date.fromisoformat(f["start"])
+            end = f["end"] and date.fromisoformat(f["end"])
+        except ValueError:
+            messagebox.showwarning("Invalid Date", "Dates must be YYYY-MM-DD.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", initialfile=f"{target}.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        self.export_btn.config(state="disabled")
+        self.export_status.config(text="Exporting…", fg=ACCENT)
+        started = time.perf_counter()
+
+        def progress(n):             # called on the worker thread
+            self.root.db.post(self.export_status.config, {"text": f"Exporting… {n:,} rows"})
+
+        def done(n):
+            self.export_btn.config(state="normal")
+            self.export_status.config(
+                text=f"✔ {n:,} rows written in {time.perf_counter() - started:.1f}s", fg=SUCCESS)
+            self.root.notify(f"✔ Exported {n:,} rows")
+
+        def failed(ex):
+            self.export_btn.config(state="normal")
+            self.export_status.config(text="✖ Export failed.", fg=ACCENT2)
+            messagebox.showerror("Export Error", str(ex))
+
+        self.root.db.submit(
+            lambda: library_export.export(target, path, start=start, end=end, mno=f["mno"],
+                                          progress=progress),
+            done, on_error=failed)
 
 
 # ═══════════════════════════════════════════════════════════════════
 #   DASHBOARD TAB
 # ═══════════════════════════════════════════════════════════════════
 class DashboardTab(tk.Frame):
+    """Counters and recent issues, kept live by polling the change marker
+    (library_stats.read_changes). A poll is one primary-key read; the
+    dashboard queries only run, and the screen is only touched, when the
+    marker has moved."""
+    REFRESH_S = float(os.environ.get("LIBRARY_DASHBOARD_REFRESH", "10"))   # 0 = manual only
+
     def __init__(self, parent, root):
         super().__init__(parent, bg=PANEL)
         self.root = root
+        self._marker = None          # (changes, day) of what is on screen
+        self._values = None
         self._build()
+        if self.REFRESH_S > 0:
+            self.after(int(self.REFRESH_S * 1000), self._poll)
 
     def _build(self):
         # Header
@@ -521,50 +1297,178 @@ class DashboardTab(tk.Frame):
         # Recent activity table
         section_title(self, "Recent Issues", bg=PANEL)
         cols = ("Book Code", "Member Code", "Issue Date", "Return Date")
-        self.tree = build_table(self, cols)
+        self.table = build_table(self, cols)
 
         # Refresh button
         btn_row = styled_frame(self, bg=PANEL)
         btn_row.pack(pady=8)
-        styled_button(btn_row, "🔄  Refresh Dashboard", self.refresh, width=22).pack()
+        styled_button(btn_row, "🔄  Refresh Dashboard", self.refresh, width=22).pack(side="left", padx=6)
+        self.updated = styled_label(btn_row, "", fg=MUTED)
+        self.updated.pack(side="left", padx=6)
+        # First load is kicked off by LibraryApp once the window has painted
+
+    def refresh(self):
+        """Reloads unconditionally."""
+        self.root.db.submit(lambda: self._load(None), self._show, key="dashboard", on_error=self._failed)
+
+    def _poll(self):
+        self.after(int(self.REFRESH_S * 1000), self._poll)
+        if not self.winfo_ismapped() or self._marker is None:
+            return              # hidden, or the first load hasn't landed yet
+        known = self._marker
+        self.root.db.submit(lambda: self._load(known), self._show, key="dashboard",
+                            on_error=lambda ex: self.updated.config(text=f"⚠ {ex}"))
+
+    def _failed(self, ex):
+        self.root.startup.mark("interactive")
+        messagebox.showerror("DB Error", str(ex))
+
+    @staticmethod
+    def _load(known):
+        """(marker, (counts, rows)), or (marker, None) if nothing changed since `known`."""
+        with library_store.session() as s:
+            library_migrations.ensure_current(s.cnx)
+            # Read before the data: a write landing in between is picked up next poll.
+            marker = (library_stats.read_changes(s.cur), date.today())
+            if marker == known:
+                return marker, None
+            counts = s.dashboard_counts()
+            rows = s.recent_issues(20)
+        return marker, ([counts[k] for k in ("books", "members", "issued", "returned")], rows)
+
+    def _show(self, result):
+        self._marker, data = result
+        self.updated.config(text=f"checked {time.strftime('%H:%M:%S')}")
+        if data is not None:
+            values, rows = data
+            if values != self._values:
+                for lbl, val in zip(self.stat_frames.values(), values):
+                    lbl.config(text=str(val))
+                self._values = values
+            self.table.update_rows(rows)
+        self.root.startup.mark("interactive")
+
+
+# ═══════════════════════════════════════════════════════════════════
+#   DIAGNOSTICS TAB
+# ═══════════════════════════════════════════════════════════════════
+class DiagnosticsTab(tk.Frame):
+    """Per-statement timings, checkout time and pool state from library_metrics.
+    Everything shown is already in memory, so refreshing never touches the DB."""
 
+    def __init__(self, parent, root):
+        super().__init__(parent, bg=PANEL)
+        self.root = root
+        self._build()
         self.refresh()
 
+    def _build(self):
+        header = styled_frame(self, bg=PANEL)
+        header.pack(fill="x", padx=30, pady=(28, 6))
+        styled_label(header, "Diagnostics", font=FONT_HEAD, fg=ACCENT, bg=PANEL).pack(anchor="w")
+        self.since = styled_label(header, "", font=FONT_SUB, fg=MUTED, bg=PANEL)
+        self.since.pack(anchor="w")
+
+        stats_row = styled_frame(self, bg=PANEL)
+        stats_row.pack(fill="x", padx=30, pady=16)
+        self.stat_labels = {}
+        for key, label, color in [
+            ("queries",  "Queries Run",        ACCENT),
+            ("errors",   "Errors",             ACCENT2),
+            ("checkout", "Checkout p95 (ms)",  "#60a5fa"),
+            ("pool",     "Pool In Use / Size", SUCCESS),
+        ]:
+            card = tk.Frame(stats_row, bg=CARD, padx=20, pady=16,
+                            highlightthickness=1, highlightbackground=color)
+            card.pack(side="left", expand=True, fill="both", padx=8)
+            self.stat_labels[key] = tk.Label(card, text="—", font=("Georgia", 24, "bold"),
+                                             fg=color, bg=CARD)
+            self.stat_labels[key].pack()
+            tk.Label(card, text=label, font=FONT_LABEL, fg=MUTED, bg=CARD).pack()
+
+        self.error_line = styled_label(self, "", fg=ACCENT2)
+        self.error_line.pack(anchor="w", padx=30)
+        self.cache_line = styled_label(self, "", fg=MUTED)
+        self.cache_line.pack(anchor="w", padx=30)
+
+        section_title(self, "Statements (slowest total time first)", bg=PANEL)
+        cols = ("Statement", "Calls", "Errors", "Rows", "Mean ms", "p50 ≤ms", "p95 ≤ms", "Max ms")
+        self.table = build_table(self, cols)
+
+        btn_row = styled_frame(self, bg=PANEL)
+        btn_row.pack(pady=8)
+        styled_button(btn_row, "🔄  Refresh", self.refresh, width=14).pack(side="left", padx=6)
+        styled_button(btn_row, "🧹  Reset", self.reset, color=ACCENT2, width=14).pack(side="left", padx=6)
+        styled_button(btn_row, "💾  Save to File…", self.save, width=18).pack(side="left", padx=6)
+
     def refresh(self):
-        try:
-            cnx = get_connection(); cur = cnx.cursor()
+        snap = library_metrics.snapshot()
+        pool = snap.get("pool", {})
+        queries = sum(st["count"] for st in snap["statements"])
+        self.since.config(text=f"Since {snap['since']} — updated {snap['taken'][-8:]}")
+        self.stat_labels["queries"].config(text=f"{queries:,}")
+        self.stat_labels["errors"].config(text=str(sum(snap["errors"].values())))
+        self.stat_labels["checkout"].config(text=f"{snap['acquire']['p95_ms']:.2f}")
+        self.stat_labels["pool"].config(text=f"{pool.get('in_use', '—')} / {pool.get('size', '—')}")
+        self.error_line.config(text="  ".join(f"{k}×{v}" for k, v in snap["errors"].items()))
+        self.cache_line.config(text="Lookup cache — " + "   ".join(
+            f"{name}: {c['hit_rate']:.0%} hits, {c['size']}/{c['maxsize']} entries"
+            for name, c in snap.get("cache", {}).items()))
+        self.table.set_rows([
+            (st["sql"][:120], st["count"], st["errors"], st["rows"], f"{st['mean_ms']:.2f}",
+             f"{st['p50_ms']:.2f}", f"{st['p95_ms']:.2f}", f"{st['max_ms']:.1f}")
+            for st in snap["statements"]])
+
+    def reset(self):
+        library_metrics.reset()
+        self.refresh()
 
-            cur.execute("SELECT COUNT(*) FROM bookrecords")
-            books = cur.fetchone()[0]
+    def save(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json", initialfile=f"library-metrics-{time.strftime('%Y%m%d-%H%M')}.json",
+            filetypes=[("JSON", "*.json")])
+        if path:
+            library_metrics.dump(path)
+            self.root.notify("✔ Diagnostics saved")
 
-            cur.execute("SELECT COUNT(*) FROM member")
-            members = cur.fetchone()[0]
 
-            cur.execute("SELECT COUNT(*) FROM issue WHERE d_o_ret IS NULL")
-            issued = cur.fetchone()[0]
+# ─────────────────────────────────────────────
+#  STARTUP TIMING
+# ─────────────────────────────────────────────
+STARTUP_REPORT    = os.environ.get("LIBRARY_STARTUP_REPORT") == "1"
+STARTUP_BUDGET_MS = float(os.environ.get("LIBRARY_STARTUP_BUDGET_MS", "0"))
 
-            cur.execute("SELECT COUNT(*) FROM issue WHERE d_o_ret=%s", (str(date.today()),))
-            returned = cur.fetchone()[0]
+class StartupTimer:
+    """Milestones since process start: ui_built, first_paint, interactive."""
 
-            cur.execute("SELECT * FROM issue ORDER BY d_o_issue DESC LIMIT 20")
-            rows = cur.fetchall()
-            cur.close(); cnx.close()
+    def __init__(self, t0):
+        self.t0 = t0
+        self.marks = {}
 
-            labels = [books, members, issued, returned]
-            for lbl, val in zip(self.stat_frames.values(), labels):
-                lbl.config(text=str(val))
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = (time.perf_counter() - self.t0) * 1000
+        if name == "interactive":
+            self._report()
 
-            self.tree.delete(*self.tree.get_children())
-            for r in rows:
-                self.tree.insert("", "end", values=r)
+    def report(self):
+        return dict(self.marks)
 
-        except Exception as ex:
-            messagebox.showerror("DB Error", str(ex))
+    def _report(self):
+        total = self.marks["interactive"]
+        if STARTUP_REPORT:
+            print("startup: " + ", ".join(f"{k}={v:.0f}ms" for k, v in self.marks.items()))
+        if STARTUP_BUDGET_MS and total > STARTUP_BUDGET_MS:
+            print(f"startup: time-to-interactive {total:.0f}ms exceeds "
+                  f"budget of {STARTUP_BUDGET_MS:.0f}ms")
 
 
 # ═══════════════════════════════════════════════════════════════════
 #   MAIN APP
 # ═══════════════════════════════════════════════════════════════════
+OFFLINE_RETRY_S = float(os.environ.get("LIBRARY_OFFLINE_RETRY_S", "15"))
+
 class LibraryApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -572,7 +1476,135 @@ class LibraryApp(tk.Tk):
         self.geometry("1100x780")
         self.minsize(900, 640)
         self.configure(bg=BG)
+        self.startup = StartupTimer(_T0)
+        self.db = DbExecutor(self)
+        self.notify = NotificationManager(self).notify
+        self._offline_lock = threading.Lock()   # workers and the Tk thread both check it
+        self._offline_until = 0.0       # monotonic time to try the server again
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self._build_ui()
+        self.startup.mark("ui_built")
+        # after(0) runs once mainloop is up; after_idle then waits out the first redraw
+        self.after(0, lambda: self.after_idle(self._after_first_paint))
+
+    def _after_first_paint(self):
+        self.startup.mark("first_paint")
+        self.tabs["dashboard"].refresh()
+        self.db.submit(warm_up, on_error=lambda ex: None)
+        self.db.submit(library_snapshot.refresh_if_stale, key="snapshot", on_error=lambda ex: None)
+        self._show_journal()
+        self._sync_loop()
+
+    def _offline(self):
+        with self._offline_lock:
+            return time.monotonic() < self._offline_until
+
+    def _go_offline(self):
+        with self._offline_lock:
+            self._offline_until = time.monotonic() + OFFLINE_RETRY_S
+
+    def _go_online(self):
+        """Clears the offline mark; True if it was set."""
+        with self._offline_lock:
+            was, self._offline_until = self._offline_until, 0.0
+        return bool(was)
+
+    def lookup(self, op):
+        """Work for db.submit that runs op(store) in a session. While the server
+        can't be reached, op gets the local catalogue snapshot instead (it has
+        the same lookup methods), and the server is tried again every
+        OFFLINE_RETRY_S."""
+        def work():
+            if not self._offline():
+                try:
+                    rows = in_session(op)
+                except Exception as ex:
+                    if not is_unavailable(ex) or library_snapshot.load() is None:
+                        raise
+                    self._go_offline()
+                else:
+                    if self._go_online():
+                        self.db.post(self._show_offline, None)
+                        self.db.post(self._sync)
+                    return rows
+            catalogue = library_snapshot.load()
+            if catalogue is None:
+                raise DatabaseUnavailable("server unreachable and no catalogue snapshot")
+            self.db.post(self._show_offline, catalogue.created)
+            return op(catalogue)
+        return work
+
+    def write(self, op, *args):
+        """Work for db.submit that runs Store.<op>(*args) in a session. While
+        the server can't be reached, or earlier offline writes are still
+        waiting to be sent, it goes to the offline journal instead (so writes
+        reach the database in the order they were made) and returns
+        library_journal.QUEUED. Only a write that never got a connection is
+        journalled; one cut off after it was sent raises OutcomeUnknown."""
+        def work():
+            journal = library_journal.JOURNAL
+            if not journal.pending() and not self._offline():
+                try:
+                    return in_session(lambda s: getattr(s, op)(*args))
+                except DatabaseUnavailable:
+                    self._go_offline()          # no connection: nothing was sent
+                except Exception as ex:
+                    if not is_unavailable(ex):
+                        raise
+                    self._go_offline()
+                    raise library_journal.OutcomeUnknown(
+                        "The connection was lost while saving, so this change may or may not "
+                        "have been saved. Check the record before trying again.") from ex
+            journal.append(op, *args)
+            return library_journal.QUEUED
+        return work
+
+    def submit_write(self, op, args, on_done, queued=None, on_error=None, key=None):
+        """Submits write(op, *args). on_done gets the result as usual; a write
+        that was journalled instead calls queued() (e.g. to clear the form)."""
+        def done(result):
+            if result == library_journal.QUEUED:
+                self.notify("⏸ Saved offline: it will be sent when the server is back",
+                            color=ACCENT, key="journal", plural="⏸ {n} changes saved offline")
+                self._show_journal()
+                if queued:
+                    queued()
+            else:
+                on_done(result)
+        return self.db.submit(self.write(op, *args), done, key=key, on_error=on_error)
+
+    def _sync_loop(self):
+        self._sync()
+        self.after(int(OFFLINE_RETRY_S * 1000), self._sync_loop)
+
+    def _sync(self):
+        """Replays the offline journal, if there is one and the server may be back."""
+        if not library_journal.JOURNAL.pending() or self._offline():
+            return
+        def done(report):
+            self._show_journal()
+            if report.applied:
+                self.notify(f"✔ {report.summary()}", color=ACCENT if report.conflicts else SUCCESS)
+            if report.conflicts:
+                messagebox.showwarning(
+                    "Offline changes", f"{len(report.conflicts)} offline change(s) could not be "
+                    f"applied. Review them with: python library_journal.py conflicts\n\n"
+                    + "\n".join(f"{c['op']}{tuple(c['args'])}: {c['reason']}"
+                                 for c in report.conflicts[:10]))
+        def failed(ex):
+            self._show_journal()
+            if is_unavailable(ex):
+                self._go_offline()
+            else:
+                self.notify(f"✖ Offline changes not sent: {ex}", color=ACCENT2)
+        self.db.submit(library_journal.replay, done, key="journal-replay", on_error=failed)
+
+    def _show_journal(self):
+        n = library_journal.JOURNAL.pending()
+        self.journal_label.config(text=f"⏸ {n} change(s) to sync" if n else "")
+
+    def _show_offline(self, created):
+        self.offline_label.config(text=f"⚡ offline: snapshot\n{created[:16]}" if created else "")
 
     def _build_ui(self):
         # ── SIDEBAR ──────────────────────────────────────────────
@@ -595,10 +1627,13 @@ class LibraryApp(tk.Tk):
         self.tab_buttons = {}
         self.active_tab = tk.StringVar(value="dashboard")
         nav_items = [
-            ("dashboard", "🏠  Dashboard"),
-            ("books",     "📖  Books"),
-            ("members",   "👥  Members"),
-            ("issue",     "🔄  Issue / Return"),
+            ("dashboard",   "🏠  Dashboard"),
+            ("diagnostics", "🩺  Diagnostics"),
+            ("books",       "📖  Books"),
+            ("members",     "👥  Members"),
+            ("issue",       "🔄  Issue / Return"),
+            ("fines",       "💰  Fines"),
+            ("data",        "📦  Import / Export"),
         ]
         nav_frame = tk.Frame(sidebar, bg=BG)
         nav_frame.pack(fill="x", pady=16)
@@ -617,17 +1652,37 @@ class LibraryApp(tk.Tk):
         tk.Label(sidebar, text="v2.0 GUI", font=("Courier New", 8),
                  fg=BORDER, bg=BG).pack(side="bottom", pady=12)
 
+        # Busy indicator — lit while any DB request is in flight
+        self.busy_label = tk.Label(sidebar, text="", font=("Courier New", 9, "bold"),
+                                   fg=ACCENT, bg=BG)
+        self.busy_label.pack(side="bottom")
+        self.db.on_busy_change(self._show_busy)
+
+        # Offline indicator — lookups are answering from the catalogue snapshot
+        self.offline_label = tk.Label(sidebar, text="", font=("Courier New", 9, "bold"),
+                                      fg=ACCENT2, bg=BG)
+        self.offline_label.pack(side="bottom")
+
+        # Writes saved in the offline journal, not yet sent to the server
+        self.journal_label = tk.Label(sidebar, text="", font=("Courier New", 9, "bold"),
+                                      fg=ACCENT, bg=BG)
+        self.journal_label.pack(side="bottom")
+
         # ── CONTENT AREA ─────────────────────────────────────────
         self.content = tk.Frame(self, bg=PANEL)
         self.content.pack(side="left", fill="both", expand=True)
 
-        # Build all tabs
-        self.tabs = {
-            "dashboard": DashboardTab(self.content, self),
-            "books":     BookTab(self.content, self),
-            "members":   MemberTab(self.content, self),
-            "issue":     IssueTab(self.content, self),
+        # Tabs are built on first visit; only the dashboard is built at startup
+        self.tab_classes = {
+            "dashboard":   DashboardTab,
+            "diagnostics": DiagnosticsTab,
+            "books":       BookTab,
+            "members":     MemberTab,
+            "issue":       IssueTab,
+            "fines":       FinesTab,
+            "data":        DataTab,
         }
+        self.tabs = {}
 
         self.switch_tab("dashboard")
 
@@ -641,10 +1696,21 @@ class LibraryApp(tk.Tk):
                 btn.config(bg=CARD, fg=ACCENT)
             else:
                 btn.config(bg=BG, fg=MUTED)
-        # Show selected
+        # Show selected (building it on first visit)
+        if key not in self.tabs:
+            self.tabs[key] = self.tab_classes[key](self.content, self)
+        elif key == "diagnostics":
+            self.tabs[key].refresh()        # metrics are in memory: no DB round trip
         self.tabs[key].pack(fill="both", expand=True)
         self.active_tab.set(key)
 
+    def _show_busy(self, count):
+        self.busy_label.config(text=f"⏳ working… ({count})" if count else "")
+
+    def _on_close(self):
+        self.db.shutdown()
+        self.destroy()
+
 
 # ─────────────────────────────────────────────
 if __name__ == "__main__":
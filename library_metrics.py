@@ -0,0 +1,266 @@
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+# ─────────────────────────────────────────────
+#  QUERY METRICS
+#  Every cursor the pool hands out is wrapped so each execute() lands in a
+#  per-statement latency histogram along with rows returned/affected and
+#  errors. Connection checkout time has its own histogram. Recording is a
+#  couple of perf_counter() calls and a short lock, so it stays on by
+#  default; LIBRARY_METRICS=0 turns it off.
+# ─────────────────────────────────────────────
+ENABLED   = os.environ.get("LIBRARY_METRICS", "1") != "0"
+DUMP_PATH = os.environ.get("LIBRARY_METRICS_DUMP")    # written at exit when set
+
+BUCKETS_MS     = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAX_STATEMENTS = 500          # distinct statements tracked; the rest share one row
+OTHER          = "(other statements)"
+
+
+class Histogram:
+    """Fixed log-spaced buckets; percentiles are bucket upper bounds."""
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank, seen = p * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        return {"count": self.count,
+                "mean_ms": self.total_ms / self.count if self.count else 0.0,
+                "p50_ms": self.percentile(0.50), "p95_ms": self.percentile(0.95),
+                "p99_ms": self.percentile(0.99), "max_ms": self.max_ms,
+                "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["inf"], self.counts))}
+
+
+class StatementStats:
+    __slots__ = ("latency", "errors", "rows")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.rows = 0
+
+
+_PLACEHOLDERS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_ROW_LISTS    = re.compile(r"(?:\(%s,…\)\s*,\s*)+\(%s,…\)")
+
+@lru_cache(maxsize=1024)
+def normalize(sql):
+    """Collapses whitespace and placeholder lists, so IN (...) and multi-row
+    VALUES of any length count as one statement."""
+    sql = _PLACEHOLDERS.sub("(%s,…)", " ".join(sql.split()))
+    return _ROW_LISTS.sub("(%s,…),…", sql)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}
+            self.acquire = Histogram()
+            self.errors = Counter()
+            self.since = time.time()
+
+    def _stats(self, sql):
+        key = normalize(sql)
+        st = self._statements.get(key)
+        if st is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                key = OTHER
+                st = self._statements.get(key)
+            if st is None:
+                st = self._statements[key] = StatementStats()
+        return st
+
+    def record(self, sql, seconds, rows=0, error=None):
+        with self._lock:
+            st = self._stats(sql)
+            st.latency.add(seconds * 1000)
+            st.rows += rows
+            if error is not None:
+                st.errors += 1
+                self.errors[type(error).__name__] += 1
+
+    def add_rows(self, sql, n):
+        with self._lock:
+            self._stats(sql).rows += n
+
+    def record_acquire(self, seconds, error=None):
+        with self._lock:
+            self.acquire.add(seconds * 1000)
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+
+    def record_error(self, error):
+        """Counts an error raised outside a statement (e.g. one shown to the user)."""
+        with self._lock:
+            self.errors[type(error).__name__] += 1
+
+    def add_source(self, name, fn):
+        """Includes fn() under `name` in every snapshot (e.g. pool statistics)."""
+        self._sources[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            statements = [dict(sql=sql, errors=st.errors, rows=st.rows, **st.latency.snapshot())
+                          for sql, st in self._statements.items()]
+            snap = {"since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.since)),
+                    "taken": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "acquire": self.acquire.snapshot(),
+                    "errors": dict(self.errors)}
+        statements.sort(key=lambda s: s["mean_ms"] * s["count"], reverse=True)
+        snap["statements"] = statements
+        for name, fn in self._sources.items():
+            try:
+                snap[name] = fn()
+            except Exception as ex:
+                snap[name] = {"error": str(ex)}
+        return snap
+
+
+REGISTRY = Registry()
+snapshot = REGISTRY.snapshot
+reset = REGISTRY.reset
+
+
+# ─────────────────────────────────────────────
+#  INSTRUMENTED CURSOR
+# ─────────────────────────────────────────────
+class InstrumentedCursor:
+    """Times execute()/executemany() and counts the rows fetched afterwards."""
+
+    def __init__(self, cur):
+        self._cur = cur
+        self._sql = None
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def _timed(self, method, sql, params):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            result = method(sql, params)
+        except Exception as ex:
+            REGISTRY.record(sql, time.perf_counter() - start, error=ex)
+            raise
+        elapsed = time.perf_counter() - start
+        # Writes report affected rows now; SELECT rows are counted as fetched.
+        rows = max(self._cur.rowcount, 0) if self._cur.description is None else 0
+        REGISTRY.record(sql, elapsed, rows)
+        return result
+
+    def execute(self, sql, params=()):
+        return self._timed(self._cur.execute, sql, params)
+
+    def executemany(self, sql, seq):
+        return self._timed(self._cur.executemany, sql, seq)
+
+    def _fetched(self, rows):
+        if rows and self._sql is not None:
+            REGISTRY.add_rows(self._sql, len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None and self._sql is not None:
+            REGISTRY.add_rows(self._sql, 1)
+        return row
+
+    def fetchmany(self, size=1):
+        return self._fetched(self._cur.fetchmany(size))
+
+    def fetchall(self):
+        return self._fetched(self._cur.fetchall())
+
+    def __iter__(self):
+        n = 0
+        try:
+            for row in self._cur:
+                n += 1
+                yield row
+        finally:
+            if n and self._sql is not None:
+                REGISTRY.add_rows(self._sql, n)
+
+
+def wrap(cur):
+    return InstrumentedCursor(cur) if ENABLED else cur
+
+
+# ─────────────────────────────────────────────
+#  DUMP / REPORT
+# ─────────────────────────────────────────────
+def dump(path):
+    """Writes the current snapshot as JSON for offline analysis."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2, default=str)
+    return path
+
+
+if DUMP_PATH:
+    atexit.register(lambda: dump(DUMP_PATH))
+
+
+def report_lines(snap, top=20):
+    a = snap["acquire"]
+    lines = [f"since {snap['since']}  ·  connection checkout: {a['count']} "
+             f"(mean {a['mean_ms']:.2f} ms, p95 ≤{a['p95_ms']:.2f} ms, max {a['max_ms']:.1f} ms)"]
+    if snap["errors"]:
+        lines.append("errors: " + ", ".join(f"{k}×{v}" for k, v in snap["errors"].items()))
+    lines.append(f"{'calls':>7}{'errors':>7}{'rows':>9}{'mean':>9}{'p95≤':>8}{'max':>9}  statement")
+    for s in snap["statements"][:top]:
+        lines.append(f"{s['count']:>7}{s['errors']:>7}{s['rows']:>9}{s['mean_ms']:>9.2f}"
+                     f"{s['p95_ms']:>8.2f}{s['max_ms']:>9.1f}  {s['sql'][:90]}")
+    return lines
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_metrics.py metrics.json [--top N]
+# ─────────────────────────────────────────────
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python library_metrics.py DUMP.json [--top N]")
+        return 2
+    top = int(argv[argv.index("--top") + 1]) if "--top" in argv else 20
+    with open(argv[0], encoding="utf-8") as f:
+        snap = json.load(f)
+    print("\n".join(report_lines(snap, top)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import sys
+import time
+
+from library_db import dialect, get_backend, get_connection
+import library_fines
+import library_search
+import library_stats
+import library_store
+
+# ─────────────────────────────────────────────
+#  SCHEMA MIGRATIONS
+#  Each migration runs once per database, in version order; the applied
+#  versions are recorded in schema_migrations. Steps are SQL strings,
+#  callables taking the connection, or {dialect: [steps]} for the parts
+#  that differ between MySQL and SQLite; all are written so a
+#  half-applied migration can simply be run again.
+# ─────────────────────────────────────────────
+LOCK_NAME    = "library_migrations"
+LOCK_TIMEOUT = 30
+
+
+def _has_index(cur, table, name):
+    if dialect() == "sqlite":
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' "
+                    "AND tbl_name = %s AND name = %s", (table, name))
+    else:
+        cur.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                    (table, name))
+    return cur.fetchone()[0] > 0
+
+def _has_column(cur, table, name):
+    if dialect() == "sqlite":
+        cur.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == name for row in cur.fetchall())
+    cur.execute("SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+                (table, name))
+    return cur.fetchone()[0] > 0
+
+def add_index(table, name, columns):
+    def step(cnx):
+        cur = cnx.cursor()
+        if not _has_index(cur, table, name):
+            cur.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    step.__name__ = f"index {name}"
+    return step
+
+def add_column(table, name, definition):
+    def step(cnx):
+        cur = cnx.cursor()
+        if not _has_column(cur, table, name):
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    step.__name__ = f"column {table}.{name}"
+    return step
+
+
+def _install_counters(cnx):
+    library_stats.install(cnx)
+    cur = cnx.cursor()
+    for stmt in library_stats.RECONCILE:
+        cur.execute(stmt)
+
+
+MIGRATIONS = [
+    (1, "base tables", [{"mysql": [
+        """CREATE TABLE IF NOT EXISTS bookrecords (
+               bno               INT PRIMARY KEY,
+               bname             VARCHAR(100),
+               auth              VARCHAR(100),
+               price             INT,
+               publ              VARCHAR(100),
+               qty               INT,
+               date_of_purchase  DATE
+           )""",
+        """CREATE TABLE IF NOT EXISTS member (
+               mno                  VARCHAR(20) PRIMARY KEY,
+               mname                VARCHAR(100),
+               date_of_membership   DATE,
+               addr                 VARCHAR(200),
+               mob                  VARCHAR(15)
+           )""",
+        """CREATE TABLE IF NOT EXISTS issue (
+               bno         INT,
+               mno         VARCHAR(20),
+               d_o_issue   DATE,
+               d_o_ret     DATE DEFAULT NULL
+           )""",
+    ], "sqlite": [
+        # bno as INTEGER PRIMARY KEY is the rowid itself; issue gets its id up front
+        """CREATE TABLE IF NOT EXISTS bookrecords (
+               bno               INTEGER PRIMARY KEY,
+               bname             VARCHAR(100),
+               auth              VARCHAR(100),
+               price             INT,
+               publ              VARCHAR(100),
+               qty               INT,
+               date_of_purchase  DATE
+           )""",
+        """CREATE TABLE IF NOT EXISTS member (
+               mno                  VARCHAR(20) PRIMARY KEY,
+               mname                VARCHAR(100),
+               date_of_membership   DATE,
+               addr                 VARCHAR(200),
+               mob                  VARCHAR(15)
+           )""",
+        """CREATE TABLE IF NOT EXISTS issue (
+               id          INTEGER PRIMARY KEY AUTOINCREMENT,
+               bno         INT,
+               mno         VARCHAR(20),
+               d_o_issue   DATE,
+               d_o_ret     DATE DEFAULT NULL
+           )""",
+    ]}]),
+    (2, "issue primary key and hot-path indexes", [
+        add_column("issue", "id", "BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY"),
+        add_index("issue", "ix_issue_member",   "mno, d_o_issue"),      # issues by member
+        add_index("issue", "ix_issue_active",   "bno, mno, d_o_ret"),   # return_book
+        add_index("issue", "ix_issue_returned", "d_o_ret"),             # active / returned-on-day
+        add_index("issue", "ix_issue_issued",   "d_o_issue"),           # recent issues
+    ]),
+    (3, "dashboard counters", [_install_counters]),
+    (4, "catalogue fulltext index", [library_search.install]),
+    (5, "bulk import checkpoints", [
+        """CREATE TABLE IF NOT EXISTS import_checkpoints (
+               source      CHAR(40) PRIMARY KEY,
+               file_name   VARCHAR(255),
+               rows_done   BIGINT NOT NULL,
+               updated_on  DATETIME
+           )""",
+    ]),
+    (6, "available copies per book", [
+        add_column("bookrecords", "avail", "INT NOT NULL DEFAULT 0"),
+        *library_stats.RECOUNT_AVAILABLE,
+    ]),
+    (7, "dashboard change marker", [library_stats.install_change_marker]),
+    (8, "member code / name prefix indexes", [{"mysql": [
+        add_index("member", "ix_member_name", "mname"),
+    ], "sqlite": [
+        # LIKE is case-insensitive on SQLite and only uses NOCASE indexes
+        add_index("member", "ix_member_code_nocase", "mno COLLATE NOCASE"),
+        add_index("member", "ix_member_name", "mname COLLATE NOCASE"),
+    ]}]),
+    (9, "offline journal checkpoints", [
+        """CREATE TABLE IF NOT EXISTS journal_checkpoints (
+               journal     CHAR(32) PRIMARY KEY,
+               seq_done    BIGINT NOT NULL,
+               updated_on  DATETIME
+           )""",
+    ]),
+    (10, "catalogue index ignores stock-only updates", [{"mysql": [], "sqlite": [
+        # CREATE TRIGGER IF NOT EXISTS won't replace the old AFTER UPDATE trigger
+        "DROP TRIGGER IF EXISTS trg_books_fts_upd",
+        library_search.SQLITE_UPDATE_TRIGGER,
+    ]}]),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(cur):
+    cur.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                       version     INT PRIMARY KEY,
+                       name        VARCHAR(100),
+                       applied_on  DATETIME
+                   )""")
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+def _run_step(cnx, cur, step):
+    if isinstance(step, dict):
+        for s in step[dialect()]:
+            _run_step(cnx, cur, s)
+    elif callable(step):
+        step(cnx)
+    else:
+        cur.execute(step)
+
+
+def migrate(cnx, log=print):
+    """Applies pending migrations; returns the list of versions applied."""
+    cur = cnx.cursor()
+    locking = dialect() == "mysql"      # SQLite is single-host; its writes already serialise
+    if locking:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cur.fetchone()[0] != 1:
+            raise RuntimeError("another process is migrating the schema")
+    try:
+        done = current_version(cur)
+        applied = []
+        for version, name, steps in MIGRATIONS:
+            if version <= done:
+                continue
+            log(f"migration {version}: {name}")
+            for step in steps:
+                _run_step(cnx, cur, step)
+            cur.execute("INSERT INTO schema_migrations VALUES (%s, %s, %s)",
+                        (version, name, time.strftime("%Y-%m-%d %H:%M:%S")))
+            cnx.commit()
+            applied.append(version)
+        return applied
+    finally:
+        if locking:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchone()
+
+
+_current = set()        # backends already checked by this process
+
+def ensure_current(cnx):
+    """Brings the schema up to date the first time this process needs it."""
+    backend = id(get_backend())
+    if backend not in _current:
+        if current_version(cnx.cursor()) < LATEST:
+            migrate(cnx, log=lambda msg: None)
+        _current.add(backend)
+
+
+# ─────────────────────────────────────────────
+#  PLAN CHECK
+#  Every statement the GUI and CLI run on a hot path, with sample
+#  parameters. check_plans() EXPLAINs each one and fails if the database
+#  would scan a whole table because no index applies.
+# ─────────────────────────────────────────────
+def hot_queries():
+    day = "2000-01-01"
+    return [
+        ("book by code",       library_store.BOOK_BY_CODE, (1,)),
+        ("update book",        library_store.UPDATE_BOOK, (1, "x", "x", 1, "x", 1, day, 1, 1)),
+        ("delete book",        library_store.DELETE_BOOK, (1,)),
+        ("catalogue search",   *library_search.search_query("library")),
+        ("member by code",     library_store.MEMBER_BY_CODE, ("M1",)),
+        ("book code prefix",   library_store.BOOKS_IN_RANGE, (10, 19, 50)),
+        ("member code prefix", library_store.members_like("mno"), ("m1%", 50)),
+        ("member name prefix", library_store.members_like("mname"), ("ann%", 50)),
+        ("update member",      library_store.UPDATE_MEMBER, ("x", day, "x", "x", "M1")),
+        ("delete member",      library_store.DELETE_MEMBER, ("M1",)),
+        ("issues by member",   library_store.ISSUES_BY_MEMBER, ("M1",)),
+        ("take a copy",        library_store.TAKE_COPY, (1,)),
+        ("return book",        library_store.RETURN_BOOK, (day, 1, "M1")),
+        ("put a copy back",    library_store.PUT_BACK, (1, 1)),
+        ("recent issues",      library_store.ISSUE_PAGE.format(where="", dir="DESC"), (20,)),
+        ("older issues",       library_store.ISSUE_PAGE.format(
+                                   where="WHERE " + library_store.OLDER_THAN_KEY, dir="DESC"), (day, day, 1, 20)),
+        ("member history",     library_store.ISSUE_PAGE.format(
+                                   where="WHERE mno=%s AND " + library_store.NEWER_THAN_KEY, dir="ASC"),
+                               ("M1", day, day, 1, 20)),
+        ("overdue issues",     library_fines.overdue_sql(), (day,)),
+        ("dashboard counters", library_stats.DASHBOARD_QUERY, (day,)),
+        ("change marker",      library_stats.CHANGES_QUERY, ()),
+        ("active issues",      "SELECT COUNT(*) FROM issue WHERE d_o_ret IS NULL", ()),
+        ("returned on day",    "SELECT COUNT(*) FROM issue WHERE d_o_ret=%s", (day,)),
+    ]
+
+# Tables that only ever hold a handful of rows; scanning them is fine.
+SMALL_TABLES = {"library_counters", "schema_migrations"}
+
+
+def _mysql_plan(cur, sql, params):
+    """Yields (table, problem) for each full scan in a MySQL EXPLAIN."""
+    cur.execute("EXPLAIN " + sql, params)
+    for step in cur.fetchall():
+        table = step.get("table") or ""
+        if step.get("type") != "ALL" or table in SMALL_TABLES or table.startswith("<"):
+            continue            # <union1,2>, <derived2>: temporary results, not tables
+        if step.get("possible_keys"):
+            yield table, "warning: full scan chosen despite an index"
+        else:
+            yield table, "error: full table scan, no usable index"
+
+def _sqlite_plan(cur, sql, params):
+    """Yields (table, problem) for each plain 'SCAN <table>' in EXPLAIN QUERY PLAN."""
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    for step in cur.fetchall():
+        words = step["detail"].split()
+        if words[0] != "SCAN" or "USING" in words or "VIRTUAL" in words:
+            continue
+        table = words[2] if words[1] == "TABLE" else words[1]
+        if table not in SMALL_TABLES:
+            yield table, "error: full table scan, no usable index"
+
+
+def check_plans(cnx, queries=None):
+    """Returns [(name, table, problem)] for every plan that needs attention.
+
+    A full scan with no usable index is an error. On MySQL, a full scan the
+    optimizer chose despite having an index (typical on tiny tables) is
+    reported as a warning only.
+    """
+    plan = _sqlite_plan if dialect() == "sqlite" else _mysql_plan
+    cur = cnx.cursor(dictionary=True)
+    problems = []
+    for name, sql, params in queries or hot_queries():
+        for table, problem in plan(cur, sql, params):
+            problems.append((name, table, problem))
+    return problems
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_migrations.py [status|migrate|check]
+# ─────────────────────────────────────────────
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    with get_connection() as cnx:
+        if cmd == "status":
+            print(f"schema version {current_version(cnx.cursor())} (latest {LATEST})")
+        elif cmd == "migrate":
+            applied = migrate(cnx)
+            print(f"applied {len(applied)} migration(s); schema at version {LATEST}")
+        elif cmd == "check":
+            problems = check_plans(cnx)
+            for name, table, problem in problems:
+                print(f"{name:<20} {table:<14} {problem}")
+            errors = [p for p in problems if p[2].startswith("error")]
+            print(f"{len(hot_queries())} queries checked, {len(errors)} full scan(s)")
+            return 1 if errors else 0
+        else:
+            print("usage: python library_migrations.py [status|migrate|check]")
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
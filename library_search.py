@@ -0,0 +1,113 @@
+import re
+import sys
+import time
+
+from library_db import dialect, get_connection
+
+# ─────────────────────────────────────────────
+#  CATALOGUE SEARCH
+#  Ranked title/author/publisher search over a FULLTEXT index, so a
+#  lookup costs an index probe instead of a LIKE '%x%' table scan.
+# ─────────────────────────────────────────────
+SEARCH_LIMIT = 200
+INDEX_NAME   = "ft_bookrecords_text"
+
+# MySQL: FULLTEXT index on the table itself.
+MYSQL_INDEX_DDL = f"ALTER TABLE bookrecords ADD FULLTEXT INDEX {INDEX_NAME} (bname, auth, publ)"
+
+MATCH = "MATCH(bname, auth, publ) AGAINST (%s IN BOOLEAN MODE)"
+
+MYSQL_SEARCH_SQL = f"""SELECT bno, bname, auth, price, publ, qty, date_of_purchase, avail
+                         FROM bookrecords
+                        WHERE {MATCH}
+                        ORDER BY {MATCH} DESC, bno
+                        LIMIT %s"""
+
+# SQLite: FTS5 table over bookrecords, kept in sync by triggers. The update
+# trigger only watches the indexed columns, so issue/return (avail) and
+# stock changes don't rewrite the index entry.
+SQLITE_UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS trg_books_fts_upd
+           AFTER UPDATE OF bname, auth, publ ON bookrecords BEGIN
+           INSERT INTO bookrecords_fts(bookrecords_fts, rowid, bname, auth, publ)
+           VALUES ('delete', OLD.bno, OLD.bname, OLD.auth, OLD.publ);
+           INSERT INTO bookrecords_fts(rowid, bname, auth, publ)
+           VALUES (NEW.bno, NEW.bname, NEW.auth, NEW.publ); END"""
+
+SQLITE_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS bookrecords_fts USING fts5(
+           bname, auth, publ, content='bookrecords', content_rowid='bno', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS trg_books_fts_ins AFTER INSERT ON bookrecords BEGIN
+           INSERT INTO bookrecords_fts(rowid, bname, auth, publ)
+           VALUES (NEW.bno, NEW.bname, NEW.auth, NEW.publ); END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_books_fts_del AFTER DELETE ON bookrecords BEGIN
+           INSERT INTO bookrecords_fts(bookrecords_fts, rowid, bname, auth, publ)
+           VALUES ('delete', OLD.bno, OLD.bname, OLD.auth, OLD.publ); END""",
+    SQLITE_UPDATE_TRIGGER,
+    "INSERT INTO bookrecords_fts(bookrecords_fts) VALUES ('rebuild')",
+]
+
+SQLITE_SEARCH_SQL = """SELECT b.bno, b.bname, b.auth, b.price, b.publ, b.qty, b.date_of_purchase, b.avail
+                         FROM bookrecords_fts f JOIN bookrecords b ON b.bno = f.rowid
+                        WHERE bookrecords_fts MATCH %s
+                        ORDER BY f.rank, b.bno
+                        LIMIT %s"""
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def search_query(text, limit=SEARCH_LIMIT):
+    """Returns (sql, params) for a ranked search where every word must match
+    as a prefix: 'harry pot' finds 'Harry Potter'."""
+    w = words(text)
+    if dialect() == "sqlite":
+        return SQLITE_SEARCH_SQL, (" ".join(f'"{x}"*' for x in w), limit)
+    q = " ".join(f"+{x}*" for x in w)
+    return MYSQL_SEARCH_SQL, (q, q, limit)
+
+
+def install(cnx):
+    """Adds the full-text index if missing (run by library_migrations)."""
+    cur = cnx.cursor()
+    if dialect() == "sqlite":
+        for stmt in SQLITE_INDEX_DDL:
+            cur.execute(stmt)
+    else:
+        cur.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'bookrecords' "
+                    "AND index_name = %s", (INDEX_NAME,))
+        if cur.fetchone()[0] == 0:
+            cur.execute(MYSQL_INDEX_DDL)
+    cnx.commit()
+
+
+def search_books(cur, text, limit=SEARCH_LIMIT):
+    if not words(text):
+        return []
+    cur.execute(*search_query(text, limit))
+    return cur.fetchall()
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_search.py "words to find"
+# ─────────────────────────────────────────────
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print('usage: python library_search.py "title, author or publisher words"')
+        return 2
+    from library_migrations import ensure_current
+    with get_connection() as cnx:
+        ensure_current(cnx)
+        start = time.perf_counter()
+        rows = search_books(cnx.cursor(), " ".join(argv))
+        elapsed = (time.perf_counter() - start) * 1000
+    for r in rows:
+        print(" | ".join(str(v) for v in r))
+    print(f"{len(rows)} match(es) in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
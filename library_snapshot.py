@@ -0,0 +1,475 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from datetime import date
+
+from library_db import get_connection
+from library_store import BOOK_VIEW, MAX_CODE_DIGITS, MEMBER_COLUMNS, PREFIX_LIMIT
+
+# ─────────────────────────────────────────────
+#  OFFLINE CATALOGUE SNAPSHOT
+#  bookrecords and member, copied to a local file so a desk that loses the
+#  server can still look books and members up. In memory each column is one
+#  packed array: integers and dates (as day ordinals) in array('q'/'i'),
+#  text as one UTF-8 buffer plus offsets, and repetitive text (author,
+#  publisher) as small integer codes into a list of interned strings.
+#  Rows are only turned into tuples when a lookup returns them.
+# ─────────────────────────────────────────────
+SNAPSHOT_PATH = os.environ.get("LIBRARY_SNAPSHOT_PATH", "catalogue.snapshot")
+REFRESH_H     = float(os.environ.get("LIBRARY_SNAPSHOT_REFRESH_H", "24"))   # rebuilt when older; 0 = never
+CHUNK_SIZE    = 50_000
+MAGIC         = b"LIBSNAP1\n"
+
+NULL_INT = -2 ** 63
+
+# name: (SELECT, [(column, kind)]); columns in the same order as the rows
+# library_store returns, so offline rows look exactly like online ones.
+TABLES = {
+    "books": (f"SELECT {BOOK_VIEW} FROM bookrecords ORDER BY bno",
+              [("bno", "int"), ("bname", "text"), ("auth", "category"), ("price", "int"),
+               ("publ", "category"), ("qty", "int"), ("date_of_purchase", "date"),
+               ("avail", "int")]),
+    "members": (f"SELECT {MEMBER_COLUMNS} FROM member",
+                [("mno", "text"), ("mname", "text"), ("date_of_membership", "date"),
+                 ("addr", "text"), ("mob", "text")]),
+}
+
+
+# ─────────────────────────────────────────────
+#  PACKED COLUMNS
+#  Each kind packs a list of values, unpacks one value by row number, and
+#  saves / loads itself as a list of buffers (array or bytes).
+# ─────────────────────────────────────────────
+class IntColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def pack(cls, values):
+        return cls(array("q", [NULL_INT if v is None else int(v) for v in values]))
+
+    def __getitem__(self, i):
+        v = self.values[i]
+        return None if v == NULL_INT else v
+
+    def __len__(self):
+        return len(self.values)
+
+    def parts(self):
+        return [self.values]
+
+    @classmethod
+    def from_parts(cls, parts):
+        return cls(parts[0])
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values)
+
+
+class DateColumn(IntColumn):
+    """Day ordinals (date.toordinal()); 0 is NULL."""
+    __slots__ = ()
+
+    @classmethod
+    def pack(cls, values):
+        return cls(array("i", [0 if v is None else v.toordinal() for v in values]))
+
+    def __getitem__(self, i):
+        v = self.values[i]
+        return date.fromordinal(v) if v else None
+
+
+class TextColumn:
+    """All values in one UTF-8 buffer; row i is blob[offsets[i]:offsets[i + 1]]."""
+    __slots__ = ("blob", "offsets", "nulls")
+
+    def __init__(self, blob, offsets, nulls):
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls          # sorted row numbers holding NULL (usually none)
+
+    @classmethod
+    def pack(cls, values):
+        encoded = [b"" if v is None else str(v).encode() for v in values]
+        blob = b"".join(encoded)
+        offsets = array("I" if len(blob) < 2 ** 32 else "q", [0])
+        end = 0
+        for b in encoded:
+            end += len(b)
+            offsets.append(end)
+        nulls = array("q", [i for i, v in enumerate(values) if v is None])
+        return cls(blob, offsets, nulls)
+
+    def __getitem__(self, i):
+        if self.nulls:
+            j = bisect_left(self.nulls, i)
+            if j < len(self.nulls) and self.nulls[j] == i:
+                return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].decode()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def parts(self):
+        return [self.blob, self.offsets, self.nulls]
+
+    @classmethod
+    def from_parts(cls, parts):
+        return cls(*parts)
+
+    def nbytes(self):
+        return (len(self.blob) + self.offsets.itemsize * len(self.offsets)
+                + self.nulls.itemsize * len(self.nulls))
+
+
+class CategoryColumn:
+    """Codes into a list of distinct values, each string interned once."""
+    __slots__ = ("codes", "values")
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def pack(cls, values):
+        index, distinct = {}, []
+        codes = array("I")
+        for v in values:
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(distinct)
+                distinct.append(v if v is None else sys.intern(str(v)))
+            codes.append(code)
+        return cls(codes, distinct)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def parts(self):
+        return [self.codes] + TextColumn.pack(self.values).parts()
+
+    @classmethod
+    def from_parts(cls, parts):
+        text = TextColumn.from_parts(parts[1:])
+        return cls(parts[0], [v if v is None else sys.intern(v) for v in
+                              (text[i] for i in range(len(text)))])
+
+    def nbytes(self):
+        return (self.codes.itemsize * len(self.codes) + sys.getsizeof(self.values)
+                + sum(sys.getsizeof(v) for v in self.values))
+
+
+KINDS = {"int": IntColumn, "date": DateColumn, "text": TextColumn, "category": CategoryColumn}
+
+
+class Table:
+    __slots__ = ("name", "columns", "rows")
+
+    def __init__(self, name, columns, rows):
+        self.name = name
+        self.columns = columns      # [(column name, packed column)]
+        self.rows = rows
+
+    def row(self, i):
+        return tuple(col[i] for _, col in self.columns)
+
+    def column(self, name):
+        return dict(self.columns)[name]
+
+    def nbytes(self):
+        return sum(col.nbytes() for _, col in self.columns)
+
+
+class _Folded:
+    """Sequence view of a text column, case-folded, for bisect."""
+    __slots__ = ("col",)
+
+    def __init__(self, col):
+        self.col = col
+
+    def __getitem__(self, i):
+        return self.col[i].lower()
+
+    def __len__(self):
+        return len(self.col)
+
+
+# ─────────────────────────────────────────────
+#  CATALOGUE  (same lookups as library_store.Store)
+#  Books are kept in code order and members in case-folded code order, so
+#  code and code-prefix lookups are binary searches.
+# ─────────────────────────────────────────────
+class Catalogue:
+    __slots__ = ("books", "members", "created", "path")
+
+    def __init__(self, books, members, created, path=None):
+        self.books = books
+        self.members = members
+        self.created = created      # "YYYY-MM-DD HH:MM:SS" the snapshot was taken
+        self.path = path
+
+    def find_book(self, bno):
+        try:
+            bno = int(str(bno).strip())
+        except ValueError:
+            return []
+        codes = self.books.column("bno").values
+        i = bisect_left(codes, bno)
+        return [self.books.row(i)] if i < len(codes) and codes[i] == bno else []
+
+    def books_by_code_prefix(self, prefix, limit=PREFIX_LIMIT):
+        prefix = str(prefix).strip()
+        if not prefix.isdigit() or (prefix.startswith("0") and prefix != "0"):
+            return []
+        codes, rows, p = self.books.column("bno").values, [], int(prefix)
+        for k in range(MAX_CODE_DIGITS - len(prefix) + 1):
+            lo = p * 10 ** k
+            i, end = bisect_left(codes, lo), bisect_left(codes, lo + 10 ** k)
+            rows += [self.books.row(j) for j in range(i, min(end, i + limit - len(rows)))]
+            if len(rows) >= limit or p == 0:
+                break
+        return rows
+
+    def find_member(self, mno):
+        mno = str(mno).strip()
+        keys = _Folded(self.members.column("mno"))
+        i = bisect_left(keys, mno.lower())
+        rows = []
+        while i < len(keys) and keys[i] == mno.lower():
+            rows.append(self.members.row(i))
+            i += 1
+        return rows
+
+    def members_by_prefix(self, prefix, limit=PREFIX_LIMIT):
+        """Members whose code, or else name, starts with `prefix` (any case).
+        Names are not sorted, so that part is a scan."""
+        prefix = str(prefix).strip().lower()
+        if not prefix:
+            return []
+        keys = _Folded(self.members.column("mno"))
+        i, rows = bisect_left(keys, prefix), []
+        while i < len(keys) and len(rows) < limit and keys[i].startswith(prefix):
+            rows.append(self.members.row(i))
+            i += 1
+        seen = {r[0] for r in rows}
+        names = self.members.column("mname")
+        for j in range(len(names)):
+            if len(rows) >= limit:
+                break
+            name = names[j]
+            if name and name.lower().startswith(prefix):
+                row = self.members.row(j)
+                if row[0] not in seen:
+                    rows.append(row)
+        return rows
+
+    def nbytes(self):
+        return self.books.nbytes() + self.members.nbytes()
+
+
+# ─────────────────────────────────────────────
+#  BUILD / SAVE / LOAD
+#  File: MAGIC, one JSON header line, then every column's buffers back to
+#  back. Written to a temporary file and renamed, so a reader never sees
+#  half a snapshot.
+# ─────────────────────────────────────────────
+def _read_table(cnx, name, chunk_size=CHUNK_SIZE):
+    sql, spec = TABLES[name]
+    values = [[] for _ in spec]
+    cur = cnx.cursor(buffered=False)
+    cur.execute(sql)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        for col, column in zip(values, zip(*rows)):
+            col.extend(column)
+    cur.close()
+    if name == "members":       # case-folded code order, whatever the server's collation
+        order = sorted(range(len(values[0])), key=lambda i: values[0][i].lower())
+        values = [[col[i] for i in order] for col in values]
+    columns = [(column, KINDS[kind].pack(col)) for (column, kind), col in zip(spec, values)]
+    return Table(name, columns, len(values[0]))
+
+
+def build(path=None):
+    """Copies the catalogue to the snapshot file. Returns the Catalogue."""
+    path = path or SNAPSHOT_PATH
+    with get_connection() as cnx:
+        books = _read_table(cnx, "books")
+        members = _read_table(cnx, "members")
+    catalogue = Catalogue(books, members, time.strftime("%Y-%m-%d %H:%M:%S"), path)
+    save(catalogue, path)
+    return catalogue
+
+
+def save(catalogue, path):
+    buffers, tables = [], {}
+    for table in (catalogue.books, catalogue.members):
+        columns = []
+        for name, col in table.columns:
+            parts = col.parts()
+            columns.append({"name": name, "kind": _kind(col),
+                            "parts": [[getattr(p, "typecode", "bytes"), _size(p)] for p in parts]})
+            buffers += parts
+        tables[table.name] = {"rows": table.rows, "columns": columns}
+    header = {"created": catalogue.created, "byteorder": sys.byteorder, "tables": tables}
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header).encode() + b"\n")
+        for b in buffers:
+            f.write(b)
+    os.replace(tmp, path)
+    return path
+
+
+def _size(buf):
+    return len(buf) * buf.itemsize if isinstance(buf, array) else len(buf)
+
+
+def _kind(col):
+    return next(k for k, cls in KINDS.items() if type(col) is cls)
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path} is not a catalogue snapshot")
+        header = json.loads(f.readline())
+        data = memoryview(f.read())
+    swap = header["byteorder"] != sys.byteorder
+    pos, tables = 0, {}
+    for name, t in header["tables"].items():
+        columns = []
+        for c in t["columns"]:
+            parts = []
+            for typecode, size in c["parts"]:
+                chunk = data[pos:pos + size]
+                pos += size
+                if typecode == "bytes":
+                    parts.append(bytes(chunk))
+                    continue
+                a = array(typecode)
+                a.frombytes(chunk)
+                if swap:
+                    a.byteswap()
+                parts.append(a)
+            columns.append((c["name"], KINDS[c["kind"]].from_parts(parts)))
+        tables[name] = Table(name, columns, t["rows"])
+    return Catalogue(tables["books"], tables["members"], header["created"], path)
+
+
+_loaded = {}                    # path -> (mtime_ns, Catalogue)
+_load_lock = threading.Lock()
+
+def load(path=None):
+    """The snapshot at `path`, read once and re-read when the file changes;
+    None when there is no snapshot."""
+    path = path or SNAPSHOT_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _load_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _loaded[path] = (mtime, _load(path))
+        return cached[1]
+
+
+def is_stale(path=None, max_age_h=REFRESH_H):
+    path = path or SNAPSHOT_PATH
+    if not max_age_h:
+        return False
+    try:
+        return time.time() - os.stat(path).st_mtime > max_age_h * 3600
+    except FileNotFoundError:
+        return True
+
+
+def refresh_if_stale(path=None, max_age_h=REFRESH_H):
+    """Rebuilds the snapshot when it is missing or older than `max_age_h` hours."""
+    if is_stale(path, max_age_h):
+        return build(path)
+    return None
+
+
+def measure(path=None):
+    """Traced memory of the loaded snapshot against the same rows as fetchall()
+    tuples. Returns {"rows", "snapshot", "tuples"} in bytes."""
+    path = path or SNAPSHOT_PATH
+    tracemalloc.start()
+    try:
+        catalogue = _load(path)
+        packed = tracemalloc.get_traced_memory()[0]
+        del catalogue
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        with get_connection() as cnx:
+            held, rows = [], 0
+            for name in TABLES:
+                cur = cnx.cursor()
+                cur.execute(TABLES[name][0])
+                held.append(cur.fetchall())
+                rows += len(held[-1])
+                cur.close()
+            tuples = tracemalloc.get_traced_memory()[0] - base
+        del held
+    finally:
+        tracemalloc.stop()
+    return {"rows": rows, "snapshot": packed, "tuples": tuples}
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_snapshot.py build | info [--measure]
+# ─────────────────────────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Offline catalogue snapshot.")
+    p.add_argument("command", choices=("build", "info"))
+    p.add_argument("--path", default=SNAPSHOT_PATH, help=f"snapshot file (default {SNAPSHOT_PATH})")
+    p.add_argument("--measure", action="store_true",
+                   help="compare traced memory with the same rows as fetchall() tuples")
+    args = p.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        catalogue = build(args.path)
+        print(f"{catalogue.books.rows:,} books, {catalogue.members.rows:,} members written to "
+              f"{args.path} in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(args.path) / 2 ** 20:,.1f} MB)")
+        return 0
+
+    started = time.perf_counter()
+    catalogue = load(args.path)
+    if catalogue is None:
+        print(f"No snapshot at {args.path}; run: python library_snapshot.py build")
+        return 1
+    took = time.perf_counter() - started
+    rows = catalogue.books.rows + catalogue.members.rows
+    print(f"snapshot of {catalogue.created}: {catalogue.books.rows:,} books, "
+          f"{catalogue.members.rows:,} members, loaded in {took * 1000:,.0f} ms")
+    print(f"  packed columns: {catalogue.nbytes() / 2 ** 20:,.1f} MB"
+          f" ({catalogue.nbytes() / max(rows, 1):,.0f} bytes/row)")
+    if args.measure:
+        m = measure(args.path)
+        per_m = lambda b: b / max(m["rows"], 1) * 1e6 / 2 ** 20
+        print(f"  traced, per million rows: snapshot {per_m(m['snapshot']):,.0f} MB, "
+              f"fetchall() tuples {per_m(m['tuples']):,.0f} MB "
+              f"({m['tuples'] / max(m['snapshot'], 1):.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
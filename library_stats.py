@@ -0,0 +1,222 @@
+import sys
+from datetime import date
+
+from library_db import dialect, get_connection
+
+# ─────────────────────────────────────────────
+#  RUNNING COUNTERS
+#  Maintained by triggers on every insert/delete/issue/return, so the
+#  dashboard reads four numbers instead of scanning the big tables.
+# ─────────────────────────────────────────────
+COUNTERS = ("books", "members", "issued")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS library_counters (
+           name   VARCHAR(32) PRIMARY KEY,
+           value  BIGINT NOT NULL DEFAULT 0
+       )""",
+    """CREATE TABLE IF NOT EXISTS library_daily_returns (
+           day  DATE PRIMARY KEY,
+           n    BIGINT NOT NULL DEFAULT 0
+       )""",
+]
+
+SEED = {
+    "mysql":  "INSERT IGNORE INTO library_counters(name, value) VALUES ",
+    "sqlite": "INSERT OR IGNORE INTO library_counters(name, value) VALUES ",
+}
+SEED_VALUES = ",".join(f"('{c}',0)" for c in COUNTERS)
+
+_BUMP_RETURN = ("INSERT INTO library_daily_returns(day, n) VALUES ({day}, 1) "
+                "ON DUPLICATE KEY UPDATE n = n + 1")
+
+MYSQL_TRIGGERS = {
+    "trg_books_ins": """AFTER INSERT ON bookrecords FOR EACH ROW
+        UPDATE library_counters SET value = value + 1 WHERE name = 'books'""",
+    "trg_books_del": """AFTER DELETE ON bookrecords FOR EACH ROW
+        UPDATE library_counters SET value = value - 1 WHERE name = 'books'""",
+    "trg_member_ins": """AFTER INSERT ON member FOR EACH ROW
+        UPDATE library_counters SET value = value + 1 WHERE name = 'members'""",
+    "trg_member_del": """AFTER DELETE ON member FOR EACH ROW
+        UPDATE library_counters SET value = value - 1 WHERE name = 'members'""",
+    "trg_issue_ins": f"""AFTER INSERT ON issue FOR EACH ROW
+        BEGIN
+          IF NEW.d_o_ret IS NULL THEN
+            UPDATE library_counters SET value = value + 1 WHERE name = 'issued';
+          ELSE
+            {_BUMP_RETURN.format(day="NEW.d_o_ret")};
+          END IF;
+        END""",
+    "trg_issue_upd": f"""AFTER UPDATE ON issue FOR EACH ROW
+        BEGIN
+          IF (OLD.d_o_ret IS NULL) <> (NEW.d_o_ret IS NULL) THEN
+            UPDATE library_counters
+               SET value = value + (NEW.d_o_ret IS NULL) - (OLD.d_o_ret IS NULL)
+             WHERE name = 'issued';
+          END IF;
+          IF NOT (OLD.d_o_ret <=> NEW.d_o_ret) THEN
+            IF OLD.d_o_ret IS NOT NULL THEN
+              UPDATE library_daily_returns SET n = n - 1 WHERE day = OLD.d_o_ret;
+            END IF;
+            IF NEW.d_o_ret IS NOT NULL THEN
+              {_BUMP_RETURN.format(day="NEW.d_o_ret")};
+            END IF;
+          END IF;
+        END""",
+    "trg_issue_del": """AFTER DELETE ON issue FOR EACH ROW
+        BEGIN
+          IF OLD.d_o_ret IS NULL THEN
+            UPDATE library_counters SET value = value - 1 WHERE name = 'issued';
+          ELSE
+            UPDATE library_daily_returns SET n = n - 1 WHERE day = OLD.d_o_ret;
+          END IF;
+        END""",
+}
+
+_SQLITE_BUMP_RETURN = ("INSERT INTO library_daily_returns(day, n) SELECT NEW.d_o_ret, 1 "
+                       "WHERE {cond} ON CONFLICT(day) DO UPDATE SET n = n + 1")
+
+SQLITE_TRIGGERS = {
+    "trg_books_ins": """AFTER INSERT ON bookrecords BEGIN
+        UPDATE library_counters SET value = value + 1 WHERE name = 'books'; END""",
+    "trg_books_del": """AFTER DELETE ON bookrecords BEGIN
+        UPDATE library_counters SET value = value - 1 WHERE name = 'books'; END""",
+    "trg_member_ins": """AFTER INSERT ON member BEGIN
+        UPDATE library_counters SET value = value + 1 WHERE name = 'members'; END""",
+    "trg_member_del": """AFTER DELETE ON member BEGIN
+        UPDATE library_counters SET value = value - 1 WHERE name = 'members'; END""",
+    "trg_issue_ins": f"""AFTER INSERT ON issue BEGIN
+        UPDATE library_counters SET value = value + 1
+         WHERE name = 'issued' AND NEW.d_o_ret IS NULL;
+        {_SQLITE_BUMP_RETURN.format(cond="NEW.d_o_ret IS NOT NULL")};
+        END""",
+    "trg_issue_upd": f"""AFTER UPDATE OF d_o_ret ON issue BEGIN
+        UPDATE library_counters
+           SET value = value + (NEW.d_o_ret IS NULL) - (OLD.d_o_ret IS NULL)
+         WHERE name = 'issued' AND (NEW.d_o_ret IS NULL) <> (OLD.d_o_ret IS NULL);
+        UPDATE library_daily_returns SET n = n - 1
+         WHERE day = OLD.d_o_ret AND OLD.d_o_ret IS NOT NEW.d_o_ret;
+        {_SQLITE_BUMP_RETURN.format(cond="NEW.d_o_ret IS NOT NULL AND NEW.d_o_ret IS NOT OLD.d_o_ret")};
+        END""",
+    "trg_issue_del": """AFTER DELETE ON issue BEGIN
+        UPDATE library_counters SET value = value - 1
+         WHERE name = 'issued' AND OLD.d_o_ret IS NULL;
+        UPDATE library_daily_returns SET n = n - 1 WHERE day = OLD.d_o_ret;
+        END""",
+}
+
+TRIGGERS = {"mysql": MYSQL_TRIGGERS, "sqlite": SQLITE_TRIGGERS}
+
+# Change marker: one more counter, bumped by every write the dashboard can
+# show. Pollers read this single row and only re-query when it has moved.
+CHANGES = "changes"
+_BUMP_CHANGES = f"UPDATE library_counters SET value = value + 1 WHERE name = '{CHANGES}'"
+_CHANGE_EVENTS = {
+    "books_ins":  "INSERT ON bookrecords",
+    "books_del":  "DELETE ON bookrecords",
+    "member_ins": "INSERT ON member",
+    "member_del": "DELETE ON member",
+    "issue_ins":  "INSERT ON issue",
+    "issue_upd":  "UPDATE ON issue",
+    "issue_del":  "DELETE ON issue",
+}
+CHANGE_TRIGGERS = {
+    "mysql":  {f"trg_changes_{k}": f"AFTER {ev} FOR EACH ROW {_BUMP_CHANGES}"
+               for k, ev in _CHANGE_EVENTS.items()},
+    "sqlite": {f"trg_changes_{k}": f"AFTER {ev} BEGIN {_BUMP_CHANGES}; END"
+               for k, ev in _CHANGE_EVENTS.items()},
+}
+CHANGES_QUERY = f"SELECT value FROM library_counters WHERE name = '{CHANGES}'"
+
+# Copies on the shelf = copies owned - copies out (never below zero).
+RECOUNT_AVAILABLE = [
+    "UPDATE bookrecords SET avail = COALESCE(qty, 0) - "
+    "(SELECT COUNT(*) FROM issue WHERE issue.bno = bookrecords.bno AND issue.d_o_ret IS NULL)",
+    "UPDATE bookrecords SET avail = 0 WHERE avail < 0",
+]
+
+RECONCILE = [
+    "UPDATE library_counters SET value = (SELECT COUNT(*) FROM bookrecords) WHERE name = 'books'",
+    "UPDATE library_counters SET value = (SELECT COUNT(*) FROM member) WHERE name = 'members'",
+    "UPDATE library_counters SET value = (SELECT COUNT(*) FROM issue WHERE d_o_ret IS NULL) "
+    "WHERE name = 'issued'",
+    "DELETE FROM library_daily_returns",
+    "INSERT INTO library_daily_returns(day, n) "
+    "SELECT d_o_ret, COUNT(*) FROM issue WHERE d_o_ret IS NOT NULL GROUP BY d_o_ret",
+    _BUMP_CHANGES,          # the counts above may have moved
+]
+
+# One round trip: the three running totals plus today's return count.
+DASHBOARD_QUERY = """SELECT name, value FROM library_counters
+                     UNION ALL
+                     SELECT 'returned', n FROM library_daily_returns WHERE day = %s"""
+
+
+def install(cnx):
+    """Creates the counter tables and (re)creates the triggers. Idempotent."""
+    cur = cnx.cursor()
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+    cur.execute(SEED[dialect()] + SEED_VALUES)
+    for name, body in TRIGGERS[dialect()].items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(f"CREATE TRIGGER {name} {body}")
+    cnx.commit()
+
+
+def install_change_marker(cnx):
+    """Adds the change counter and the triggers that bump it. Idempotent."""
+    cur = cnx.cursor()
+    cur.execute(SEED[dialect()] + f"('{CHANGES}',0)")
+    for name, body in CHANGE_TRIGGERS[dialect()].items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(f"CREATE TRIGGER {name} {body}")
+    cnx.commit()
+
+
+def reconcile(cnx):
+    """Rebuilds every counter (and each book's available copies) from the base
+    tables in a single transaction."""
+    cur = cnx.cursor()
+    for stmt in RECONCILE + RECOUNT_AVAILABLE:
+        cur.execute(stmt)
+    cnx.commit()
+
+
+def read_counters(cur, today=None):
+    """Returns {'books', 'members', 'issued', 'returned', 'changes'} in one query."""
+    cur.execute(DASHBOARD_QUERY, (str(today or date.today()),))
+    values = dict.fromkeys(COUNTERS + ("returned", CHANGES), 0)
+    values.update((name, int(n)) for name, n in cur.fetchall())
+    return values
+
+
+def read_changes(cur):
+    """The change marker: a primary-key read of one row."""
+    cur.execute(CHANGES_QUERY)
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+# ─────────────────────────────────────────────
+#  COMMAND LINE:  python library_stats.py [reconcile|show]
+#  (the tables and triggers themselves are created by library_migrations)
+# ─────────────────────────────────────────────
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "show"
+    with get_connection() as cnx:
+        if cmd == "reconcile":
+            reconcile(cnx)
+            print("Counters rebuilt from base tables.")
+        elif cmd == "show":
+            for name, value in read_counters(cnx.cursor()).items():
+                print(f"{name:>10}: {value}")
+        else:
+            print("usage: python library_stats.py [reconcile|show]")
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,446 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date
+
+from library_db import dialect, get_connection
+import library_cache
+import library_stats
+
+# ─────────────────────────────────────────────
+#  LIBRARY OPERATIONS
+#  The one place the GUI tabs and the CLI get their SQL from. Statements
+#  use %s placeholders and portable SQL, so they run unchanged on every
+#  backend in library_db.
+# ─────────────────────────────────────────────
+BOOK_COLUMNS   = "bno, bname, auth, price, publ, qty, date_of_purchase"
+BOOK_VIEW      = BOOK_COLUMNS + ", avail"          # what lookups and search show
+MEMBER_COLUMNS = "mno, mname, date_of_membership, addr, mob"
+ISSUE_COLUMNS  = "bno, mno, d_o_issue, d_o_ret"
+
+BOOK_BY_CODE     = f"SELECT {BOOK_VIEW} FROM bookrecords WHERE bno=%s"
+INSERT_BOOK      = f"INSERT INTO bookrecords ({BOOK_VIEW}) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)"
+# avail moves by the change in qty. It is assigned before qty because MySQL
+# evaluates SET left to right; SQLite always reads the old values. The WHERE
+# refuses a qty below the copies out on loan (qty-avail) rather than let
+# avail go negative; update_book reports that as NotAvailable.
+UPDATE_BOOK      = ("UPDATE bookrecords SET avail=avail+(%s-qty),bname=%s,auth=%s,price=%s,"
+                    "publ=%s,qty=%s,date_of_purchase=%s WHERE bno=%s AND qty-avail<=%s")
+DELETE_BOOK      = "DELETE FROM bookrecords WHERE bno=%s"
+
+MEMBER_BY_CODE   = f"SELECT {MEMBER_COLUMNS} FROM member WHERE mno=%s"
+INSERT_MEMBER    = f"INSERT INTO member ({MEMBER_COLUMNS}) VALUES (%s,%s,%s,%s,%s)"
+UPDATE_MEMBER    = "UPDATE member SET mname=%s,date_of_membership=%s,addr=%s,mob=%s WHERE mno=%s"
+DELETE_MEMBER    = "DELETE FROM member WHERE mno=%s"
+
+ISSUE_BOOK       = "INSERT INTO issue (bno, mno, d_o_issue) VALUES (%s,%s,%s)"
+RETURN_BOOK      = "UPDATE issue SET d_o_ret=%s WHERE bno=%s AND mno=%s AND d_o_ret IS NULL"
+# The WHERE re-checks avail under the row lock, so two desks can never
+# both take the last copy.
+TAKE_COPY        = "UPDATE bookrecords SET avail=avail-1 WHERE bno=%s AND avail>0"
+PUT_BACK         = "UPDATE bookrecords SET avail=avail+%s WHERE bno=%s"
+ISSUES_BY_MEMBER = f"SELECT {ISSUE_COLUMNS} FROM issue WHERE mno=%s"
+
+# Issue history pages, newest first, in the stable order (d_o_issue, id).
+# A page seeks from the key of the last (or first) row on screen rather than
+# using OFFSET, so any page costs one short index range. ix_issue_issued and
+# ix_issue_member already end in the primary key id on both backends, so
+# they serve the ORDER BY without a sort.
+ISSUE_PAGE      = f"SELECT id, {ISSUE_COLUMNS} FROM issue {{where}} ORDER BY d_o_issue {{dir}}, id {{dir}} LIMIT %s"
+OLDER_THAN_KEY  = "d_o_issue <= %s AND (d_o_issue < %s OR id < %s)"
+NEWER_THAN_KEY  = "d_o_issue >= %s AND (d_o_issue > %s OR id > %s)"
+ISSUE_PAGE_SIZE = 20
+
+# Search-as-you-type. Every lookup is an index range read in index order,
+# stopped by LIMIT, however short the prefix. Book codes are integers, so
+# "12" means 12, 120-129, 1200-1299, ...: one primary-key range per length.
+# Member codes and names use LIKE 'prefix%', which both backends serve from
+# an index (on SQLite, the NOCASE indexes added by migration 8).
+PREFIX_LIMIT     = 50
+MAX_CODE_DIGITS  = 10       # INT holds up to 2147483647
+BOOKS_IN_RANGE   = f"SELECT {BOOK_VIEW} FROM bookrecords WHERE bno BETWEEN %s AND %s ORDER BY bno LIMIT %s"
+_NOCASE_ORDER    = {"mysql": "", "sqlite": " COLLATE NOCASE"}     # so ORDER BY follows the index
+MEMBERS_LIKE     = (f"SELECT {MEMBER_COLUMNS} FROM member WHERE {{col}} LIKE %s ESCAPE '!' "
+                    f"ORDER BY {{col}}{{nocase}} LIMIT %s")
+
+
+def like_prefix(text):
+    """LIKE pattern matching values that start with `text` literally."""
+    return text.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+
+def members_like(col):
+    return MEMBERS_LIKE.format(col=col, nocase=_NOCASE_ORDER[dialect()])
+
+
+# Batch circulation: {} is filled with one placeholder group per item.
+BATCH_CHUNK      = 300      # items per statement; keeps SQLite under 999 parameters
+AVAIL_IN         = "SELECT bno, avail FROM bookrecords WHERE bno IN ({})"
+TAKE_COPIES      = "UPDATE bookrecords SET avail=avail-1 WHERE avail>0 AND bno IN ({})"
+PUT_BACK_MANY    = "UPDATE bookrecords SET avail=avail+%s WHERE bno IN ({})"
+OPEN_ISSUES_IN   = "SELECT bno FROM issue WHERE mno=%s AND d_o_ret IS NULL AND bno IN ({})"
+ISSUE_MANY       = "INSERT INTO issue (bno, mno, d_o_issue) VALUES {}"
+RETURN_MANY      = "UPDATE issue SET d_o_ret=%s WHERE mno=%s AND d_o_ret IS NULL AND bno IN ({})"
+
+# Run on nearly every click, so they are prepared once per connection
+# (library_db PREPARED STATEMENTS) instead of parsed on each call.
+HOT_STATEMENTS = frozenset({BOOK_BY_CODE, MEMBER_BY_CODE, UPDATE_BOOK, ISSUE_BOOK, RETURN_BOOK,
+                            TAKE_COPY, PUT_BACK, BOOKS_IN_RANGE, library_stats.DASHBOARD_QUERY})
+
+
+class NotAvailable(Exception):
+    """No copy of the book is on the shelf (or no such book or member)."""
+
+
+class BatchResult:
+    """Per-code outcome of issue_many / return_many, in scan order."""
+
+    def __init__(self):
+        self.items = []             # (code, None) if it went through, else (code, reason)
+
+    def add(self, code, reason=None):
+        self.items.append((code, reason))
+
+    def fail(self, index, reason):
+        self.items[index] = (self.items[index][0], reason)
+
+    @property
+    def ok(self):
+        return [code for code, reason in self.items if reason is None]
+
+    @property
+    def failed(self):
+        return [(code, reason) for code, reason in self.items if reason is not None]
+
+    def summary(self, verb):
+        return f"{len(self.ok)} {verb}, {len(self.failed)} failed"
+
+
+class Page:
+    """One page of issue history. `rows` are ISSUE_COLUMNS tuples; `first`
+    and `last` are the (d_o_issue, id) keys to pass as before= / after= for
+    the neighbouring pages."""
+
+    def __init__(self, rows, keys, has_prev, has_next):
+        self.rows = rows
+        self.first = keys[0] if keys else None
+        self.last = keys[-1] if keys else None
+        self.has_prev = has_prev
+        self.has_next = has_next
+
+
+class Store:
+    """Library operations on one connection. Nothing is committed until the
+    caller (normally session()) commits, so several operations can share
+    a transaction."""
+
+    def __init__(self, cnx):
+        self.cnx = cnx
+        self.cur = cnx.cursor()
+        self._touched = []          # (cache, key) written in this transaction
+
+    def _invalidate(self, cache, key):
+        # Dropped now and again at commit/rollback, so a reader on another
+        # connection can't re-cache the old row in between.
+        key = str(key).strip()
+        cache.invalidate(key)
+        self._touched.append((cache, key))
+
+    def _cursor(self, sql):
+        return self.cnx.prepared(sql) if sql in HOT_STATEMENTS else self.cur
+
+    def _write(self, sql, params):
+        cur = self._cursor(sql)
+        cur.execute(sql, params)
+        return cur.rowcount
+
+    def _rows(self, sql, params=()):
+        cur = self._cursor(sql)
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    # ── books ───────────────────────────────
+    def add_book(self, bno, bname, auth, price, publ, qty, dop):
+        self._invalidate(library_cache.BOOKS, bno)
+        return self._write(INSERT_BOOK, (bno, bname, auth, price, publ, qty, dop, qty))
+
+    def find_book(self, bno):
+        """Rows for one book code (avail included), read through
+        library_cache.BOOKS. Every write that moves avail invalidates the key."""
+        return list(library_cache.BOOKS.get_or_load(
+            str(bno).strip(), lambda: tuple(self._rows(BOOK_BY_CODE, (bno,)))))
+
+    def books_by_code_prefix(self, prefix, limit=PREFIX_LIMIT):
+        """Books whose code starts with the digits typed so far, in code order."""
+        prefix = str(prefix).strip()
+        if not prefix.isdigit() or (prefix.startswith("0") and prefix != "0"):
+            return []
+        rows, p = [], int(prefix)
+        for k in range(MAX_CODE_DIGITS - len(prefix) + 1):
+            lo = p * 10 ** k        # each range lies wholly above the previous one
+            rows += self._rows(BOOKS_IN_RANGE, (lo, lo + 10 ** k - 1, limit - len(rows)))
+            if len(rows) >= limit or p == 0:
+                break
+        return rows
+
+    def update_book(self, bno, bname, auth, price, publ, qty, dop):
+        """Replaces a book record and returns how many books have the code;
+        raises NotAvailable (changing nothing) if more copies than the new
+        quantity are out on loan."""
+        self._invalidate(library_cache.BOOKS, bno)
+        n = self._write(UPDATE_BOOK, (qty, bname, auth, price, publ, qty, dop, bno, qty))
+        if not n:
+            # MySQL counts only changed rows: 0 may be a record already up to date.
+            for row in self._rows(BOOK_BY_CODE, (bno,)):
+                out = row[5] - row[7]
+                if out > int(qty):
+                    raise NotAvailable(f"{out} copies of book {bno} are on loan; "
+                                       f"the quantity can't go below {out}.")
+                n += 1
+        return n
+
+    def delete_book(self, bno):
+        self._invalidate(library_cache.BOOKS, bno)
+        return self._write(DELETE_BOOK, (bno,))
+
+    # ── members ─────────────────────────────
+    def add_member(self, mno, mname, dom, addr, mob):
+        self._invalidate(library_cache.MEMBERS, mno)
+        return self._write(INSERT_MEMBER, (mno, mname, dom, addr, mob))
+
+    def find_member(self, mno):
+        """Rows for one member code, read through library_cache.MEMBERS."""
+        return list(library_cache.MEMBERS.get_or_load(
+            str(mno).strip(), lambda: tuple(self._rows(MEMBER_BY_CODE, (mno,)))))
+
+    def members_by_prefix(self, prefix, limit=PREFIX_LIMIT):
+        """Members whose code, or else name, starts with `prefix` (any case)."""
+        prefix = str(prefix).strip()
+        if not prefix:
+            return []
+        pattern = like_prefix(prefix)
+        rows = self._rows(members_like("mno"), (pattern, limit))
+        if len(rows) < limit:
+            seen = {r[0] for r in rows}
+            rows += [r for r in self._rows(members_like("mname"), (pattern, limit))
+                     if r[0] not in seen][:limit - len(rows)]
+        return rows
+
+    def update_member(self, mno, mname, dom, addr, mob):
+        """Replaces a member record; returns how many members have the code."""
+        self._invalidate(library_cache.MEMBERS, mno)
+        n = self._write(UPDATE_MEMBER, (mname, dom, addr, mob, mno))
+        if not n:
+            n = len(self._rows(MEMBER_BY_CODE, (mno,)))     # MySQL counts only changed rows
+        return n
+
+    def delete_member(self, mno):
+        self._invalidate(library_cache.MEMBERS, mno)
+        return self._write(DELETE_MEMBER, (mno,))
+
+    # ── circulation ─────────────────────────
+    def issue_book(self, bno, mno, doi):
+        """Takes a copy off the shelf and records the issue; raises NotAvailable
+        (leaving nothing changed) if there is no copy to take or no such member."""
+        if not self._rows(MEMBER_BY_CODE, (mno,)):     # not the cache: it may lag a delete
+            raise NotAvailable(f"No member {mno} is registered.")
+        self._invalidate(library_cache.BOOKS, bno)
+        if not self._write(TAKE_COPY, (bno,)):
+            raise NotAvailable(f"No copy of book {bno} is available.")
+        return self._write(ISSUE_BOOK, (bno, mno, doi))
+
+    def return_book(self, bno, mno, rd=None):
+        n = self._write(RETURN_BOOK, (rd or date.today(), bno, mno))
+        if n:
+            self._invalidate(library_cache.BOOKS, bno)
+            self._write(PUT_BACK, (n, bno))
+        return n
+
+    def _batch(self, codes):
+        """Parses scanned codes; bad and repeated ones are failed straight away.
+        Returns ({bno: index in result.items}, result)."""
+        wanted, result = {}, BatchResult()
+        for code in codes:
+            code = str(code).strip()
+            if not code:
+                continue
+            try:
+                bno = int(code)
+            except ValueError:
+                result.add(code, "not a book code")
+                continue
+            if bno in wanted:
+                result.add(bno, "scanned twice")
+                continue
+            wanted[bno] = len(result.items)
+            result.add(bno)
+        return wanted, result
+
+    def _chunks(self, items):
+        for i in range(0, len(items), BATCH_CHUNK):
+            yield items[i:i + BATCH_CHUNK]
+
+    def _rows_in(self, sql, values, *params):
+        found = []
+        for chunk in self._chunks(values):
+            self.cur.execute(sql.format(",".join(["%s"] * len(chunk))), (*params, *chunk))
+            found.extend(self.cur.fetchall())
+        return found
+
+    def _exec_in(self, sql, values, *params):
+        for chunk in self._chunks(values):
+            self.cur.execute(sql.format(",".join(["%s"] * len(chunk))), (*params, *chunk))
+
+    def _lock_copies(self, bnos):
+        """{bno: avail} for the given books, locked against other desks until
+        commit, so the availability decisions below can't be overtaken."""
+        if dialect() == "sqlite":
+            self.begin()
+            return dict(self._rows_in(AVAIL_IN, bnos))
+        return dict(self._rows_in(AVAIL_IN + " FOR UPDATE", bnos))
+
+    def _lock_open_issues(self, mno, bnos):
+        """The member's open issues of the given books, locked like
+        _lock_copies, so two desks can't both return (and put back) one loan."""
+        if dialect() == "sqlite":
+            self.begin()
+            return self._rows_in(OPEN_ISSUES_IN, bnos, mno)
+        return self._rows_in(OPEN_ISSUES_IN + " FOR UPDATE", bnos, mno)
+
+    def issue_many(self, mno, codes, doi=None):
+        """Issues every valid code to one member with multi-row INSERTs."""
+        wanted, result = self._batch(codes)
+        if not wanted:
+            return result
+        self.begin()
+        if not self._rows(MEMBER_BY_CODE, (mno,)):     # not the cache: it may lag a delete
+            for i in wanted.values():
+                result.fail(i, "unknown member")
+            return result
+        avail = self._lock_copies(list(wanted))
+        doi = doi or date.today()
+        rows = []
+        for bno, i in wanted.items():
+            if bno not in avail:
+                result.fail(i, "unknown book code")
+            elif avail[bno] <= 0:
+                result.fail(i, "no copy available")
+            else:
+                rows.append((bno, mno, doi))
+                self._invalidate(library_cache.BOOKS, bno)
+        self._exec_in(TAKE_COPIES, [bno for bno, _, _ in rows])
+        for chunk in self._chunks(rows):
+            self.cur.execute(ISSUE_MANY.format(",".join(["(%s,%s,%s)"] * len(chunk))),
+                             [v for row in chunk for v in row])
+        return result
+
+    def return_many(self, mno, codes, rd=None):
+        """Returns every listed book the member has out, with one UPDATE per chunk."""
+        wanted, result = self._batch(codes)
+        if not wanted:
+            return result
+        out = Counter(bno for bno, in self._lock_open_issues(mno, list(wanted)))
+        for bno, i in wanted.items():
+            if bno not in out:
+                result.fail(i, "not on loan to this member")
+        self._exec_in(RETURN_MANY, [bno for bno in wanted if bno in out], rd or date.today(), mno)
+        by_count = {}
+        for bno, n in out.items():      # normally one open issue per book: a single UPDATE
+            by_count.setdefault(n, []).append(bno)
+            self._invalidate(library_cache.BOOKS, bno)
+        for n, bnos in by_count.items():
+            self._exec_in(PUT_BACK_MANY, bnos, n)
+        return result
+
+    def issues_for_member(self, mno):
+        return self._rows(ISSUES_BY_MEMBER, (mno,))
+
+    def issue_page(self, mno=None, after=None, before=None, limit=ISSUE_PAGE_SIZE, prefix=False):
+        """A page of issue history (one member's, or everyone's), newest first.
+        With after=key it is the page older than that row; with before=key, the
+        page newer than it; with neither, the newest page. With prefix=True,
+        `mno` matches every member code that starts with it."""
+        where, params = [], []
+        if mno is not None:
+            where.append("mno LIKE %s ESCAPE '!'" if prefix else "mno=%s")
+            params.append(like_prefix(mno) if prefix else mno)
+        key = after or before
+        if key is not None:
+            d, i = key
+            where.append(NEWER_THAN_KEY if before else OLDER_THAN_KEY)
+            params += [d, d, i]
+        sql = ISSUE_PAGE.format(where="WHERE " + " AND ".join(where) if where else "",
+                                dir="ASC" if before else "DESC")
+        rows = self._rows(sql, (*params, limit + 1))     # one extra row: is there more?
+        more = len(rows) > limit
+        if before and not more:
+            return self.issue_page(mno, limit=limit, prefix=prefix)    # reached the top: show a full newest page
+        rows = rows[:limit]
+        if before:
+            rows.reverse()
+        keys = [(r[3], r[0]) for r in rows]
+        page = [r[1:] for r in rows]
+        if before:
+            return Page(page, keys, has_prev=more, has_next=True)
+        return Page(page, keys, has_prev=after is not None, has_next=more)
+
+    def recent_issues(self, limit=20):
+        return self.issue_page(limit=limit).rows
+
+    def dashboard_counts(self, today=None):
+        return library_stats.read_counters(self._cursor(library_stats.DASHBOARD_QUERY), today)
+
+    # ── transaction ─────────────────────────
+    def begin(self):
+        """Opens the transaction now. On SQLite this takes the write lock up
+        front; MySQL opens one implicitly on the first statement."""
+        if dialect() == "sqlite" and not self.cnx.in_transaction:
+            self.cur.execute("BEGIN IMMEDIATE")
+
+    @contextmanager
+    def savepoint(self, name="op"):
+        """Undoes only the enclosed operations if they raise. The rest of the
+        transaction is kept for the next commit."""
+        self.begin()        # on SQLite, releasing a savepoint opened outside one would commit
+        self.cur.execute(f"SAVEPOINT {name}")
+        try:
+            yield self
+        except BaseException:
+            self.cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.cur.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        self.cur.execute(f"RELEASE SAVEPOINT {name}")
+
+    def commit(self):
+        self.cnx.commit()
+        self._flush_touched()
+
+    def rollback(self):
+        self.cnx.rollback()
+        self._flush_touched()
+
+    def _flush_touched(self):
+        for cache, key in self._touched:
+            cache.invalidate(key)
+        self._touched.clear()
+
+
+@contextmanager
+def session():
+    """A Store on a pooled connection; commits on success, rolls back on error."""
+    with get_connection() as cnx:
+        store = Store(cnx)
+        try:
+            yield store
+        except BaseException:
+            store._flush_touched()      # the connection's __exit__ rolls back
+            raise
+        if cnx.in_transaction:
+            store.commit()
+        else:
+            store._flush_touched()      # e.g. only cache hits: skip the COMMIT round trip
+
+
+def run(op):
+    """run(lambda s: s.add_book(...)) — one operation in its own transaction."""
+    with session() as s:
+        return op(s)
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import library_cache
+import library_db
+import library_migrations
+import library_store
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A migrated SQLite library in a temp file, with empty lookup caches."""
+    library_db.configure("sqlite", path=str(tmp_path / "library.db"))
+    library_cache.clear()
+    with library_db.get_connection() as cnx:
+        library_migrations.migrate(cnx, log=lambda msg: None)
+    yield
+    library_db.get_pool().close_all()
+    library_cache.clear()
+
+
+@pytest.fixture
+def store(db):
+    """Runs one operation in its own transaction, like a button click."""
+    return library_store.run
+
+
+def add_book(bno, qty=2):
+    library_store.run(lambda s: s.add_book(bno, f"Book {bno}", "Author", 100, "Pub", qty, "2020-01-01"))
+
+
+def add_member(mno):
+    library_store.run(lambda s: s.add_member(mno, f"Member {mno}", "2020-01-01", "Addr", "9999999999"))
+
+
+def book(bno):
+    """The book's row straight from the database, bypassing the cache."""
+    return library_store.run(lambda s: s._rows(library_store.BOOK_BY_CODE, (bno,)))[0]
@@ -0,0 +1,59 @@
+import pytest
+
+from library_store import NotAvailable
+from conftest import add_book, add_member, book
+
+
+def update_qty(store, bno, qty):
+    return store(lambda s: s.update_book(bno, f"Book {bno}", "Author", 100, "Pub", qty, "2020-01-01"))
+
+
+def test_issue_takes_copies_until_none_are_left(store):
+    add_book(1, qty=2)
+    add_member("M1")
+    store(lambda s: s.issue_book(1, "M1", "2024-01-01"))
+    store(lambda s: s.issue_book(1, "M1", "2024-01-02"))
+    with pytest.raises(NotAvailable):
+        store(lambda s: s.issue_book(1, "M1", "2024-01-03"))
+    assert book(1)[7] == 0
+    assert len(store(lambda s: s.issues_for_member("M1"))) == 2
+
+
+def test_issue_refuses_unknown_books_and_members(store):
+    add_book(1)
+    add_member("M1")
+    with pytest.raises(NotAvailable):
+        store(lambda s: s.issue_book(99, "M1", "2024-01-01"))
+    with pytest.raises(NotAvailable):
+        store(lambda s: s.issue_book(1, "NOPE", "2024-01-01"))
+    assert book(1)[7] == 2
+
+
+def test_return_puts_the_copy_back_once(store):
+    add_book(1, qty=1)
+    add_member("M1")
+    store(lambda s: s.issue_book(1, "M1", "2024-01-01"))
+    assert store(lambda s: s.return_book(1, "M1", "2024-01-05")) == 1
+    assert store(lambda s: s.return_book(1, "M1", "2024-01-06")) == 0
+    assert book(1)[7] == 1
+
+
+def test_quantity_change_moves_avail_by_the_difference(store):
+    add_book(1, qty=3)
+    add_member("M1")
+    store(lambda s: s.issue_book(1, "M1", "2024-01-01"))
+    assert update_qty(store, 1, 5) == 1
+    assert (book(1)[5], book(1)[7]) == (5, 4)
+    assert update_qty(store, 1, 1) == 1
+    assert (book(1)[5], book(1)[7]) == (1, 0)
+
+
+def test_quantity_below_the_copies_on_loan_is_refused(store):
+    add_book(1, qty=3)
+    add_member("M1")
+    for day in (1, 2):
+        store(lambda s: s.issue_book(1, "M1", f"2024-01-0{day}"))
+    with pytest.raises(NotAvailable, match="2 copies"):
+        update_qty(store, 1, 1)
+    assert (book(1)[5], book(1)[7]) == (3, 1)
+
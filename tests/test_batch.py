@@ -0,0 +1,61 @@
+import library_store
+from conftest import add_book, add_member, book
+
+
+def test_issue_many_reports_each_code_in_scan_order(store):
+    add_book(1, qty=1)
+    add_book(2, qty=0)
+    add_member("M1")
+    result = store(lambda s: s.issue_many("M1", ["1", "x", "2", "1", "99", " "]))
+    assert result.items == [(1, None), ("x", "not a book code"), (2, "no copy available"),
+                            (1, "scanned twice"), (99, "unknown book code")]
+    assert result.summary("issued") == "1 issued, 4 failed"
+    assert book(1)[7] == 0
+    assert store(lambda s: s.issues_for_member("M1"))[0][:2] == (1, "M1")
+
+
+def test_issue_many_to_an_unknown_member_changes_nothing(store):
+    add_book(1)
+    result = store(lambda s: s.issue_many("NOPE", [1]))
+    assert result.failed == [(1, "unknown member")]
+    assert book(1)[7] == 2
+
+
+def test_return_many_puts_back_only_books_on_loan(store):
+    for bno in (1, 2, 3):
+        add_book(bno)
+    add_member("M1")
+    store(lambda s: s.issue_many("M1", [1, 2], "2024-01-01"))
+    result = store(lambda s: s.return_many("M1", [1, 2, 3], "2024-01-05"))
+    assert result.failed == [(3, "not on loan to this member")]
+    assert [book(b)[7] for b in (1, 2, 3)] == [2, 2, 2]
+    again = store(lambda s: s.return_many("M1", [1], "2024-01-06"))
+    assert again.failed == [(1, "not on loan to this member")]
+    assert book(1)[7] == 2
+
+
+def test_batches_larger_than_a_chunk(store, monkeypatch):
+    monkeypatch.setattr(library_store, "BATCH_CHUNK", 3)
+    for bno in range(1, 9):
+        add_book(bno, qty=1)
+    add_member("M1")
+    assert store(lambda s: s.issue_many("M1", range(1, 9))).failed == []
+    assert all(book(b)[7] == 0 for b in range(1, 9))
+    assert store(lambda s: s.return_many("M1", range(1, 9))).failed == []
+    assert all(book(b)[7] == 1 for b in range(1, 9))
+
+
+def test_a_failing_batch_is_undone_as_a_whole(store):
+    add_book(1)
+    add_member("M1")
+
+    def issue_then_fail(s):
+        s.issue_many("M1", [1])
+        raise RuntimeError
+
+    try:
+        store(issue_then_fail)
+    except RuntimeError:
+        pass
+    assert book(1)[7] == 2
+    assert store(lambda s: s.issues_for_member("M1")) == []
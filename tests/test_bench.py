@@ -0,0 +1,40 @@
+import library_bench
+import library_db
+import library_store
+
+
+def test_generate_builds_a_consistent_library(db):
+    with library_db.get_connection() as cnx:
+        library_bench.generate(cnx, 2000, seed=7)
+    books, members = library_bench.scale(2000)
+    counts = library_store.run(lambda s: s.dashboard_counts())
+    assert (counts["books"], counts["members"]) == (books, members)
+
+    with library_db.get_connection() as cnx:
+        cur = cnx.cursor()
+        cur.execute("SELECT COUNT(*) FROM issue")
+        assert cur.fetchone()[0] == 2000
+        # avail is the copies bought less the ones still out (popular titles
+        # can be over-issued by the random history; reconcile stops at 0)
+        cur.execute("""SELECT b.qty, b.avail, (SELECT COUNT(*) FROM issue i
+                                                WHERE i.bno = b.bno AND i.d_o_ret IS NULL)
+                         FROM bookrecords b""")
+        assert all(avail == max(qty - out, 0) for qty, avail, out in cur.fetchall())
+
+
+def test_workload_leaves_the_dataset_the_same_size(db):
+    with library_db.get_connection() as cnx:
+        library_bench.generate(cnx, 2000, seed=7)
+    books, members = library_bench.scale(2000)
+    before = library_store.run(lambda s: s.dashboard_counts())
+    library_bench.run(library_bench.Workload(books, members, seed=7), repeat=10, rounds=2)
+    after = library_store.run(lambda s: s.dashboard_counts())
+    assert (after["books"], after["members"]) == (before["books"], before["members"])
+
+
+def test_compare_ignores_slowdowns_within_noise(capsys):
+    base = {"results": {"op": {"p50_ms": 0.16, "p90_ms": 0.16, "p90_noise_ms": 0.2}}}
+    assert library_bench.compare(base, {"op": {"p50_ms": 0.16, "p90_ms": 0.31}}) == []
+    assert "within noise" in capsys.readouterr().out
+    base["results"]["op"]["p90_noise_ms"] = 0.0
+    assert library_bench.compare(base, {"op": {"p50_ms": 0.16, "p90_ms": 0.31}}) == ["op"]
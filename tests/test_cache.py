@@ -0,0 +1,73 @@
+import library_cache
+from conftest import add_book, add_member
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = library_cache.LRUCache("t", maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(library_cache.time, "monotonic", lambda: now[0])
+    cache = library_cache.LRUCache("t", ttl=5)
+    cache.put("a", 1)
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_a_load_overtaken_by_an_invalidation_is_not_cached():
+    cache = library_cache.LRUCache("t")
+
+    def load():
+        cache.invalidate("a")       # a write lands while the old row is being read
+        return "old"
+
+    assert cache.get_or_load("a", load) == "old"
+    assert cache.get("a") is None
+    assert cache.get_or_load("a", lambda: "new") == "new"
+    assert cache.get("a") == "new"
+
+
+def test_zero_size_disables_the_cache():
+    cache = library_cache.LRUCache("t", maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_circulation_invalidates_the_cached_book(store):
+    add_book(1, qty=2)
+    add_member("M1")
+    assert store(lambda s: s.find_book(1))[0][7] == 2
+    assert store(lambda s: s.find_book(1))[0][7] == 2     # served from the cache
+    assert library_cache.BOOKS.stats()["hits"] >= 1
+
+    store(lambda s: s.issue_book(1, "M1", "2024-01-01"))
+    assert store(lambda s: s.find_book(1))[0][7] == 1
+    store(lambda s: s.return_many("M1", [1]))
+    assert store(lambda s: s.find_book(1))[0][7] == 2
+
+
+def test_rolled_back_write_leaves_no_stale_entry(store):
+    add_member("M1")
+    assert store(lambda s: s.find_member("M1"))[0][1] == "Member M1"
+
+    def rename_then_fail(s):
+        s.update_member("M1", "Renamed", "2020-01-01", "Addr", "1")
+        s.find_member("M1")             # re-caches the uncommitted row
+        raise RuntimeError
+
+    try:
+        store(rename_then_fail)
+    except RuntimeError:
+        pass
+    assert store(lambda s: s.find_member("M1"))[0][1] == "Member M1"
@@ -0,0 +1,95 @@
+import json
+import shutil
+
+import pytest
+
+import library_journal
+from conftest import add_book, add_member, book
+
+
+@pytest.fixture
+def journal(db, tmp_path):
+    return library_journal.Journal(str(tmp_path / "desk.journal"))
+
+
+def write_some(journal):
+    journal.append("add_book", 1, "Book 1", "Author", 100, "Pub", 2, "2020-01-01")
+    journal.append("add_member", "M1", "Member M1", "2020-01-01", "Addr", "1")
+    journal.append("issue_book", 1, "M1", "2024-01-01")
+
+
+def test_entries_are_numbered_after_a_header(journal):
+    write_some(journal)
+    journal_id, entries = journal.entries()
+    assert [e["seq"] for e in entries] == [1, 2, 3]
+    assert entries[2]["op"] == "issue_book"
+    with open(journal.path, encoding="utf-8") as f:
+        assert json.loads(f.readline())["journal"] == journal_id
+    assert journal.pending() == 3
+
+
+def test_a_line_cut_short_by_a_crash_is_dropped(journal):
+    write_some(journal)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 4, "op": "add_bo')
+    _, entries = journal.entries()
+    assert len(entries) == 3
+    journal.append("delete_book", 1)
+    assert [e["seq"] for e in journal.entries()[1]] == [1, 2, 3, 4]
+
+
+def test_only_desk_writes_can_be_journalled(journal):
+    with pytest.raises(ValueError):
+        journal.append("drop_everything")
+
+
+def test_replay_applies_in_order_and_removes_the_journal(journal):
+    write_some(journal)
+    report = library_journal.replay(journal, batch=2)
+    assert (report.applied, report.conflicts) == (3, [])
+    assert book(1)[7] == 1
+    assert journal.pending() == 0
+    assert journal.entries() == (None, [])
+
+
+def test_the_checkpoint_stops_a_second_replay_applying_twice(journal, tmp_path):
+    write_some(journal)
+    copy = str(tmp_path / "copy.journal")
+    shutil.copy(journal.path, copy)
+    library_journal.replay(journal)
+    # The same journal turns up again, e.g. the desk crashed before removing it.
+    report = library_journal.replay(library_journal.Journal(copy))
+    assert report.applied == 0
+    assert book(1)[7] == 1
+
+
+def test_a_replay_cut_short_resumes_where_it_stopped(journal):
+    write_some(journal)
+
+    def stop(report):
+        raise ConnectionError("server went away")
+
+    with pytest.raises(ConnectionError):
+        library_journal.replay(journal, batch=2, progress=stop)
+    assert [e["seq"] for e in journal.entries()[1]] == [3]
+    assert journal.pending() == 1
+    assert library_journal.replay(journal, batch=2).applied == 1
+    assert book(1)[7] == 1
+
+
+def test_a_conflict_is_undone_alone_and_logged(journal):
+    add_book(1, qty=1)
+    add_member("M1")
+    journal.append("issue_book", 1, "M1", "2024-01-01")
+    journal.append("update_book", 99, "Gone", "Author", 100, "Pub", 1, "2020-01-01")
+    journal.append("issue_book", 1, "M1", "2024-01-02")             # no copy left
+    journal.append("issue_book", 1, "NOPE", "2024-01-03")           # no such member
+    journal.append("add_member", "M2", "Member M2", "2020-01-01", "Addr", "1")
+    report = library_journal.replay(journal)
+    assert report.applied == 5
+    assert [c["seq"] for c in report.conflicts] == [2, 3, 4]
+    assert book(1)[7] == 0
+    with open(journal.path + ".conflicts", encoding="utf-8") as f:
+        logged = [json.loads(line) for line in f]
+    assert [c["reason"] for c in logged][0] == "book 99 no longer exists"
+    assert len(logged) == 3
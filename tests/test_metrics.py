@@ -0,0 +1,37 @@
+import pytest
+
+import library_metrics
+import library_store
+
+
+def test_normalize_folds_placeholder_lists():
+    assert (library_metrics.normalize("SELECT a FROM t WHERE b IN (%s,%s,%s)")
+            == library_metrics.normalize("SELECT a\n  FROM t WHERE b IN (%s, %s)"))
+    assert (library_metrics.normalize("INSERT INTO t VALUES (%s,%s),(%s,%s),(%s,%s)")
+            == library_metrics.normalize("INSERT INTO t VALUES (%s,%s),(%s,%s)"))
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    h = library_metrics.Histogram()
+    for ms in (0.05, 0.2, 0.2, 3.0):
+        h.add(ms)
+    assert h.percentile(0.5) == 0.25
+    assert h.percentile(0.99) == 3.0        # capped at the largest value seen
+    assert library_metrics.Histogram().percentile(0.5) == 0.0
+
+
+def test_statements_run_through_the_store_are_recorded(store):
+    library_metrics.reset()
+    store(lambda s: s.find_member("nobody"))
+    snap = library_metrics.snapshot()
+    counted = {st["sql"]: st["count"] for st in snap["statements"]}
+    assert counted[library_metrics.normalize(library_store.MEMBER_BY_CODE)] == 1
+    assert snap["acquire"]["count"] >= 1
+    assert snap["pool"]["in_use"] == 0
+
+
+def test_errors_are_counted_by_type(store):
+    library_metrics.reset()
+    with pytest.raises(Exception):
+        store(lambda s: s.cur.execute("SELECT * FROM no_such_table"))
+    assert sum(library_metrics.snapshot()["errors"].values()) == 1
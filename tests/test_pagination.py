@@ -0,0 +1,70 @@
+import pytest
+
+from conftest import add_book, add_member
+
+
+@pytest.fixture
+def history(store):
+    """45 issues over 9 days, five a day (so pages split ties on the date),
+    newest first as the history shows them."""
+    add_book(1)
+    for mno in ("M1", "M2", "X1"):
+        add_member(mno)
+
+    def fill(s):
+        for n in range(45):
+            s.cur.execute("INSERT INTO issue (bno, mno, d_o_issue) VALUES (%s,%s,%s)",
+                          (1, ("M1", "M2", "X1")[n % 3], f"2024-01-{n // 5 + 1:02d}"))
+        s.cur.execute("SELECT bno, mno, d_o_issue, d_o_ret FROM issue ORDER BY d_o_issue DESC, id DESC")
+        return s.cur.fetchall()
+    return store(fill)
+
+
+def test_older_pages_walk_the_whole_history_once(store, history):
+    page = store(lambda s: s.issue_page(limit=20))
+    assert (page.has_prev, page.has_next) == (False, True)
+    seen = list(page.rows)
+    sizes = [len(page.rows)]
+    while page.has_next:
+        page = store(lambda s: s.issue_page(after=page.last, limit=20))
+        seen += page.rows
+        sizes.append(len(page.rows))
+    assert sizes == [20, 20, 5]
+    assert seen == history
+    assert page.has_prev
+
+
+def test_a_full_last_page_has_no_next(store, history):
+    first = store(lambda s: s.issue_page(limit=15))
+    second = store(lambda s: s.issue_page(after=first.last, limit=15))
+    third = store(lambda s: s.issue_page(after=second.last, limit=15))
+    assert len(third.rows) == 15
+    assert not third.has_next
+
+
+def test_newer_pages_retrace_the_same_rows(store, history):
+    first = store(lambda s: s.issue_page(limit=20))
+    second = store(lambda s: s.issue_page(after=first.last, limit=20))
+    third = store(lambda s: s.issue_page(after=second.last, limit=20))
+    back = store(lambda s: s.issue_page(before=third.first, limit=20))
+    assert back.rows == second.rows
+    assert (back.has_prev, back.has_next) == (True, True)
+    top = store(lambda s: s.issue_page(before=back.first, limit=20))
+    assert top.rows == first.rows
+    assert not top.has_prev
+
+
+def test_newer_with_fewer_rows_left_than_a_page_shows_the_newest_page(store, history):
+    first = store(lambda s: s.issue_page(limit=10))
+    second = store(lambda s: s.issue_page(after=first.last, limit=10))
+    top = store(lambda s: s.issue_page(before=second.first, limit=20))    # only 10 are newer
+    assert top.rows == history[:20]
+    assert (top.has_prev, top.has_next) == (False, True)
+
+
+def test_member_exact_and_prefix_filters(store, history):
+    m1 = store(lambda s: s.issue_page("M1", limit=100))
+    assert m1.rows == [r for r in history if r[1] == "M1"]
+    m = store(lambda s: s.issue_page("M", limit=100, prefix=True))
+    assert m.rows == [r for r in history if r[1].startswith("M")]
+    assert store(lambda s: s.issue_page("M", limit=100)).rows == []